@@ -4,6 +4,11 @@ from flask_socketio import SocketIO
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import config
+from app.message_queue import socketio_queue_options
+from app.concurrency import resolve_async_mode, init_cooperative_db
+from app.logs import init_logging
+from app.instrumentation import init_request_metrics
+from app.query_budget import init_lazy_loads
 import os
 
 db = SQLAlchemy()
@@ -13,25 +18,55 @@ jwt = JWTManager()
 def create_app(config_name='default'):
     app = Flask(__name__, static_folder='../../frontend', static_url_path='')
     app.config.from_object(config[config_name])
+    init_logging(app)
     
     # Initialize extensions
     db.init_app(app)
+    init_lazy_loads(app)
     jwt.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*", async_mode='threading')
+    # Before Socket.IO wraps wsgi_app, so only Flask requests are measured
+    init_request_metrics(app)
+    async_mode = resolve_async_mode(app.config)
+    socketio.init_app(app, cors_allowed_origins="*", async_mode=async_mode,
+                      **socketio_queue_options(app.config))
+    init_cooperative_db(app, async_mode)
     CORS(app, origins=["*"])
     
+    from app.cache import invalidation_bus
+    from app.kitchen import kitchen_queue
+    from app.broadcast import emit_scheduler
+    from app.presence import presence
+    from app.slow_queries import slow_queries
+    from app.profiling import request_profiler
+    from app.tracing import tracer
+    from app.loop_monitor import loop_monitor
+    from app.capture import traffic_capture
+    invalidation_bus.init_app(app)
+    kitchen_queue.init_app(app)
+    emit_scheduler.init_app(app)
+    slow_queries.init_app(app)
+    request_profiler.init_app(app)
+    tracer.init_app(app)
+    loop_monitor.init_app(app)
+    traffic_capture.init_app(app)
+    presence.init_app(app)
+    # Learn which rooms other workers have members in
+    presence.sync()
+    
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.menu import menu_bp
     from app.routes.orders import orders_bp
     from app.routes.admin import admin_bp
     from app.routes.tables import tables_bp
+    from app.routes.metrics import metrics_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(menu_bp, url_prefix='/api')
     app.register_blueprint(orders_bp, url_prefix='/api')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     app.register_blueprint(tables_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
     
     # Serve frontend files
     @app.route('/')
@@ -52,71 +87,8 @@ def create_app(config_name='default'):
             # Otherwise serve index.html for client-side routing
             return send_from_directory(app.static_folder, 'index.html')
     
-    # Create tables and default data
-    with app.app_context():
-        try:
-            db.create_all()
-            
-            # Import models to ensure they're registered
-            from app.models.models import AdminUser, Category, MenuItem, Table, Order, OrderItem
-            
-            # Create default admin user if none exists
-            admin = AdminUser.query.filter_by(username='admin').first()
-            if not admin:
-                default_admin = AdminUser(
-                    username='admin'
-                )
-                default_admin.set_password('admin123')
-                db.session.add(default_admin)
-                db.session.commit()
-                print("Default admin user created")
-                
-            # Create default categories and tables if none exist
-            if Category.query.count() == 0:
-                categories = [
-                    Category(name='Coffee', description='Hot and cold coffee drinks'),
-                    Category(name='Tea', description='Various tea selections'),  
-                    Category(name='Snacks', description='Light bites and snacks'),
-                    Category(name='Pastries', description='Fresh baked goods')
-                ]
-                for category in categories:
-                    db.session.add(category)
-                db.session.commit()
-                print("Default categories created")
-                
-                # Add sample menu items
-                coffee_cat = Category.query.filter_by(name='Coffee').first()
-                tea_cat = Category.query.filter_by(name='Tea').first()
-                snacks_cat = Category.query.filter_by(name='Snacks').first()
-                pastries_cat = Category.query.filter_by(name='Pastries').first()
-                
-                menu_items = [
-                    MenuItem(name='Espresso', description='Strong Italian coffee', price=2.50, category_id=coffee_cat.id),
-                    MenuItem(name='Cappuccino', description='Espresso with steamed milk foam', price=3.50, category_id=coffee_cat.id),
-                    MenuItem(name='Latte', description='Espresso with steamed milk', price=4.00, category_id=coffee_cat.id),
-                    MenuItem(name='Green Tea', description='Fresh green tea leaves', price=2.00, category_id=tea_cat.id),
-                    MenuItem(name='Earl Grey', description='Classic black tea with bergamot', price=2.25, category_id=tea_cat.id),
-                    MenuItem(name='Croissant', description='Buttery French pastry', price=3.00, category_id=pastries_cat.id),
-                    MenuItem(name='Muffin', description='Blueberry muffin', price=2.75, category_id=pastries_cat.id),
-                    MenuItem(name='Sandwich', description='Fresh sandwich with your choice of filling', price=5.50, category_id=snacks_cat.id),
-                ]
-                
-                for item in menu_items:
-                    db.session.add(item)
-                db.session.commit()
-                print("Sample menu items created")
-                
-            if Table.query.count() == 0:
-                tables = []
-                for i in range(1, 6):  # Tables 1-5
-                    table = Table(table_number=i, is_active=True)
-                    tables.append(table)
-                    db.session.add(table)
-                db.session.commit()
-                print("Default tables created")
-                
-        except Exception as e:
-            print(f"Error during database initialization: {e}")
-            db.session.rollback()
+    # Schema and seed data come from `flask init-db`, never from startup
+    from app.cli import init_cli
+    init_cli(app)
     
     return app
\ No newline at end of file
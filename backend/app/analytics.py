@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.models import Order, OrderItem, MenuItem, Category, OrderStatusHistory
+from app.sketches import QuantileSketch
+from app.cache import VersionedCache, invalidation_bus
+
+# Statuses that mark an order as having left the kitchen
+READY_STATUSES = ['ready', 'completed']
+
+# Sketches for days that can no longer change, keyed by date. Orders created
+# late in the evening can still turn ready after midnight, so the previous
+# day is only treated as closed once it is more than a day old.
+closed_day_sketches = VersionedCache('prep_time_days', topic='analytics')
+_CLOSED_DAY_LAG = timedelta(days=1)
+
+
+def _empty_sketches():
+    return {'overall': QuantileSketch(), 'hour': {}, 'category': {}, 'item': {}}
+
+
+def _merge_sketches(target, source):
+    target['overall'].merge(source['overall'])
+    for dimension in ('hour', 'category', 'item'):
+        for key, sketch in source[dimension].items():
+            target[dimension].setdefault(key, QuantileSketch()).merge(sketch)
+
+
+def _build_day_sketches(start_day, end_day):
+    """Build one set of sketches per day in ``[start_day, end_day]``."""
+    ready_at = db.session.query(
+        OrderStatusHistory.order_id.label('order_id'),
+        func.min(OrderStatusHistory.changed_at).label('ready_at')
+    ).filter(
+        OrderStatusHistory.to_status.in_(READY_STATUSES)
+    ).group_by(OrderStatusHistory.order_id).subquery()
+
+    rows = db.session.query(
+        Order.id,
+        Order.created_at,
+        ready_at.c.ready_at,
+        MenuItem.name.label('item'),
+        Category.name.label('category')
+    ).join(ready_at, ready_at.c.order_id == Order.id)\
+     .join(OrderItem, OrderItem.order_id == Order.id)\
+     .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)\
+     .join(Category, Category.id == MenuItem.category_id)\
+     .filter(
+         Order.created_at >= datetime.combine(start_day, datetime.min.time()),
+         Order.created_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+     ).all()
+
+    days = {}
+    seen_orders = set()
+    seen_categories = set()
+    for row in rows:
+        sketches = days.setdefault(row.created_at.date(), _empty_sketches())
+        minutes = (row.ready_at - row.created_at).total_seconds() / 60
+
+        # Each order counts once per hour and per category, once per item line
+        if row.id not in seen_orders:
+            seen_orders.add(row.id)
+            sketches['overall'].add(minutes)
+            sketches['hour'].setdefault(row.created_at.hour, QuantileSketch()).add(minutes)
+        if (row.id, row.category) not in seen_categories:
+            seen_categories.add((row.id, row.category))
+            sketches['category'].setdefault(row.category, QuantileSketch()).add(minutes)
+        sketches['item'].setdefault(row.item, QuantileSketch()).add(minutes)
+
+    return days
+
+
+def note_order_changed(created_at):
+    """Drop cached sketches on every worker when an order from a closed day changes."""
+    if created_at.date() < datetime.utcnow().date() - _CLOSED_DAY_LAG:
+        invalidation_bus.publish('analytics')
+
+
+def prep_time_sketches(start_day, end_day):
+    """Merged time-to-ready sketches (in minutes) for orders created between two dates."""
+    closed_before = datetime.utcnow().date() - _CLOSED_DAY_LAG
+    days = [start_day + timedelta(days=n) for n in range((end_day - start_day).days + 1)]
+
+    cache_version = closed_day_sketches.version
+    cached = {}
+    for day in days:
+        if day < closed_before:
+            day_sketches = closed_day_sketches.get(day)
+            if day_sketches is not None:
+                cached[day] = day_sketches
+    missing = [day for day in days if day not in cached]
+
+    fresh = _build_day_sketches(min(missing), max(missing)) if missing else {}
+    for day in missing:
+        if day < closed_before:
+            cached[day] = fresh.get(day, _empty_sketches())
+            closed_day_sketches.set(day, cached[day], cache_version)
+        elif day in fresh:
+            cached[day] = fresh[day]
+
+    totals = _empty_sketches()
+    for day_sketches in cached.values():
+        _merge_sketches(totals, day_sketches)
+    return totals
+
+
+def prep_time_report(start_day, end_day):
+    sketches = prep_time_sketches(start_day, end_day)
+
+    def ranked(dimension, label):
+        rows = [{label: key, **sketch.summary()} for key, sketch in sketches[dimension].items()]
+        # Slowest first, so the bottleneck is at the top
+        return sorted(rows, key=lambda row: row['p90'] or 0, reverse=True)
+
+    return {
+        'overall': sketches['overall'].summary(),
+        'by_hour': sorted(
+            ({'hour': hour, **sketch.summary()} for hour, sketch in sketches['hour'].items()),
+            key=lambda row: row['hour']
+        ),
+        'by_category': ranked('category', 'category'),
+        'by_item': ranked('item', 'item')
+    }
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from app import socketio
+from app.serializers import binary_room, has_binary_room, pack
+from app.presence import presence
+from app.metrics import metrics
+from app.tracing import tracer
+
+log = logging.getLogger('cafe.emit')
+
+frames_total = metrics.counter('cafe_socket_frames_total', 'Socket.IO frames sent, per room', ('room', 'encoding'))
+events_total = metrics.counter('cafe_socket_events_total', 'Socket.IO events queued, per room and event',
+                               ('room', 'event'))
+
+
+class EmitScheduler:
+    """Buffers socket events per room and sends them as one frame.
+
+    Handlers only queue events, and a background task flushes whatever has
+    built up every ``interval`` seconds, so a request never waits on fan-out.
+    An event queued with a ``key`` replaces the pending event with the same
+    name and key while keeping its place, so several updates to one order in
+    a window reach the room once, with the latest state; with ``merge`` the
+    pending and new payloads are combined instead. A room with more than
+    one pending event gets a single ``batch`` frame,
+    ``{'events': [{'event': ..., 'data': ...}, ...]}`` in queue order; a lone
+    event is sent as itself. An interval of 0 emits immediately.
+
+    With ``SOCKETIO_MSGPACK`` on, frames for the admin and station rooms are
+    also sent MessagePack-encoded to their ``:msgpack`` rooms.
+
+    Rooms nobody is in on any worker are skipped. ``data`` may be a callable
+    so the payload is only built when someone will receive it.
+
+    Inside a traced request, queueing and building the payload are spans,
+    and the time spent waiting for the flush is a ``socket.send`` span. Dict
+    payloads then carry ``trace: {traceparent, sent_at}`` for the client.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._traces = {}
+        self._task = None
+        self.interval = 0.1
+        self.binary = False
+        self.queued = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('EMIT_BATCH_INTERVAL', self.interval)
+        self.binary = app.config.get('SOCKETIO_MSGPACK', self.binary)
+
+    def has_audience(self, room):
+        if presence.has_members(room):
+            return True
+        return self.binary and has_binary_room(room) and presence.has_members(binary_room(room))
+
+    def emit(self, event, data, room, key=None, merge=None):
+        if not self.has_audience(room):
+            return
+        with tracer.span('socket.emit', event=event, room=room) as span:
+            if callable(data):
+                with tracer.span(getattr(data, '__qualname__', 'payload')):
+                    data = data()
+            events_total.inc(room, event)
+            trace = (span.trace_id, span.span_id, time.time_ns()) if span is not None else None
+
+            if not self.interval:
+                self._send(room, event, self._with_trace(data, trace))
+                return
+
+            with self._lock:
+                events = self._pending.setdefault(room, OrderedDict())
+                # Unkeyed events never collapse
+                slot = (event, key) if key is not None else (event, None, self.queued)
+                if merge is not None and slot in events:
+                    data = merge(events[slot], data)
+                events[slot] = data
+                if trace is not None:
+                    self._traces.setdefault(room, {})[slot] = trace
+                elif room in self._traces:
+                    self._traces[room].pop(slot, None)
+                self.queued += 1
+                if self._task is None:
+                    self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception('error flushing socket events')
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            traces, self._traces = self._traces, {}
+
+        for room, events in pending.items():
+            room_traces = traces.get(room, {})
+            if len(events) == 1:
+                (slot, data), = events.items()
+                self._send(room, slot[0], self._with_trace(data, room_traces.get(slot)))
+            else:
+                self._send(room, 'batch', {
+                    'events': [{'event': slot[0], 'data': self._with_trace(data, room_traces.get(slot))}
+                               for slot, data in events.items()]
+                })
+
+    def _with_trace(self, data, trace):
+        if trace is None or not isinstance(data, dict):
+            return data
+        trace_id, parent_id, queued_ns = trace
+        sent = tracer.record('socket.send', trace_id, parent_id, queued_ns)
+        return dict(data, trace={'traceparent': sent.traceparent, 'sent_at': sent.end_ns // 1000000})
+
+    def _send(self, room, event, data):
+        if presence.has_members(room):
+            socketio.emit(event, data, room=room)
+            frames_total.inc(room, 'json')
+        if self.binary and has_binary_room(room) and presence.has_members(binary_room(room)):
+            socketio.emit(event, pack(data), room=binary_room(room))
+            frames_total.inc(room, 'msgpack')
+
+
+emit_scheduler = EmitScheduler()
+
+
+def merge_diffs(pending, latest):
+    """Fold two queued diffs of the same object into one spanning both versions."""
+    return dict(latest, base_version=pending['base_version'],
+                changes=dict(pending['changes'], **latest['changes']))
@@ -0,0 +1,229 @@
+import logging
+import pickle
+import threading
+import time
+import uuid
+from app.message_queue import make_broker
+
+log = logging.getLogger('cafe.cache')
+
+# Seconds the listener waits before resubscribing after the broker failed,
+# doubling up to the maximum while it keeps failing
+LISTENER_BACKOFF = 0.5
+LISTENER_BACKOFF_MAX = 30.0
+
+
+class InvalidationBus:
+    """Fans out versioned cache invalidations to subscribers.
+
+    Without a broker it only delivers within this process. With one
+    (``CACHE_INVALIDATION_URL`` set to ``redis://`` or ``local://``) every
+    publish is also sent on the broker, and a background listener delivers
+    invalidations published by other workers. If the broker connection
+    fails the listener resubscribes with backoff and then calls the
+    ``on_resubscribe`` callbacks, since anything published meanwhile was
+    missed. ``connected`` is False while the listener is down.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._resubscribe_callbacks = []
+        self.origin = uuid.uuid4().hex
+        self.broker = None
+        self.channel = None
+        self.connected = False
+        self.published = 0
+        self.received = 0
+        self.undecodable = 0
+        self.listener_restarts = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('CACHE_INVALIDATION_URL')
+        channel = app.config.get('SOCKETIO_CHANNEL', 'virtual-cafe') + ':invalidations'
+        if not url or (self.broker is not None and self.channel == channel):
+            return
+        self.attach(make_broker(url), channel)
+
+    def attach(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        subscription = broker.subscribe(channel)
+        self.connected = True
+        thread = threading.Thread(target=self._listen, args=(subscription,), daemon=True)
+        thread.start()
+
+    def subscribe(self, topic, callback):
+        """Call ``callback(message)`` for every invalidation of ``topic``."""
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def on_resubscribe(self, callback):
+        """Call ``callback()`` after the listener reconnected to the broker."""
+        with self._lock:
+            self._resubscribe_callbacks.append(callback)
+
+    def publish(self, topic, version=None, include_local=True, **payload):
+        message = dict(payload, topic=topic, version=version,
+                       origin=self.origin, published_at=time.time())
+        self.published += 1
+        if include_local:
+            self._deliver(message, remote=False)
+        if self.broker is not None:
+            self.broker.publish(self.channel, message)
+        return message
+
+    def _deliver(self, message, remote):
+        with self._lock:
+            callbacks = list(self._subscribers.get(message['topic'], []))
+        for callback in callbacks:
+            callback(dict(message, remote=remote))
+
+    def _listen(self, subscription):
+        delay = LISTENER_BACKOFF
+        while True:
+            try:
+                if subscription is None:
+                    subscription = self.broker.subscribe(self.channel)
+                    self.connected = True
+                    self._resubscribed()
+                data = subscription.get()
+                delay = LISTENER_BACKOFF
+            except Exception:
+                self.connected = False
+                self.listener_restarts += 1
+                log.exception('invalidation listener failed, resubscribing', extra={'retry_in': delay})
+                close = getattr(subscription, 'close', None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+                subscription = None
+                time.sleep(delay)
+                delay = min(delay * 2, LISTENER_BACKOFF_MAX)
+                continue
+
+            try:
+                message = pickle.loads(data)
+            except Exception:
+                message = None
+            if not isinstance(message, dict) or 'topic' not in message:
+                self.undecodable += 1
+                log.warning('undecodable invalidation dropped')
+                continue
+            if message.get('origin') == self.origin:
+                continue
+            self.received += 1
+            try:
+                self._deliver(message, remote=True)
+            except Exception:
+                log.exception('error applying invalidation', extra={'topic': message.get('topic')})
+
+    def _resubscribed(self):
+        log.warning('invalidation listener resubscribed', extra={'restarts': self.listener_restarts})
+        with self._lock:
+            callbacks = list(self._resubscribe_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                log.exception('error resyncing after resubscribe')
+
+    def stats(self):
+        return {
+            'transport': 'broker' if self.broker is not None else 'in-process',
+            'connected': self.connected,
+            'published': self.published,
+            'received': self.received,
+            'undecodable': self.undecodable,
+            'listener_restarts': self.listener_restarts
+        }
+
+
+invalidation_bus = InvalidationBus()
+
+# Every VersionedCache, by name, for the stats endpoint
+caches = {}
+
+
+class VersionedCache:
+    """Dictionary cache cleared by versioned invalidations on ``topic``.
+
+    Invalidations carrying a version at or below the one already applied are
+    ignored, so replays and out-of-order delivery cannot roll the cache back.
+    A value loaded while an invalidation arrives is not stored. For
+    invalidations from other workers the delay between publish and apply is
+    recorded as the staleness window.
+    """
+
+    def __init__(self, name, topic, bus=None):
+        self.name = name
+        self.topic = topic
+        self.version = 0
+        self._data = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.last_staleness = None
+        self.max_staleness = 0.0
+        bus = bus or invalidation_bus
+        bus.subscribe(topic, self.invalidate)
+        # Invalidations may have been missed while the bus was reconnecting
+        bus.on_resubscribe(self.invalidate)
+        caches[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            if version is None or version == self.version:
+                self._data[key] = value
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            version = self.version
+        value = loader()
+        self.set(key, value, version)
+        return value
+
+    def invalidate(self, message=None):
+        message = message or {}
+        version = message.get('version')
+        with self._lock:
+            if version is not None and version <= self.version:
+                return
+            self.version = version if version is not None else self.version + 1
+            self._data.clear()
+            self.invalidations += 1
+            if message.get('remote'):
+                self.last_staleness = max(time.time() - message['published_at'], 0.0)
+                self.max_staleness = max(self.max_staleness, self.last_staleness)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'topic': self.topic,
+            'version': self.version,
+            'entries': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations,
+            'last_staleness_seconds': round(self.last_staleness, 4) if self.last_staleness is not None else None,
+            'max_staleness_seconds': round(self.max_staleness, 4)
+        }
@@ -0,0 +1,141 @@
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from urllib.parse import parse_qsl, urlencode
+from flask import g, request
+from app import socketio
+
+log = logging.getLogger('cafe.capture')
+
+# Body, query and socket payload fields never written to a capture
+REDACTED_FIELDS = {'password', 'token', 'access_token', 'refresh_token', 'authorization'}
+REDACTED = '[redacted]'
+
+# Captured entries waiting to be written; beyond this they are dropped
+MAX_PENDING_ENTRIES = 50000
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def redact_query(query_string):
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([(key, REDACTED if key.lower() in REDACTED_FIELDS else value) for key, value in pairs])
+
+
+class TrafficCapture:
+    """Records API requests and client socket events for ``replay_traffic.py``.
+
+    With ``TRAFFIC_CAPTURE`` set to a file path every ``/api/`` request is
+    appended as one JSON line with its arrival time, body, status and
+    latency, and so is every event a client sends over Socket.IO (handlers
+    opt in with ``@traffic_capture.socket_event``). Authorization headers
+    are reduced to a flag and password or token fields are redacted, so a
+    capture holds no credentials. New order ids are recorded with the
+    request that created them, for replay to remap later references.
+    Entries are written in batches from a background task; ``{pid}`` in the
+    path is replaced with the worker's process id, so each worker can write
+    a file of its own.
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self.interval = 1.0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pending = []
+        self._task = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get('TRAFFIC_CAPTURE')
+        self.interval = app.config.get('TRAFFIC_CAPTURE_INTERVAL', 1.0)
+        if self.path:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            log.warning('capturing traffic', extra={'path': self.path})
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def socket_event(self, handler):
+        # Flask-SocketIO retries connect handlers without the auth argument on
+        # TypeError, which would record the event twice
+        accepts_data = bool(inspect.signature(handler).parameters)
+
+        @wraps(handler)
+        def wrapper(*args):
+            if self.path is not None:
+                self.write({
+                    'type': 'socket',
+                    'at': time.time(),
+                    'sid': request.sid,
+                    'event': request.event['message'],
+                    'data': redact(args[0]) if args and accepts_data else None
+                })
+            return handler(*args) if accepts_data else handler()
+        return wrapper
+
+    def _start_request(self):
+        if request.path.startswith('/api/'):
+            g.capture_started = (time.time(), time.perf_counter())
+
+    def _finish_request(self, response):
+        started = g.pop('capture_started', None)
+        if started is None:
+            return response
+        at, perf_started = started
+        entry = {
+            'type': 'http',
+            'at': at,
+            'method': request.method,
+            'path': request.path,
+            'query': redact_query(request.query_string.decode()),
+            'auth': 'Authorization' in request.headers,
+            'body': redact(request.get_json(silent=True)),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - perf_started) * 1000, 2)
+        }
+        if request.endpoint == 'orders.place_order' and response.is_json and not response.is_streamed:
+            entry['order_id'] = (response.get_json(silent=True) or {}).get('order_id')
+        self.write(entry)
+        return response
+
+    def write(self, entry):
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING_ENTRIES:
+                self.dropped += 1
+                return
+            self._pending.append(entry)
+            if self._task is None:
+                self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception('error writing traffic capture')
+
+    def flush(self):
+        with self._lock:
+            entries, self._pending = self._pending, []
+        if not entries or self.path is None:
+            return
+        with open(self.path.replace('{pid}', str(os.getpid())), 'a') as f:
+            f.write(''.join(json.dumps(entry, default=str) + '\n' for entry in entries))
+
+
+traffic_capture = TrafficCapture()
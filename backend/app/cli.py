@@ -0,0 +1,100 @@
+import logging
+import os
+import click
+from app import db
+
+log = logging.getLogger('cafe.startup')
+
+SAMPLE_MENU = {
+    'Coffee': [
+        ('Espresso', 'Strong Italian coffee', 2.50),
+        ('Cappuccino', 'Espresso with steamed milk foam', 3.50),
+        ('Latte', 'Espresso with steamed milk', 4.00)
+    ],
+    'Tea': [
+        ('Green Tea', 'Fresh green tea leaves', 2.00),
+        ('Earl Grey', 'Classic black tea with bergamot', 2.25)
+    ],
+    'Snacks': [
+        ('Sandwich', 'Fresh sandwich with your choice of filling', 5.50)
+    ],
+    'Pastries': [
+        ('Croissant', 'Buttery French pastry', 3.00),
+        ('Muffin', 'Blueberry muffin', 2.75)
+    ]
+}
+SAMPLE_TABLES = 5
+
+
+def create_schema():
+    from app.models import models  # noqa: F401 registers the tables
+    db.create_all()
+
+
+def ensure_admin(username='admin', password=None):
+    """Create the admin user unless it exists; returns whether it was created."""
+    from app.models.models import AdminUser
+
+    if AdminUser.query.filter_by(username=username).first():
+        return False
+    admin = AdminUser(username=username)
+    admin.set_password(password or os.environ.get('ADMIN_PASSWORD') or 'admin123')
+    db.session.add(admin)
+    db.session.commit()
+    log.info('admin user created', extra={'username': username})
+    return True
+
+
+def seed_sample_data():
+    """The sample menu and tables, when the database has no categories or tables yet."""
+    from app.models.models import Category, MenuItem, Table
+
+    if Category.query.count() == 0:
+        for position, (name, items) in enumerate(SAMPLE_MENU.items(), start=1):
+            category = Category(name=name, display_order=position)
+            db.session.add(category)
+            db.session.flush()
+            db.session.add_all([MenuItem(name=item, description=description, price=price, category_id=category.id)
+                                for item, description, price in items])
+        db.session.commit()
+        log.info('sample menu created')
+
+    if Table.query.count() == 0:
+        db.session.add_all([Table(table_number=i, is_active=True) for i in range(1, SAMPLE_TABLES + 1)])
+        db.session.commit()
+        log.info('default tables created')
+
+
+def init_cli(app):
+    """Database setup as explicit commands, so starting a worker never touches the schema.
+
+    ::
+
+        flask --app wsgi init-db --seed
+        flask --app wsgi create-admin --username alice
+    """
+
+    @app.cli.command('init-db')
+    @click.option('--seed', is_flag=True, help='Also add the sample menu and tables to an empty database.')
+    def init_db_command(seed):
+        """Create missing tables and the default admin user."""
+        create_schema()
+        created = ensure_admin()
+        if seed:
+            seed_sample_data()
+        click.echo('Database ready' + (' (admin user created)' if created else ''))
+
+    @app.cli.command('create-admin')
+    @click.option('--username', default='admin')
+    @click.password_option(envvar='ADMIN_PASSWORD')
+    def create_admin_command(username, password):
+        """Add an admin user."""
+        if not ensure_admin(username, password):
+            raise click.ClickException(f'{username} already exists')
+        click.echo(f'Created admin user {username}')
+
+    @app.cli.command('seed')
+    def seed_command():
+        """Add the sample menu and tables to an empty database."""
+        seed_sample_data()
+        click.echo('Sample data ready')
@@ -0,0 +1,89 @@
+import sys
+from functools import wraps
+from flask import current_app, copy_current_request_context
+
+
+def detect_async_mode():
+    """Socket.IO async mode matching how this process was started.
+
+    Gunicorn's eventlet and gevent workers monkey-patch the standard library
+    before loading the app, so a patched ``socket`` module tells us which hub
+    we are running on. Anything else is plain threads.
+    """
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('socket'):
+            return 'eventlet'
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('socket'):
+            return 'gevent'
+    return 'threading'
+
+
+def resolve_async_mode(config):
+    return config.get('SOCKETIO_ASYNC_MODE') or detect_async_mode()
+
+
+def resolve_db_cooperative_mode(config, async_mode):
+    """How database calls avoid blocking the hub.
+
+    - ``green``: psycopg2 yields to the eventlet hub while waiting on Postgres
+    - ``offload``: long queries run in a real OS thread via ``eventlet.tpool``
+    - ``off``: nothing to do (threading mode is already preemptive)
+    """
+    mode = config.get('DB_COOPERATIVE_MODE', 'auto')
+    if mode != 'auto':
+        return mode
+    if async_mode != 'eventlet':
+        return 'off'
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    return 'green' if uri.startswith('postgresql') else 'offload'
+
+
+def make_psycopg_green():
+    """Make psycopg2 cooperative with eventlet (same approach as psycogreen)."""
+    import psycopg2
+    from psycopg2 import extensions
+    from eventlet.hubs import trampoline
+
+    def wait_callback(conn, timeout=-1):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                break
+            elif state == extensions.POLL_READ:
+                trampoline(conn.fileno(), read=True)
+            elif state == extensions.POLL_WRITE:
+                trampoline(conn.fileno(), write=True)
+            else:
+                raise psycopg2.OperationalError(f'Bad result from poll: {state!r}')
+
+    extensions.set_wait_callback(wait_callback)
+
+
+def init_cooperative_db(app, async_mode):
+    mode = resolve_db_cooperative_mode(app.config, async_mode)
+    if mode == 'green':
+        make_psycopg_green()
+    app.config['DB_COOPERATIVE_MODE'] = mode
+    return mode
+
+
+def offload_blocking(f):
+    """Run a view in a real OS thread when long queries are offloaded.
+
+    Used on analytics views so a multi-second query does not stall every
+    websocket on an eventlet worker. The request context is copied into the
+    thread, which gets its own database session.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_app.config.get('DB_COOPERATIVE_MODE') != 'offload':
+            return f(*args, **kwargs)
+
+        from eventlet import tpool
+        from app.profiling import profile_offloaded
+        return tpool.execute(profile_offloaded(copy_current_request_context(f)), *args, **kwargs)
+
+    return decorated_function
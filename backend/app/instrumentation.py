@@ -0,0 +1,186 @@
+import collections
+import logging
+import threading
+import time
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.metrics import metrics
+from app.slow_queries import slow_queries
+from app.query_budget import QUERY_BUDGETS
+
+log = logging.getLogger('cafe.sql')
+
+# Response size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+# SQL statements per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_seconds = metrics.histogram(
+    'cafe_http_request_duration_seconds', 'Time to produce a response, per endpoint',
+    ('endpoint', 'method'))
+requests_total = metrics.counter(
+    'cafe_http_requests_total', 'Requests per endpoint and status code',
+    ('endpoint', 'method', 'status'))
+response_bytes = metrics.histogram(
+    'cafe_http_response_bytes', 'Response body size per endpoint',
+    ('endpoint',), SIZE_BUCKETS)
+request_queries = metrics.histogram(
+    'cafe_http_request_sql_statements', 'SQL statements issued per request',
+    ('endpoint',), QUERY_COUNT_BUCKETS)
+sql_statements_total = metrics.counter(
+    'cafe_sql_statements_total', 'SQL statements executed, per endpoint', ('endpoint',))
+sql_seconds_total = metrics.counter(
+    'cafe_sql_seconds_total', 'Time spent in SQL statements, per endpoint', ('endpoint',))
+
+# Endpoint label for statements run outside a request (background tasks, CLI)
+BACKGROUND = 'background'
+
+
+def request_stats():
+    """Per-request SQL counters, or None outside an instrumented request.
+
+    Kept in the WSGI environ rather than ``g`` so views copied into a
+    worker thread (``offload_blocking``) still add to their request's totals.
+    """
+    if has_request_context():
+        return request.environ.get('cafe.request_stats')
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('cafe.query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['cafe.query_started'].pop()
+    elapsed = time.perf_counter() - started
+    stats = request_stats()
+    if stats is not None:
+        stats['sql_statements'] += 1
+        stats['sql_seconds'] += elapsed
+    else:
+        sql_statements_total.inc(BACKGROUND)
+        sql_seconds_total.inc(BACKGROUND, amount=elapsed)
+    if slow_queries.is_slow(elapsed):
+        endpoint = (request.endpoint or 'unmatched') if stats is not None else BACKGROUND
+        slow_queries.record(conn, statement, parameters, executemany, elapsed, endpoint)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    if context.connection is not None:
+        started = context.connection.info.get('cafe.query_started')
+        if started:
+            started.pop()
+
+
+class InFlightRequests:
+    """Requests this worker is handling, fed by ``RequestMetricsMiddleware``.
+
+    The last few finished requests are kept too: a request that blocked the
+    hub has often returned by the time the monitor gets to run again.
+    """
+
+    def __init__(self, recent=64):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._recent = collections.deque(maxlen=recent)
+
+    def start(self, environ):
+        with self._lock:
+            self._requests[id(environ)] = (environ, time.perf_counter())
+
+    def finish(self, environ):
+        ended = time.perf_counter()
+        with self._lock:
+            entry = self._requests.pop(id(environ), None)
+            if entry is not None:
+                self._recent.append(entry + (ended,))
+
+    def __len__(self):
+        return len(self._requests)
+
+    def running_since(self, since):
+        """Requests that were running at ``since`` (a perf_counter time), longest first."""
+        now = time.perf_counter()
+        with self._lock:
+            running = [(environ, started, None) for environ, started in self._requests.values()]
+            finished = list(self._recent)
+        requests = []
+        for environ, started, ended in running + finished:
+            if started <= since and (ended is None or ended >= since):
+                requests.append({
+                    'endpoint': environ.get('cafe.endpoint') or 'unmatched',
+                    'method': environ.get('REQUEST_METHOD', ''),
+                    'path': environ.get('PATH_INFO', ''),
+                    'running_ms': round(((ended or now) - started) * 1000, 1),
+                    'finished': ended is not None
+                })
+        return sorted(requests, key=lambda request: request['running_ms'], reverse=True)
+
+
+in_flight = InFlightRequests()
+
+metrics.gauge('cafe_http_requests_in_flight', 'Requests this worker is handling right now',
+              lambda: [({}, len(in_flight))])
+
+
+class RequestMetricsMiddleware:
+    """Records latency, status, response size and SQL work per Flask endpoint.
+
+    Installed inside Socket.IO's middleware, so long-polling and websocket
+    traffic never reaches it. The response size comes from Content-Length,
+    so streamed bodies and ``wsgi.file_wrapper`` are left untouched.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        stats = environ['cafe.request_stats'] = {'sql_statements': 0, 'sql_seconds': 0.0}
+        response = {}
+
+        def capture(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+            return start_response(status, headers, exc_info)
+
+        started = time.perf_counter()
+        in_flight.start(environ)
+        try:
+            return self.wsgi_app(environ, capture)
+        finally:
+            in_flight.finish(environ)
+            self.record(environ, response, stats, time.perf_counter() - started)
+
+    def record(self, environ, response, stats, elapsed):
+        endpoint = environ.get('cafe.endpoint') or 'unmatched'
+        method = environ.get('REQUEST_METHOD', '')
+        status = response.get('status', '500')[:3]
+
+        request_seconds.observe(elapsed, endpoint, method)
+        requests_total.inc(endpoint, method, status)
+        request_queries.observe(stats['sql_statements'], endpoint)
+        if stats['sql_statements']:
+            sql_statements_total.inc(endpoint, amount=stats['sql_statements'])
+            sql_seconds_total.inc(endpoint, amount=stats['sql_seconds'])
+            budget = QUERY_BUDGETS.get(endpoint)
+            if budget is not None and stats['sql_statements'] > budget:
+                log.warning('query budget exceeded', extra={
+                    'endpoint': endpoint, 'sql_statements': stats['sql_statements'], 'budget': budget})
+
+        for name, value in response.get('headers', ()):
+            if name.lower() == 'content-length':
+                response_bytes.observe(int(value), endpoint)
+                break
+
+
+def init_request_metrics(app):
+    @app.before_request
+    def tag_endpoint():
+        request.environ['cafe.endpoint'] = request.endpoint
+
+    app.wsgi_app = RequestMetricsMiddleware(app.wsgi_app)
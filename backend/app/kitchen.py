@@ -0,0 +1,393 @@
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from app import db
+from app.broadcast import emit_scheduler
+from app.analytics import READY_STATUSES
+from app.cache import invalidation_bus
+
+# Statuses in which an order is still waiting on the kitchen
+QUEUED_STATUSES = ['pending', 'preparing']
+
+
+def order_lines(order):
+    """``[{menu_item_id, name, category_id, quantity}]`` for an Order."""
+    return [{
+        'menu_item_id': item.menu_item_id,
+        'name': item.menu_item.name,
+        'category_id': item.menu_item.category_id,
+        'quantity': item.quantity
+    } for item in order.order_items]
+
+
+def lanes_for(lines):
+    lanes = {}
+    for line in lines:
+        lanes[line['category_id']] = lanes.get(line['category_id'], 0) + line['quantity']
+    return lanes
+
+
+class KitchenQueue:
+    """In-memory view of the kitchen queue.
+
+    Each category is a FIFO lane of queued item quantities. A new order's
+    estimate is the slowest of its lanes: items already queued plus its own,
+    times the learned minutes-per-item for that lane, so placement costs one
+    lookup per category in the order. Minutes-per-item is an exponentially
+    weighted average fed by each order's observed time to ready.
+
+    Pending and preparing quantities are also kept per menu item, so the
+    consolidated prep list changes by one line per order line.
+
+    Every change returns the events that caused it; ``publish_kitchen_changes``
+    sends them with the learned minutes-per-item to the other workers, which
+    replay them with ``apply_remote`` instead of reloading the queue, so all
+    workers keep the same queue and give the same estimates.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._orders = {}
+        self._lanes = {}
+        self._lane_totals = {}
+        self._item_minutes = {}
+        self._prep_counts = {}
+        self.default_item_minutes = 3.0
+        self.min_minutes = 5
+        self.smoothing = 0.2
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_item_minutes = app.config.get('ETA_DEFAULT_ITEM_MINUTES', self.default_item_minutes)
+        self.min_minutes = app.config.get('ETA_MIN_MINUTES', self.min_minutes)
+        self.smoothing = app.config.get('ETA_SMOOTHING', self.smoothing)
+
+    def reset(self):
+        with self._lock:
+            self.invalidate()
+            self._item_minutes.clear()
+
+    def invalidate(self, message=None):
+        """Forget queue state so it is rebuilt from the database on next use.
+        Learned minutes-per-item are kept."""
+        with self._lock:
+            self._loaded = False
+            self._orders.clear()
+            self._lanes.clear()
+            self._lane_totals.clear()
+            self._prep_counts.clear()
+
+    def ensure_loaded(self):
+        """Rebuild queue state from the database the first time it is needed."""
+        if self._loaded:
+            return
+        from app.models.models import Order, OrderItem, MenuItem, Table
+
+        rows = db.session.query(
+            Order.id,
+            Order.status,
+            Order.created_at,
+            Order.estimated_time,
+            Table.table_number,
+            MenuItem.id.label('menu_item_id'),
+            MenuItem.name,
+            MenuItem.category_id,
+            OrderItem.quantity
+        ).join(Table, Table.id == Order.table_id)\
+         .join(OrderItem, OrderItem.order_id == Order.id)\
+         .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)\
+         .filter(Order.status.in_(QUEUED_STATUSES))\
+         .order_by(Order.created_at.asc(), Order.id.asc())\
+         .all()
+
+        with self._lock:
+            if self._loaded:
+                return
+            orders = OrderedDict()
+            for row in rows:
+                entry = orders.setdefault(row.id, {
+                    'status': row.status,
+                    'table_number': row.table_number,
+                    'created_at': row.created_at,
+                    'estimated_time': row.estimated_time,
+                    'lines': []
+                })
+                entry['lines'].append({
+                    'menu_item_id': row.menu_item_id,
+                    'name': row.name,
+                    'category_id': row.category_id,
+                    'quantity': row.quantity
+                })
+            for order_id, entry in orders.items():
+                self._admit(order_id, entry['status'], entry['table_number'], entry['created_at'],
+                            entry['lines'], entry['estimated_time'], {})
+            self._loaded = True
+
+    def item_minutes(self, lane):
+        return self._item_minutes.get(lane, self.default_item_minutes)
+
+    def estimate(self, lanes):
+        """Minutes until an order with ``{lane: quantity}`` would be ready if placed now."""
+        self.ensure_loaded()
+        with self._lock:
+            minutes = max(
+                ((self._lane_totals.get(lane, 0) + quantity) * self.item_minutes(lane)
+                 for lane, quantity in lanes.items()),
+                default=0
+            )
+        return max(self.min_minutes, int(math.ceil(minutes)))
+
+    def add(self, order_id, table_number, created_at, lines, estimated_time):
+        """Queue a newly placed order and return the resulting changes."""
+        self.ensure_loaded()
+        changes = {'eta': {}, 'prep_counts': {}, 'events': [{
+            'op': 'add',
+            'order_id': order_id,
+            'table_number': table_number,
+            'created_at': created_at,
+            'lines': lines,
+            'estimated_time': estimated_time
+        }]}
+        with self._lock:
+            self._admit(order_id, 'pending', table_number, created_at, lines, estimated_time,
+                        changes['prep_counts'])
+        return changes
+
+    def _admit(self, order_id, status, table_number, created_at, lines, estimated_time, prep_changes):
+        if order_id in self._orders:
+            return
+        lanes = lanes_for(lines)
+        ahead = {}
+        for lane, quantity in lanes.items():
+            self._lanes.setdefault(lane, OrderedDict())[order_id] = quantity
+            self._lane_totals[lane] = self._lane_totals.get(lane, 0) + quantity
+            ahead[lane] = self._lane_totals[lane]
+        self._orders[order_id] = {
+            'status': status,
+            'table_number': table_number,
+            'created_at': created_at,
+            'lines': lines,
+            'lanes': lanes,
+            'ahead': ahead,
+            'estimated_time': estimated_time,
+            'pinned': False
+        }
+        self._count_lines(lines, status, 1, prep_changes)
+
+    def _count_lines(self, lines, status, sign, prep_changes):
+        for line in lines:
+            counts = self._prep_counts.get(line['menu_item_id'])
+            if counts is None:
+                counts = self._prep_counts[line['menu_item_id']] = {
+                    'menu_item_id': line['menu_item_id'],
+                    'name': line['name'],
+                    'category_id': line['category_id'],
+                    'pending': 0,
+                    'preparing': 0
+                }
+            counts[status] += sign * line['quantity']
+            prep_changes[line['menu_item_id']] = dict(counts)
+            if counts['pending'] == 0 and counts['preparing'] == 0:
+                del self._prep_counts[line['menu_item_id']]
+
+    def pin(self, order_id, estimated_time, changes=None):
+        """Keep an estimate set by staff instead of re-estimating it."""
+        if changes is not None:
+            changes['events'].append({'op': 'pin', 'order_id': order_id, 'estimated_time': estimated_time})
+        with self._lock:
+            entry = self._orders.get(order_id)
+            if entry:
+                entry['estimated_time'] = estimated_time
+                entry['pinned'] = True
+
+    def update_status(self, order, new_status, changed_at=None):
+        """Apply a status change and return the resulting changes: re-estimated
+        ``eta`` as ``{order_id: (table_number, estimated_time)}`` and the
+        ``prep_counts`` lines that moved, keyed by menu item id."""
+        self.ensure_loaded()
+        changes = {'eta': {}, 'prep_counts': {}, 'events': []}
+        event = {
+            'op': 'status',
+            'order_id': order.id,
+            'status': new_status,
+            'changed_at': changed_at or datetime.utcnow()
+        }
+        with self._lock:
+            if order.id not in self._orders and new_status in QUEUED_STATUSES:
+                # Everything needed to queue it, for this worker and the others
+                event['order'] = {
+                    'table_number': order.table.table_number,
+                    'created_at': order.created_at,
+                    'lines': order_lines(order),
+                    'estimated_time': order.estimated_time
+                }
+            changes['events'].append(event)
+            self._apply_status(event, changes, learn=True)
+        return changes
+
+    def _apply_status(self, event, changes, learn):
+        """Returns False for a queued order this queue has never seen."""
+        order_id = event['order_id']
+        new_status = event['status']
+        entry = self._orders.get(order_id)
+
+        if new_status in QUEUED_STATUSES:
+            if entry is None:
+                placed = event.get('order')
+                if placed is None:
+                    return False
+                self._admit(order_id, new_status, placed['table_number'], placed['created_at'],
+                            placed['lines'], placed['estimated_time'], changes['prep_counts'])
+            elif entry['status'] != new_status:
+                self._count_lines(entry['lines'], entry['status'], -1, changes['prep_counts'])
+                self._count_lines(entry['lines'], new_status, 1, changes['prep_counts'])
+                entry['status'] = new_status
+            return True
+
+        if entry is None:
+            return True
+        del self._orders[order_id]
+        self._count_lines(entry['lines'], entry['status'], -1, changes['prep_counts'])
+
+        changed_at = event['changed_at']
+        elapsed = max((changed_at - entry['created_at']).total_seconds() / 60, 0)
+        for lane, quantity in entry['lanes'].items():
+            self._lanes[lane].pop(order_id, None)
+            self._lane_totals[lane] -= quantity
+            # Only completions that reached ready teach us about service rate;
+            # other workers take the rates learned here instead
+            if learn and new_status in READY_STATUSES:
+                sample = elapsed / entry['ahead'][lane]
+                previous = self.item_minutes(lane)
+                self._item_minutes[lane] = previous + self.smoothing * (sample - previous)
+
+        changes['eta'] = self._reestimate(changed_at)
+        return True
+
+    def learned_minutes(self):
+        with self._lock:
+            return dict(self._item_minutes)
+
+    def apply_remote(self, message):
+        """Replay queue changes made on another worker."""
+        if 'events' not in message:
+            # From a worker that only announces that something changed
+            self.invalidate()
+            return
+        with self._lock:
+            self._item_minutes.update(message.get('item_minutes') or {})
+            if not self._loaded:
+                # Rebuilt from the database, which already has these changes, when next needed
+                return
+            changes = {'eta': {}, 'prep_counts': {}}
+            for event in message['events']:
+                if event['op'] == 'add':
+                    self._admit(event['order_id'], 'pending', event['table_number'], event['created_at'],
+                                event['lines'], event['estimated_time'], changes['prep_counts'])
+                elif event['op'] == 'pin':
+                    self.pin(event['order_id'], event['estimated_time'])
+                elif not self._apply_status(event, changes, learn=False):
+                    self.invalidate()
+                    return
+
+    def _reestimate(self, now):
+        positions = {}
+        for lane, queued in self._lanes.items():
+            position = 0
+            for order_id, quantity in queued.items():
+                position += quantity
+                remaining = position * self.item_minutes(lane)
+                positions[order_id] = max(positions.get(order_id, 0), remaining)
+
+        changed = {}
+        for order_id, remaining in positions.items():
+            entry = self._orders[order_id]
+            if entry['pinned']:
+                continue
+            elapsed = (now - entry['created_at']).total_seconds() / 60
+            estimated_time = max(self.min_minutes, int(math.ceil(elapsed + remaining)))
+            if estimated_time != entry['estimated_time']:
+                entry['estimated_time'] = estimated_time
+                changed[order_id] = (entry['table_number'], estimated_time)
+        return changed
+
+    def prep_list(self):
+        """Consolidated pending/preparing quantities per menu item, largest first."""
+        self.ensure_loaded()
+        with self._lock:
+            items = [dict(counts) for counts in self._prep_counts.values()]
+        return sorted(items, key=lambda item: item['pending'] + item['preparing'], reverse=True)
+
+    def snapshot(self):
+        self.ensure_loaded()
+        with self._lock:
+            return {
+                'active_orders': len(self._orders),
+                'lanes': [{
+                    'category_id': lane,
+                    'queued_items': self._lane_totals.get(lane, 0),
+                    'minutes_per_item': round(self.item_minutes(lane), 2)
+                } for lane in self._lanes]
+            }
+
+
+kitchen_queue = KitchenQueue()
+
+# Another worker changed the queue; apply the same changes to ours
+invalidation_bus.subscribe('kitchen', kitchen_queue.apply_remote)
+invalidation_bus.on_resubscribe(kitchen_queue.invalidate)
+
+
+def merge_prep_counts(pending, latest):
+    """Combine two ``prep_counts_updated`` payloads, keeping each item's latest counts."""
+    items = {counts['menu_item_id']: counts for counts in pending['items']}
+    items.update((counts['menu_item_id'], counts) for counts in latest['items'])
+    return {'items': list(items.values())}
+
+
+def publish_kitchen_changes(changes):
+    """Persist re-estimated ETAs, push them to the affected tables and send
+    changed prep-list lines to the admin room and their station rooms."""
+    from app.stations import station_for_category, station_room
+
+    # This worker already applied the change; other workers replay it
+    if changes.get('events'):
+        invalidation_bus.publish('kitchen', include_local=False, events=changes['events'],
+                                 item_minutes=kitchen_queue.learned_minutes())
+
+    eta = changes['eta']
+    if eta:
+        from app.models.models import Order
+
+        # A re-estimate is not a change to the order, so its version
+        # (updated_at) stays put and clients keep applying diffs
+        orders = Order.__table__
+        db.session.execute(
+            db.update(orders)
+            .where(orders.c.id == db.bindparam('order_id'))
+            .values(estimated_time=db.bindparam('eta'), updated_at=orders.c.updated_at),
+            [{'order_id': order_id, 'eta': estimated_time}
+             for order_id, (table_number, estimated_time) in eta.items()]
+        )
+        db.session.commit()
+
+        for order_id, (table_number, estimated_time) in eta.items():
+            emit_scheduler.emit('order_eta_updated', {
+                'order_id': order_id,
+                'estimated_time': estimated_time
+            }, room=f'table_{table_number}', key=order_id)
+
+    prep_counts = list(changes['prep_counts'].values())
+    if prep_counts:
+        emit_scheduler.emit('prep_counts_updated', {'items': prep_counts}, room='admin',
+                            key='prep_counts', merge=merge_prep_counts)
+
+        by_station = {}
+        for counts in prep_counts:
+            by_station.setdefault(station_for_category(counts['category_id']), []).append(counts)
+        for station, items in by_station.items():
+            emit_scheduler.emit('prep_counts_updated', {'items': items}, room=station_room(station),
+                                key='prep_counts', merge=merge_prep_counts)
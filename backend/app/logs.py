@@ -0,0 +1,114 @@
+import atexit
+import importlib
+import json
+import logging
+import logging.handlers
+import random
+import sys
+from datetime import datetime
+
+# Attributes every LogRecord has; anything else came from ``extra`` and is
+# written out as a structured field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _native(module):
+    # On eventlet the writer must be a real OS thread, so slow stdout never
+    # blocks the hub; green threads only put records on the queue
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        return patcher.original(module)
+    return importlib.import_module(module)
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **record_fields(record)
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records from noisy loggers, e.g. ``{'cafe.socket.connection': 0.1}``.
+    Warnings and errors are always kept."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.name)
+        return rate is None or record.levelno >= logging.WARNING or random.random() < rate
+
+
+class _Listener(logging.handlers.QueueListener):
+    def start(self):
+        self._thread = _native('threading').Thread(target=self._monitor, name='log-writer', daemon=True)
+        self._thread.start()
+
+
+_listener = None
+
+
+@atexit.register
+def _flush_logs():
+    if _listener is not None:
+        _listener.stop()
+
+
+def init_logging(app):
+    """Send the ``cafe.*`` loggers through a queue drained by a background writer.
+
+    Levels are set per subsystem with ``LOG_LEVELS`` (``LOG_LEVEL`` for the
+    rest) and ``LOG_SAMPLE_RATES`` thins out high-volume loggers.
+    """
+    global _listener
+
+    config = app.config
+    root = logging.getLogger('cafe')
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    for name, level in config.get('LOG_LEVELS', {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(TextFormatter() if config.get('LOG_FORMAT') == 'text' else JsonFormatter())
+
+    records = _native('queue').SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(SamplingFilter(config.get('LOG_SAMPLE_RATES', {})))
+    root.addHandler(handler)
+    root.propagate = False
+
+    _listener = _Listener(records, writer)
+    _listener.start()
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from app import socketio
+from app.metrics import metrics
+from app.instrumentation import in_flight
+
+log = logging.getLogger('cafe.loop')
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+IN_FLIGHT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+loop_lag = metrics.histogram(
+    'cafe_event_loop_lag_seconds', 'How late the monitor woke up; time the hub could not schedule',
+    buckets=LAG_BUCKETS)
+loop_stalls_total = metrics.counter(
+    'cafe_event_loop_stalls_total', 'Lag measurements above LOOP_LAG_THRESHOLD')
+in_flight_sampled = metrics.histogram(
+    'cafe_http_requests_in_flight_sampled', 'Requests in flight, sampled at each lag measurement',
+    buckets=IN_FLIGHT_BUCKETS)
+
+
+class LoopLagMonitor:
+    """Measures how long the event loop takes to come back to a sleeping task.
+
+    Every ``LOOP_LAG_INTERVAL`` seconds a background task sleeps and checks
+    how late it woke up. On an eventlet worker that delay is time during
+    which some green thread held the hub without yielding: PBKDF2, a long
+    query on an unpatched driver, a big serialization loop. A lag above
+    ``LOOP_LAG_THRESHOLD`` is logged with the requests that were running
+    when the stall began, one of which held the hub. With threads there is
+    no shared loop and lag stays near zero.
+    """
+
+    def __init__(self, app=None):
+        self.interval = 0.5
+        self.threshold = 0.1
+        self.last_lag = 0.0
+        self._task = None
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('LOOP_LAG_INTERVAL', self.interval)
+        self.threshold = app.config.get('LOOP_LAG_THRESHOLD', self.threshold)
+        if self.interval:
+            # Started by the first request, inside the worker that serves it
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._task is not None:
+            return
+        with self._start_lock:
+            if self._task is None:
+                self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            started = time.perf_counter()
+            socketio.sleep(self.interval)
+            try:
+                self.measure(time.perf_counter() - started - self.interval)
+            except Exception:
+                log.exception('error measuring event loop lag')
+
+    def measure(self, lag):
+        lag = max(lag, 0.0)
+        self.last_lag = lag
+        loop_lag.observe(lag)
+        in_flight_sampled.observe(len(in_flight))
+        if lag < self.threshold:
+            return
+
+        loop_stalls_total.inc()
+        suspects = in_flight.running_since(time.perf_counter() - lag)
+        log.warning('event loop stalled', extra={
+            'lag_ms': round(lag * 1000, 1),
+            'in_flight': len(in_flight),
+            'endpoint': suspects[0]['endpoint'] if suspects else None,
+            'suspects': suspects[:10]
+        })
+
+
+loop_monitor = LoopLagMonitor()
+
+metrics.gauge('cafe_event_loop_lag_last_seconds', 'Lag at the most recent measurement',
+              lambda: [({}, loop_monitor.last_lag)])
@@ -0,0 +1,115 @@
+import pickle
+import queue
+import threading
+import socketio as python_socketio
+
+
+class LocalBroker:
+    """In-process fan-out broker standing in for Redis pub/sub.
+
+    Every subscriber of a channel gets its own queue and receives a copy of
+    each message published after it subscribed. Messages are pickled like
+    they are on the wire, so payloads that would not survive Redis fail here
+    too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers.get(channel, []):
+                self._subscribers[channel].remove(subscriber)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, []))
+
+    def publish(self, channel, message):
+        data = pickle.dumps(message)
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, []))
+        for subscriber in subscribers:
+            subscriber.put(data)
+
+
+local_broker = LocalBroker()
+
+
+class RedisBroker:
+    """Same interface as :class:`LocalBroker`, backed by Redis pub/sub."""
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def subscribe(self, channel):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        return _RedisSubscription(pubsub)
+
+    def publish(self, channel, message):
+        self._redis.publish(channel, pickle.dumps(message))
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+        self._messages = pubsub.listen()
+
+    def get(self):
+        return next(self._messages)['data']
+
+    def close(self):
+        self._pubsub.close()
+
+
+def make_broker(url):
+    """Broker for a ``local://`` or ``redis://`` URL, or None when unset."""
+    if not url:
+        return None
+    if url.startswith('local://'):
+        return local_broker
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBroker(url)
+    raise ValueError(f'Unsupported broker URL: {url}')
+
+
+class LocalPubSubManager(python_socketio.PubSubManager):
+    """Socket.IO client manager using :class:`LocalBroker`.
+
+    Selected with ``SOCKETIO_MESSAGE_QUEUE=local://``. Lets several Socket.IO
+    servers in one process share rooms the way separate workers do through
+    Redis, which is what the multi-worker test relies on.
+    """
+    name = 'local'
+
+    def __init__(self, channel='socketio', write_only=False, logger=None, broker=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.broker = broker or local_broker
+        self._subscriber = None if write_only else self.broker.subscribe(channel)
+
+    def _publish(self, data):
+        self.broker.publish(self.channel, data)
+
+    def _listen(self):
+        while True:
+            yield self._subscriber.get()
+
+
+def socketio_queue_options(config):
+    """Keyword arguments for ``socketio.init_app`` from the app config."""
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': LocalPubSubManager(channel=channel)}
+    return {'message_queue': url, 'channel': channel}
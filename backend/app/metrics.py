@@ -0,0 +1,125 @@
+import bisect
+import threading
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            yield self.name, dict(zip(self.labelnames, labelvalues)), value
+
+
+class Histogram:
+    """Fixed-bucket histogram. Each observation is one bisect and one list update."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                # One count per bucket, one for +Inf, then the sum
+                entry = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(labelvalues, list(entry)) for labelvalues, entry in self._values.items()]
+        for labelvalues, entry in values:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), entry[:-1]):
+                cumulative += count
+                yield f'{self.name}_bucket', dict(labels, le=bound), cumulative
+            yield f'{self.name}_sum', labels, entry[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class CallbackGauge:
+    type = 'gauge'
+
+    def __init__(self, name, help_text, collect):
+        self.name = name
+        self.help_text = help_text
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, labels, value
+
+
+class MetricsRegistry:
+    """Metrics rendered in the Prometheus text format at ``/metrics``.
+
+    Gauges are read when scraped: ``collect()`` returns ``[(labels, value)]``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            # Modules can be re-imported by scripts; keep the first instance
+            return self._metrics.setdefault(metric.name, metric)
+
+    def gauge(self, name, help_text, collect):
+        with self._lock:
+            self._metrics[name] = CallbackGauge(name, help_text, collect)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            registered = sorted(self._metrics.items())
+        for name, metric in registered:
+            lines.append(f'# HELP {name} {metric.help_text}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for sample, labels, value in metric.samples():
+                lines.append(f'{sample}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
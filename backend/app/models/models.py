@@ -75,6 +75,15 @@ class Order(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     order_items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+    status_history = db.relationship('OrderStatusHistory', backref='order', lazy=True, cascade='all, delete-orphan')
+    
+    # Fields a status update can change; update events carry only these
+    DIFF_FIELDS = ('status', 'estimated_time', 'updated_at')
+    
+    @property
+    def version(self):
+        # Milliseconds since the epoch of the last change
+        return int((self.updated_at - datetime(1970, 1, 1)).total_seconds() * 1000)
     
     def to_dict(self):
         return {
@@ -85,8 +94,29 @@ class Order(db.Model):
             'total_amount': float(self.total_amount) if self.total_amount else 0,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
+            'version': self.version,
             'items': [item.to_dict() for item in self.order_items]
         }
+    
+    def state_dict(self):
+        return {
+            'version': self.version,
+            'status': self.status,
+            'estimated_time': self.estimated_time,
+            'updated_at': self.updated_at.isoformat()
+        }
+    
+    def to_diff(self, before):
+        """Changed fields since ``before`` (an earlier ``state_dict()``). Clients
+        apply it only if they hold ``base_version`` and reload otherwise."""
+        state = self.state_dict()
+        return {
+            'id': self.id,
+            'table_number': self.table.table_number,
+            'base_version': before['version'],
+            'version': state['version'],
+            'changes': {field: state[field] for field in self.DIFF_FIELDS if state[field] != before[field]}
+        }
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
@@ -107,6 +137,24 @@ class OrderItem(db.Model):
             'subtotal': float(self.price_at_time * self.quantity)
         }
 
+class OrderStatusHistory(db.Model):
+    __tablename__ = 'order_status_history'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    from_status = db.Column(db.String(20))
+    to_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'from_status': self.from_status,
+            'to_status': self.to_status,
+            'changed_at': self.changed_at.isoformat()
+        }
+
 class AdminUser(db.Model):
     __tablename__ = 'admin_users'
     
@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from app import socketio
+from app.cache import invalidation_bus
+from app.metrics import metrics
+
+log = logging.getLogger('cafe.presence')
+
+# Heartbeats a worker may miss before its counts are no longer trusted
+STALE_HEARTBEATS = 2
+
+
+class PresenceRegistry:
+    """Who is connected, and to which rooms.
+
+    Socket handlers report connects, joins, leaves and disconnects for this
+    worker. Every change to a room's member count is also published on the
+    invalidation bus, so each worker knows the other workers' counts too and
+    a room only counts as empty when it is empty everywhere. A worker that
+    starts up asks the others to resend their counts.
+
+    With a ``heartbeat`` every worker also republishes its full counts that
+    often. Until the other workers' counts are known to be current (for a
+    heartbeat after a sync, while the bus is down, or while a worker has
+    missed ``STALE_HEARTBEATS`` heartbeats) every room counts as occupied,
+    so events are sent rather than lost. A worker not heard from for
+    ``ttl`` seconds is forgotten.
+    """
+
+    def __init__(self, bus=None, heartbeat=0, ttl=None):
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._rooms = {}
+        self._sids = {}
+        self._remote = {}
+        self._synced_at = None
+        self._task = None
+        self.heartbeat = heartbeat
+        self.ttl = ttl
+        self.bus = bus or invalidation_bus
+        self.bus.subscribe('presence', self._apply_remote)
+        self.bus.on_resubscribe(self.sync)
+
+    def init_app(self, app):
+        self.heartbeat = app.config.get('PRESENCE_HEARTBEAT', self.heartbeat)
+        self.ttl = app.config.get('PRESENCE_TTL', self.ttl)
+        if self.heartbeat:
+            # Started by the first request or socket connection in the worker
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._task is not None or not self.heartbeat or self.bus.broker is None:
+            return
+        with self._start_lock:
+            if self._task is None:
+                self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.heartbeat)
+            try:
+                self.beat()
+            except Exception:
+                log.exception('error publishing presence heartbeat')
+
+    def connect(self, sid):
+        self._ensure_started()
+        with self._lock:
+            self._sids.setdefault(sid, set())
+            connections = len(self._sids)
+        self._publish(connections=connections)
+
+    def join(self, sid, room):
+        with self._lock:
+            self._sids.setdefault(sid, set()).add(room)
+            members = self._rooms.setdefault(room, set())
+            if sid in members:
+                return
+            members.add(sid)
+            count = len(members)
+        self._publish(rooms={room: count})
+
+    def leave(self, sid, room):
+        with self._lock:
+            self._sids.get(sid, set()).discard(room)
+            members = self._rooms.get(room)
+            if not members or sid not in members:
+                return
+            members.discard(sid)
+            count = len(members)
+            if not members:
+                del self._rooms[room]
+        self._publish(rooms={room: count})
+
+    def disconnect(self, sid):
+        with self._lock:
+            rooms = {}
+            for room in self._sids.pop(sid, set()):
+                members = self._rooms.get(room)
+                if members is None:
+                    continue
+                members.discard(sid)
+                rooms[room] = len(members)
+                if not members:
+                    del self._rooms[room]
+            connections = len(self._sids)
+        self._publish(rooms=rooms, connections=connections)
+
+    def has_members(self, room):
+        if self._rooms.get(room):
+            return True
+        if self.bus.broker is None:
+            return False
+        if not self.known():
+            return True
+        return any(state['rooms'].get(room) for state in self._live_states())
+
+    def known(self):
+        """Whether the other workers' counts can be trusted to be current."""
+        if not self.bus.connected:
+            return False
+        if not self.heartbeat:
+            return True
+        now = time.monotonic()
+        if self._synced_at is None or now - self._synced_at < self.heartbeat:
+            return False
+        stale = now - STALE_HEARTBEATS * self.heartbeat
+        return all(state['seen'] >= stale for state in self._live_states(now))
+
+    def _live_states(self, now=None):
+        states = list(self._remote.values())
+        if not self.ttl:
+            return states
+        expired = (now or time.monotonic()) - self.ttl
+        return [state for state in states if state['seen'] >= expired]
+
+    def sync(self):
+        """Ask the other workers to publish their full counts."""
+        self._synced_at = time.monotonic()
+        self.bus.publish('presence', include_local=False, sync=True)
+
+    def beat(self):
+        """Publish this worker's full counts and forget workers past the TTL."""
+        if self.ttl:
+            expired = time.monotonic() - self.ttl
+            with self._lock:
+                for origin in [origin for origin, state in self._remote.items() if state['seen'] < expired]:
+                    del self._remote[origin]
+        self._publish_counts()
+
+    def _publish_counts(self):
+        with self._lock:
+            rooms = {room: len(members) for room, members in self._rooms.items()}
+            connections = len(self._sids)
+        self._publish(rooms=rooms, connections=connections, full=True)
+
+    def _publish(self, rooms=None, connections=None, full=False):
+        if self.bus.broker is None:
+            return
+        self.bus.publish('presence', include_local=False, rooms=rooms or {},
+                         connections=connections, full=full)
+
+    def _apply_remote(self, message):
+        if message.get('sync'):
+            self._publish_counts()
+            return
+
+        with self._lock:
+            state = self._remote.setdefault(message['origin'], {'rooms': {}, 'connections': 0})
+            state['seen'] = time.monotonic()
+            if message.get('full'):
+                state['rooms'] = {}
+            for room, count in message['rooms'].items():
+                if count:
+                    state['rooms'][room] = count
+                else:
+                    state['rooms'].pop(room, None)
+            if message.get('connections') is not None:
+                state['connections'] = message['connections']
+
+    def snapshot(self):
+        with self._lock:
+            rooms = {room: len(members) for room, members in self._rooms.items()}
+            connections = len(self._sids)
+            states = self._live_states()
+            for state in states:
+                connections += state['connections']
+                for room, count in state['rooms'].items():
+                    rooms[room] = rooms.get(room, 0) + count
+
+        tables = {}
+        for room, count in rooms.items():
+            if room.startswith('table_'):
+                tables[room[len('table_'):]] = count
+        return {
+            'connections': connections,
+            'workers': len(states) + 1,
+            'rooms': dict(sorted(rooms.items())),
+            'tables': tables
+        }
+
+
+presence = PresenceRegistry()
+
+metrics.gauge('cafe_socket_connections', 'Connected Socket.IO clients across workers',
+              lambda: [({}, presence.snapshot()['connections'])])
+metrics.gauge('cafe_socket_room_members', 'Socket.IO room members across workers',
+              lambda: [({'room': room}, count) for room, count in presence.snapshot()['rooms'].items()])
@@ -0,0 +1,200 @@
+import cProfile
+import collections
+import itertools
+import pstats
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from flask import g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from app.instrumentation import request_stats
+
+# Ask for a profile with either of these; checked against the JWT
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_ARG = '_profile'
+OFF_VALUES = ('', '0', 'false', 'no', 'off')
+
+
+def _top(stats, sort, limit):
+    rows = []
+    for key, (primitive_calls, calls, own, cumulative, callers) in stats.items():
+        rows.append({
+            'function': pstats.func_std_string(key),
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3)
+        })
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:limit]
+
+
+def profile_offloaded(f):
+    """Profile ``f`` in the thread it is handed to, when the request is being profiled.
+
+    cProfile only sees the thread that enabled it, so a view that
+    ``offload_blocking`` runs in a ``tpool`` thread gets a profiler of its
+    own there; its stats are merged into the request's profile. Call this
+    on the request's thread, before handing ``f`` over.
+    """
+    active = g.get('profile')
+    if active is None:
+        return f
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the request's profiler already
+            return f(*args, **kwargs)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            profiler.disable()
+            active['offloaded'].append(profiler)
+
+    return decorated_function
+
+
+class RequestProfiler:
+    """Runs single admin requests under cProfile and keeps the last few results.
+
+    A request is profiled when it carries ``X-Profile: 1`` or ``?_profile=1``
+    and a valid admin token; its response then has an ``X-Profile-Id`` header.
+    Without an admin token the flag is ignored, and the admin lookup is left
+    out of the request's SQL counters so it doesn't count against the
+    endpoint's query budget. Requests without the flag only pay for a header
+    and query-string check. One request is
+    profiled at a time per worker; a second one asking meanwhile is served
+    normally with ``X-Profile-Id: busy``.
+
+    Under eventlet every greenlet shares the request's OS thread, so the
+    profile also holds whatever other greenlets ran in the meantime (socket
+    handlers, background tasks, the hub's own polling). Views offloaded to a
+    ``tpool`` thread are profiled in that thread and merged in; the profile's
+    ``offloaded`` field says when that happened.
+    """
+
+    def __init__(self, app=None):
+        self.top_functions = 25
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._profiles = collections.deque(maxlen=20)
+        self._ids = itertools.count(1)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.top_functions = app.config.get('PROFILE_TOP_FUNCTIONS', 25)
+        size = app.config.get('PROFILE_STORE_SIZE', 20)
+        with self._lock:
+            self._profiles = collections.deque(self._profiles, maxlen=size)
+
+        app.before_request(self.start)
+        app.after_request(self.finish)
+        app.teardown_request(self.discard)
+
+    def requested(self):
+        flags = (request.environ.get(PROFILE_HEADER), request.args.get(PROFILE_ARG))
+        return any(flag is not None and flag.strip().lower() not in OFF_VALUES for flag in flags)
+
+    def _admin(self):
+        from app.models.models import AdminUser
+
+        stats = request_stats()
+        before = dict(stats) if stats is not None else None
+        try:
+            verify_jwt_in_request()
+            return AdminUser.query.get(get_jwt_identity())
+        except Exception:
+            return None
+        finally:
+            if stats is not None:
+                stats.update(before)
+
+    def start(self):
+        if not self.requested():
+            return None
+        user = self._admin()
+        if user is None:
+            return None
+
+        if not self._busy.acquire(blocking=False):
+            g.profile_id = 'busy'
+            return None
+        stats = request_stats() or {'sql_statements': 0, 'sql_seconds': 0.0}
+        g.profile = {
+            'profiler': cProfile.Profile(),
+            'offloaded': [],
+            'user': user.username,
+            'sql_statements': stats['sql_statements'],
+            'sql_seconds': stats['sql_seconds'],
+            'started': time.perf_counter()
+        }
+        g.profile['profiler'].enable()
+        return None
+
+    def finish(self, response):
+        active = g.pop('profile', None)
+        if active is None:
+            if 'profile_id' in g:
+                response.headers['X-Profile-Id'] = g.profile_id
+            return response
+        try:
+            active['profiler'].disable()
+            elapsed = time.perf_counter() - active['started']
+            profile = self._record(active, response, elapsed)
+        finally:
+            self._busy.release()
+        response.headers['X-Profile-Id'] = str(profile['id'])
+        return response
+
+    def discard(self, exc=None):
+        # The response never made it to after_request
+        active = g.pop('profile', None)
+        if active is not None:
+            active['profiler'].disable()
+            self._busy.release()
+
+    def _record(self, active, response, elapsed):
+        stats = request_stats() or {'sql_statements': 0, 'sql_seconds': 0.0}
+        sql_seconds = stats['sql_seconds'] - active['sql_seconds']
+        profile_stats = pstats.Stats(active['profiler'], *active['offloaded']).stats
+        profile = {
+            'id': next(self._ids),
+            'recorded_at': datetime.utcnow().isoformat(),
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'user': active['user'],
+            'wall_ms': round(elapsed * 1000, 3),
+            'sql_ms': round(sql_seconds * 1000, 3),
+            'python_ms': round(max(elapsed - sql_seconds, 0) * 1000, 3),
+            'sql_statements': stats['sql_statements'] - active['sql_statements'],
+            'offloaded': bool(active['offloaded']),
+            'top_own': _top(profile_stats, 'own_ms', self.top_functions),
+            'top_cumulative': _top(profile_stats, 'cumulative_ms', self.top_functions)
+        }
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def summaries(self):
+        """Newest first, without the function tables."""
+        with self._lock:
+            profiles = list(reversed(self._profiles))
+        return [{key: value for key, value in profile.items() if not key.startswith('top_')}
+                for profile in profiles]
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile['id'] == profile_id:
+                    return profile
+        return None
+
+
+request_profiler = RequestProfiler()
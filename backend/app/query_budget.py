@@ -0,0 +1,81 @@
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, raiseload
+
+# Most SQL statements one request to each endpoint may issue with the menu
+# cache cold. Admin endpoints include the token's user lookup. Requests that
+# go over are logged, and test_query_budgets.py fails.
+QUERY_BUDGETS = {
+    'menu.get_menu': 1,
+    'menu.get_menu_item': 1,
+    'tables.validate_table': 1,
+    'tables.get_tables': 1,
+    'orders.get_order': 1,
+    'orders.get_table_orders': 2,
+    # Independent of the cart size; two of these only run on a fresh worker
+    # (loading the kitchen queue and the category -> station map)
+    'orders.place_order': 8,
+    'admin.get_active_orders': 2,
+    'admin.get_all_menu_items': 2,
+    'admin.get_admin_tables': 3,
+    'admin.get_dashboard_stats': 5,
+    'admin.get_order_history': 3,
+    # Includes writing re-estimated ETAs; two more on a fresh worker (loading
+    # the kitchen queue and the category -> station map)
+    'admin.update_order_status': 8,
+    # Independent of the batch size; includes writing re-estimated ETAs and
+    # the category -> station map on a fresh worker
+    'admin.bulk_update_order_status': 9,
+    'admin.get_daily_orders': 2,
+    # Includes the category -> station map on a fresh worker
+    'admin.get_station_orders': 3
+}
+
+
+class QueryCounter:
+    """Collects the SQL statements run on ``engine`` while it is active.
+
+    ::
+
+        with QueryCounter(db.engine) as queries:
+            client.get('/api/menu')
+        assert len(queries) <= 1, queries.statements
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def __len__(self):
+        return len(self.statements)
+
+
+def _raise_on_lazy_load(execute_state):
+    # Relationships a query did not load eagerly raise instead of issuing SQL
+    if (execute_state.is_select and has_app_context()
+            and current_app.config.get('SQLALCHEMY_LAZY_LOADS') == 'raise'):
+        execute_state.statement = execute_state.statement.options(raiseload('*', sql_only=True))
+
+
+def init_lazy_loads(app):
+    """With ``SQLALCHEMY_LAZY_LOADS = 'raise'`` an accidental lazy load raises.
+
+    Loads answered from the identity map (a many-to-one already in the
+    session) are still allowed; only lazy loads that would run SQL fail.
+    """
+    if app.config.get('SQLALCHEMY_LAZY_LOADS') == 'raise' and \
+            not event.contains(Session, 'do_orm_execute', _raise_on_lazy_load):
+        event.listen(Session, 'do_orm_execute', _raise_on_lazy_load)
@@ -1,8 +1,21 @@
 from flask import Blueprint, request, jsonify
-from app import db, socketio
-from app.models.models import MenuItem, Category, Table, Order, OrderItem
+from app import db
+from app.models.models import MenuItem, Category, Table, Order, OrderItem, OrderStatusHistory
 from app.utils import admin_required
+from app.broadcast import emit_scheduler, merge_diffs
+from app.concurrency import offload_blocking
+from app.kitchen import QUEUED_STATUSES, kitchen_queue, publish_kitchen_changes
+from app.stations import emit_station_tickets, station_for_category, station_names, station_room, station_tickets
+from app.versions import publish_menu_change
+from app.analytics import note_order_changed
+from app.cache import caches, invalidation_bus
+from app.presence import presence
+from app.slow_queries import slow_queries
+from app.profiling import request_profiler
 from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import joinedload, selectinload
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -46,7 +59,7 @@ def create_menu_item(current_user):
         db.session.commit()
         
         # Notify all clients about menu update
-        socketio.emit('menu_updated', room='customers')
+        emit_scheduler.emit('menu_updated', {'version': publish_menu_change()}, room='customers', key='menu')
         
         return jsonify({
             'success': True,
@@ -57,6 +70,38 @@ def create_menu_item(current_user):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def apply_menu_item_changes(item, data):
+    # Update fields if provided
+    if 'name' in data:
+        item.name = data['name']
+    if 'description' in data:
+        item.description = data['description']
+    if 'price' in data:
+        item.price = data['price']
+    if 'price_percent' in data:
+        factor = 1 + Decimal(str(data['price_percent'])) / 100
+        item.price = (Decimal(item.price) * factor).quantize(Decimal('0.01'))
+    if 'category_id' in data:
+        item.category_id = data['category_id']
+    if 'is_available' in data:
+        item.is_available = data['is_available']
+    
+    item.updated_at = datetime.utcnow()
+
+def menu_update_error(update):
+    """Why one entry of a bulk menu update is malformed, or None."""
+    if not isinstance(update, dict):
+        return 'Each update must be an object'
+    for field in ('id', 'category_id'):
+        if field in update and type(update[field]) is not int:
+            return f'{field} must be an integer'
+    for field in ('price', 'price_percent'):
+        if field in update and type(update[field]) not in (int, float):
+            return f'{field} must be a number'
+    if 'is_available' in update and not isinstance(update['is_available'], bool):
+        return 'is_available must be true or false'
+    return None
+
 @admin_bp.route('/menu-items/<int:item_id>', methods=['PUT'])
 @admin_required
 def update_menu_item(current_user, item_id):
@@ -64,29 +109,20 @@ def update_menu_item(current_user, item_id):
         item = MenuItem.query.get_or_404(item_id)
         data = request.get_json()
         
-        # Update fields if provided
-        if 'name' in data:
-            item.name = data['name']
-        if 'description' in data:
-            item.description = data['description']
-        if 'price' in data:
-            item.price = data['price']
-        if 'category_id' in data:
-            category = Category.query.get(data['category_id'])
-            if not category:
-                return jsonify({'error': 'Invalid category'}), 400
-            item.category_id = data['category_id']
-        if 'is_available' in data:
-            item.is_available = data['is_available']
-            # If item becomes unavailable, notify customers
-            if not data['is_available']:
-                socketio.emit('item_unavailable', {'item_id': item_id}, room='customers')
-        
-        item.updated_at = datetime.utcnow()
+        if 'category_id' in data and not Category.query.get(data['category_id']):
+            return jsonify({'error': 'Invalid category'}), 400
+        
+        apply_menu_item_changes(item, data)
         db.session.commit()
         
+        version = publish_menu_change()
+        
+        # If item becomes unavailable, notify customers
+        if data.get('is_available') is False:
+            emit_scheduler.emit('item_unavailable', {'item_id': item_id, 'version': version}, room='customers', key=item_id)
+        
         # Notify all clients about menu update
-        socketio.emit('menu_updated', room='customers')
+        emit_scheduler.emit('menu_updated', {'version': version}, room='customers', key='menu')
         
         return jsonify({
             'success': True,
@@ -97,6 +133,76 @@ def update_menu_item(current_user, item_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/menu-items', methods=['PUT'])
+@admin_required
+def bulk_update_menu_items(current_user):
+    try:
+        data = request.get_json()
+        
+        if not isinstance(data, dict) or not data.get('updates'):
+            return jsonify({'error': 'Updates required'}), 400
+        if not isinstance(data['updates'], list):
+            return jsonify({'error': 'Updates must be a list'}), 400
+        
+        updates = data['updates']
+        for update in updates:
+            error = menu_update_error(update)
+            if error:
+                return jsonify({'error': error}), 400
+        
+        # An update with an id changes one item; one with only a
+        # category_id changes every item in that category
+        item_ids = [update['id'] for update in updates if 'id' in update]
+        category_ids = [update['category_id'] for update in updates if 'id' not in update and 'category_id' in update]
+        if len(item_ids) + len(category_ids) != len(updates):
+            return jsonify({'error': 'Each update needs an item id or a category_id'}), 400
+        
+        # Load every targeted item with one query
+        items = MenuItem.query.filter(
+            or_(MenuItem.id.in_(item_ids), MenuItem.category_id.in_(category_ids))
+        ).all()
+        
+        missing = set(item_ids) - {item.id for item in items}
+        if missing:
+            return jsonify({'error': 'Menu items not found', 'item_ids': sorted(missing)}), 404
+        
+        referenced = {update['category_id'] for update in updates if 'category_id' in update}
+        known = {row.id for row in db.session.query(Category.id).filter(Category.id.in_(referenced)).all()}
+        if referenced - known:
+            return jsonify({'error': 'Invalid category'}), 400
+        
+        # Category-wide changes first, so per-item changes take precedence
+        by_id = {item.id: item for item in items}
+        by_category = {}
+        for item in items:
+            by_category.setdefault(item.category_id, []).append(item)
+        
+        changed = {}
+        for update in sorted(updates, key=lambda update: 'id' in update):
+            targets = [by_id[update['id']]] if 'id' in update else by_category.get(update['category_id'], [])
+            for item in targets:
+                apply_menu_item_changes(item, update)
+                changed[item.id] = item
+        db.session.commit()
+        
+        # One version bump and one consolidated event for the whole batch
+        version = publish_menu_change()
+        emit_scheduler.emit('menu_updated', {
+            'version': version,
+            'changed_item_ids': sorted(changed),
+            'unavailable_item_ids': sorted(item_id for item_id, item in changed.items() if not item.is_available)
+        }, room='customers')
+        
+        return jsonify({
+            'success': True,
+            'version': version,
+            'items': [item.to_dict() for item in changed.values()]
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/menu-items/<int:item_id>', methods=['DELETE'])
 @admin_required
 def delete_menu_item(current_user, item_id):
@@ -116,7 +222,7 @@ def delete_menu_item(current_user, item_id):
         db.session.commit()
         
         # Notify all clients about menu update
-        socketio.emit('menu_updated', room='customers')
+        emit_scheduler.emit('menu_updated', {'version': publish_menu_change()}, room='customers', key='menu')
         
         return jsonify({'success': True})
         
@@ -129,7 +235,10 @@ def delete_menu_item(current_user, item_id):
 @admin_required
 def get_active_orders(current_user):
     try:
-        orders = Order.query.filter(Order.status.in_(['pending', 'preparing', 'ready']))\
+        orders = Order.query.options(
+            joinedload(Order.table),
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter(Order.status.in_(['pending', 'preparing', 'ready']))\
             .order_by(Order.created_at.asc())\
             .all()
         
@@ -141,6 +250,35 @@ def get_active_orders(current_user):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+VALID_ORDER_STATUSES = ['pending', 'preparing', 'ready', 'completed']
+
+def apply_order_status(order, status, now, estimated_time=None):
+    """Change an order's status; returns the history row to insert, or None."""
+    # Record the transition so time spent in each status can be measured
+    transition = None
+    if order.status != status:
+        note_order_changed(order.created_at)
+        transition = {
+            'order_id': order.id,
+            'from_status': order.status,
+            'to_status': status,
+            'changed_at': now
+        }
+    
+    order.status = status
+    
+    if estimated_time is not None:
+        order.estimated_time = estimated_time
+    
+    order.updated_at = now
+    return transition
+
+def record_transitions(transitions):
+    # One executemany, without the per-row RETURNING the ORM would add
+    transitions = [transition for transition in transitions if transition]
+    if transitions:
+        db.session.execute(insert(OrderStatusHistory), transitions)
+
 @admin_bp.route('/orders/<int:order_id>/status', methods=['PUT'])
 @admin_required
 def update_order_status(current_user, order_id):
@@ -151,49 +289,304 @@ def update_order_status(current_user, order_id):
         if 'status' not in data:
             return jsonify({'error': 'Status required'}), 400
         
-        valid_statuses = ['pending', 'preparing', 'ready', 'completed']
-        if data['status'] not in valid_statuses:
+        if data['status'] not in VALID_ORDER_STATUSES:
             return jsonify({'error': 'Invalid status'}), 400
         
-        order.status = data['status']
+        before = order.state_dict()
+        now = datetime.utcnow()
+        record_transitions([apply_order_status(order, data['status'], now, data.get('estimated_time'))])
+        db.session.commit()
+        
+        # Reload with everything the broadcasts below serialize
+        order = Order.query.options(
+            joinedload(Order.table),
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter_by(id=order_id).one()
         
+        kitchen_changes = kitchen_queue.update_status(order, order.status, now)
         if 'estimated_time' in data:
-            order.estimated_time = data['estimated_time']
+            kitchen_queue.pin(order.id, order.estimated_time, kitchen_changes)
         
-        order.updated_at = datetime.utcnow()
-        db.session.commit()
+        # Only the changed fields; clients that missed a version reload the order
+        diff = order.to_diff(before)
         
         # Notify customer of status update
-        socketio.emit('order_status_updated', order.to_dict(), room=f'table_{order.table.table_number}')
+        emit_scheduler.emit('order_status_updated', diff, room=f'table_{order.table.table_number}',
+                            key=order.id, merge=merge_diffs)
         
         # Notify admin dashboard
-        socketio.emit('order_updated', order.to_dict(), room='admin')
+        emit_scheduler.emit('order_updated', diff, room='admin', key=order.id, merge=merge_diffs)
+        emit_station_tickets('order_updated', order)
+        
+        # Serialized before publish_kitchen_changes commits and expires it,
+        # which would reload the order; a re-estimated ETA is copied in
+        order_dict = order.to_dict()
+        if order.id in kitchen_changes['eta']:
+            order_dict['estimated_time'] = kitchen_changes['eta'][order.id][1]
+        
+        # Waiting orders moved up the queue and the prep list changed
+        publish_kitchen_changes(kitchen_changes)
         
         return jsonify({
             'success': True,
-            'order': order.to_dict()
+            'order': order_dict
         })
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/orders/status', methods=['PUT'])
+@admin_required
+def bulk_update_order_status(current_user):
+    try:
+        data = request.get_json()
+        
+        if not isinstance(data, dict) or not data.get('updates'):
+            return jsonify({'error': 'Updates required'}), 400
+        if not isinstance(data['updates'], list):
+            return jsonify({'error': 'Updates must be a list'}), 400
+        
+        updates = {}
+        for update in data['updates']:
+            order_id = update.get('order_id') if isinstance(update, dict) else None
+            if type(order_id) is not int or update.get('status') not in VALID_ORDER_STATUSES:
+                return jsonify({'error': 'Each update needs an integer order_id and a valid status'}), 400
+            if order_id in updates:
+                return jsonify({'error': 'Duplicate order_id', 'order_id': order_id}), 400
+            updates[order_id] = update
+        
+        # Validate every order with one query, loading what to_dict needs
+        orders = Order.query.options(
+            joinedload(Order.table),
+            selectinload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter(Order.id.in_(list(updates))).all()
+        
+        missing = set(updates) - {order.id for order in orders}
+        if missing:
+            return jsonify({'error': 'Orders not found', 'order_ids': sorted(missing)}), 404
+        
+        before = {order.id: order.state_dict() for order in orders}
+        now = datetime.utcnow()
+        record_transitions([
+            apply_order_status(order, updates[order.id]['status'], now, updates[order.id].get('estimated_time'))
+            for order in orders
+        ])
+        db.session.commit()
+        
+        # The commit expired them; reload with their items in one query
+        orders = Order.query.options(
+            joinedload(Order.table),
+            selectinload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter(Order.id.in_(list(updates))).all()
+        
+        kitchen_changes = {'eta': {}, 'prep_counts': {}, 'events': []}
+        for order in orders:
+            changes = kitchen_queue.update_status(order, order.status, now)
+            kitchen_changes['eta'].update(changes['eta'])
+            kitchen_changes['prep_counts'].update(changes['prep_counts'])
+            kitchen_changes['events'].extend(changes['events'])
+            if updates[order.id].get('estimated_time') is not None:
+                kitchen_queue.pin(order.id, order.estimated_time, kitchen_changes)
+        # Orders that left the queue later in the batch need no new ETA
+        for order in orders:
+            if order.status not in QUEUED_STATUSES:
+                kitchen_changes['eta'].pop(order.id, None)
+        
+        # One batched frame per table, per station and for the admin room
+        diffs = [order.to_diff(before[order.id]) for order in orders]
+        by_table = {}
+        for diff in diffs:
+            by_table.setdefault(diff['table_number'], []).append(diff)
+        for table_number, table_diffs in by_table.items():
+            emit_scheduler.emit('orders_status_updated', {'orders': table_diffs}, room=f'table_{table_number}')
+        
+        emit_scheduler.emit('orders_updated', {'orders': diffs}, room='admin')
+        
+        by_station = {}
+        for order in orders:
+            for station, ticket in station_tickets(order).items():
+                by_station.setdefault(station, []).append(ticket)
+        for station, tickets in by_station.items():
+            emit_scheduler.emit('orders_updated', {'orders': tickets}, room=station_room(station))
+        
+        # Serialized before publish_kitchen_changes commits and expires them,
+        # which would reload each order on its own; re-estimated ETAs are copied in
+        order_dicts = [order.to_dict() for order in orders]
+        for order_dict in order_dicts:
+            if order_dict['id'] in kitchen_changes['eta']:
+                order_dict['estimated_time'] = kitchen_changes['eta'][order_dict['id']][1]
+        
+        publish_kitchen_changes(kitchen_changes)
+        
+        return jsonify({
+            'success': True,
+            'orders': order_dicts
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/orders/<int:order_id>/history', methods=['GET'])
+@admin_required
+def get_order_history(current_user, order_id):
+    try:
+        order = Order.query.get_or_404(order_id)
+        history = OrderStatusHistory.query.filter_by(order_id=order.id)\
+            .order_by(OrderStatusHistory.changed_at.asc())\
+            .all()
+        
+        return jsonify({
+            'success': True,
+            'order_id': order.id,
+            'created_at': order.created_at.isoformat(),
+            'history': [entry.to_dict() for entry in history]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/stations', methods=['GET'])
+@admin_required
+def get_stations(current_user):
+    return jsonify({
+        'success': True,
+        'stations': station_names()
+    })
+
+@admin_bp.route('/stations/<station>/orders', methods=['GET'])
+@admin_required
+def get_station_orders(current_user, station):
+    try:
+        if station not in station_names():
+            return jsonify({'error': 'Unknown station'}), 404
+        
+        orders = Order.query.options(
+            joinedload(Order.table),
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter(Order.status.in_(['pending', 'preparing', 'ready']))\
+            .order_by(Order.created_at.asc())\
+            .all()
+        
+        # Snapshot for a station display joining its room
+        tickets = []
+        for order in orders:
+            ticket = station_tickets(order).get(station)
+            if ticket:
+                tickets.append(ticket)
+        
+        return jsonify({
+            'success': True,
+            'station': station,
+            'orders': tickets
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/kitchen/prep-list', methods=['GET'])
+@admin_required
+def get_prep_list(current_user):
+    try:
+        items = kitchen_queue.prep_list()
+        
+        station = request.args.get('station')
+        if station:
+            items = [item for item in items if station_for_category(item['category_id']) == station]
+        
+        return jsonify({
+            'success': True,
+            'items': items
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats(current_user):
+    return jsonify({
+        'success': True,
+        'bus': invalidation_bus.stats(),
+        'caches': [cache.stats() for cache in caches.values()]
+    })
+
+@admin_bp.route('/kitchen/queue', methods=['GET'])
+@admin_required
+def get_kitchen_queue(current_user):
+    try:
+        return jsonify({
+            'success': True,
+            'queue': kitchen_queue.snapshot()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/presence', methods=['GET'])
+@admin_required
+def get_presence(current_user):
+    return jsonify({
+        'success': True,
+        'presence': presence.snapshot()
+    })
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries(current_user):
+    limit = request.args.get('limit', type=int)
+    endpoint = request.args.get('endpoint')
+    return jsonify({
+        'success': True,
+        'threshold_seconds': slow_queries.threshold,
+        'queries': slow_queries.entries(endpoint=endpoint, limit=limit)
+    })
+
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@admin_required
+def clear_slow_queries(current_user):
+    slow_queries.clear()
+    return jsonify({'success': True})
+
+@admin_bp.route('/profiles', methods=['GET'])
+@admin_required
+def get_profiles(current_user):
+    return jsonify({
+        'success': True,
+        'profiles': request_profiler.summaries()
+    })
+
+@admin_bp.route('/profiles/<int:profile_id>', methods=['GET'])
+@admin_required
+def get_profile(current_user, profile_id):
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify({
+        'success': True,
+        'profile': profile
+    })
+
 # Table Management
 @admin_bp.route('/tables', methods=['GET'])
 @admin_required
 def get_admin_tables(current_user):
     try:
+        from sqlalchemy import func
+        
         tables = Table.query.order_by(Table.table_number).all()
         
-        # Add order count for each table
+        # Active order count for every table in one grouped query
+        active_counts = dict(db.session.query(Order.table_id, func.count(Order.id))
+            .filter(Order.status.in_(['pending', 'preparing', 'ready']))
+            .group_by(Order.table_id)
+            .all())
+        
         table_data = []
         for table in tables:
-            active_orders = Order.query.filter_by(table_id=table.id)\
-                .filter(Order.status.in_(['pending', 'preparing', 'ready']))\
-                .count()
-            
             table_dict = table.to_dict()
-            table_dict['active_orders'] = active_orders
+            table_dict['active_orders'] = active_counts.get(table.id, 0)
             table_data.append(table_dict)
         
         return jsonify({
@@ -263,6 +656,7 @@ def delete_table(current_user, table_id):
 # Dashboard Stats
 @admin_bp.route('/dashboard/stats', methods=['GET'])
 @admin_required
+@offload_blocking
 def get_dashboard_stats(current_user):
     try:
         from sqlalchemy import func
@@ -305,6 +699,7 @@ def get_dashboard_stats(current_user):
 # Analytics Routes
 @admin_bp.route('/analytics/sales-by-hour', methods=['GET'])
 @admin_required
+@offload_blocking
 def get_sales_by_hour(current_user):
     try:
         from sqlalchemy import func, text
@@ -339,6 +734,7 @@ def get_sales_by_hour(current_user):
 
 @admin_bp.route('/analytics/product-performance', methods=['GET'])
 @admin_required
+@offload_blocking
 def get_product_performance(current_user):
     try:
         from sqlalchemy import func
@@ -384,6 +780,7 @@ def get_product_performance(current_user):
 
 @admin_bp.route('/analytics/daily-trends', methods=['GET'])
 @admin_required
+@offload_blocking
 def get_daily_trends(current_user):
     try:
         from sqlalchemy import func
@@ -419,6 +816,7 @@ def get_daily_trends(current_user):
 
 @admin_bp.route('/analytics/category-performance', methods=['GET'])
 @admin_required
+@offload_blocking
 def get_category_performance(current_user):
     try:
         from sqlalchemy import func
@@ -456,9 +854,30 @@ def get_category_performance(current_user):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/analytics/prep-times', methods=['GET'])
+@admin_required
+@offload_blocking
+def get_prep_times(current_user):
+    try:
+        from app.analytics import prep_time_report
+        
+        days_back = int(request.args.get('days', 30))
+        end_date = datetime.utcnow().date()
+        start_date = end_date - timedelta(days=days_back)
+        
+        # Minutes from order placement to ready, as p50/p90/p99
+        return jsonify({
+            'success': True,
+            'data': prep_time_report(start_date, end_date)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Additional Analytics Endpoints for Interactive Dashboard
 @admin_bp.route('/analytics/revenue-detail', methods=['GET'])
 @admin_required
+@offload_blocking
 def get_revenue_detail(current_user):
     try:
         from sqlalchemy import func, extract
@@ -543,7 +962,10 @@ def get_daily_orders(current_user):
         today = datetime.utcnow().date()
         
         # Get today's orders with items
-        orders = Order.query.filter(
+        orders = Order.query.options(
+            joinedload(Order.table),
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter(
             func.date(Order.created_at) == today
         ).order_by(Order.created_at.desc()).all()
         
@@ -551,15 +973,15 @@ def get_daily_orders(current_user):
         for order in orders:
             order_dict = {
                 'id': order.id,
-                'table_number': order.table_number,
+                'table_number': order.table.table_number,
                 'status': order.status,
-                'total_amount': float(order.total_amount),
+                'total_amount': float(order.total_amount or 0),
                 'created_at': order.created_at.isoformat(),
                 'items': []
             }
             
             # Get order items
-            for item in order.items:
+            for item in order.order_items:
                 order_dict['items'].append({
                     'name': item.menu_item.name,
                     'quantity': item.quantity,
@@ -1,24 +1,37 @@
 from flask import Blueprint, jsonify
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models.models import Category, MenuItem
+from app.versions import menu_version
+from app.cache import VersionedCache
 
 menu_bp = Blueprint('menu', __name__)
 
+# Serialized menu, cleared on every worker when the menu version is bumped
+menu_cache = VersionedCache('menu', topic='menu')
+
+def load_menu():
+    categories = Category.query.options(joinedload(Category.menu_items))\
+        .order_by(Category.display_order).all()
+    
+    menu_data = []
+    for category in categories:
+        # Only include available items
+        available_items = [item for item in category.menu_items if item.is_available]
+        if available_items:  # Only include categories that have available items
+            category_dict = category.to_dict()
+            menu_data.append(category_dict)
+    return menu_data
+
 @menu_bp.route('/menu', methods=['GET'])
 def get_menu():
     try:
-        categories = Category.query.order_by(Category.display_order).all()
-        
-        menu_data = []
-        for category in categories:
-            # Only include available items
-            available_items = [item for item in category.menu_items if item.is_available]
-            if available_items:  # Only include categories that have available items
-                category_dict = category.to_dict()
-                menu_data.append(category_dict)
+        version = menu_version.value
+        menu_data = menu_cache.get_or_load('categories', load_menu)
         
         return jsonify({
             'success': True,
+            'version': version,
             'categories': menu_data
         })
         
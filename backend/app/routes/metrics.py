@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, request, jsonify, current_app
+from app.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Scrapers authenticate with a static bearer token when METRICS_TOKEN is set
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from app import db, socketio
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from app import db
 from app.models.models import Order, OrderItem, MenuItem, Table
+from app.kitchen import kitchen_queue, lanes_for, publish_kitchen_changes
+from app.stations import emit_station_tickets
+from app.broadcast import emit_scheduler
+from app.tracing import tracer
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -16,55 +22,88 @@ def place_order():
         table_number = data.get('table_number')
         items_data = data.get('items')
         
-        # Validate table
-        table = Table.query.filter_by(table_number=table_number, is_active=True).first()
-        if not table:
-            return jsonify({'error': 'Invalid table number'}), 400
-        
-        # Check if there's a recent order (prevent duplicate orders within 2 minutes)
-        recent_order = Order.query.filter_by(table_id=table.id)\
-            .filter(Order.created_at > datetime.utcnow() - timedelta(minutes=2))\
-            .filter(Order.status.in_(['pending', 'preparing']))\
-            .first()
-        
-        if recent_order:
-            return jsonify({'error': 'Please wait before placing another order'}), 429
+        with tracer.span('validate'):
+            # Validate table
+            table = Table.query.filter_by(table_number=table_number, is_active=True).first()
+            if not table:
+                return jsonify({'error': 'Invalid table number'}), 400
+            
+            # Check if there's a recent order (prevent duplicate orders within 2 minutes)
+            recent_order = Order.query.filter_by(table_id=table.id)\
+                .filter(Order.created_at > datetime.utcnow() - timedelta(minutes=2))\
+                .filter(Order.status.in_(['pending', 'preparing']))\
+                .first()
+            
+            if recent_order:
+                return jsonify({'error': 'Please wait before placing another order'}), 429
         
-        # Create new order
-        order = Order(table_id=table.id, status='pending', estimated_time=15)
-        db.session.add(order)
-        db.session.flush()  # Get the order ID
+        # Load the kitchen queue before this order is flushed into the session
+        kitchen_queue.ensure_loaded()
         
         total_amount = 0
+        order_items = []
+        lines = []
         
-        # Add order items
-        for item_data in items_data:
-            if not item_data.get('menu_item_id') or not item_data.get('quantity'):
+        # Validate order items
+        with tracer.span('add_items', items=len(items_data)):
+            if not all(item_data.get('menu_item_id') and item_data.get('quantity') for item_data in items_data):
                 return jsonify({'error': 'Invalid item data'}), 400
             
-            menu_item = MenuItem.query.get(item_data['menu_item_id'])
-            if not menu_item or not menu_item.is_available:
-                return jsonify({'error': f'Menu item {item_data["menu_item_id"]} not available'}), 400
-            
-            quantity = item_data['quantity']
-            if quantity <= 0:
-                return jsonify({'error': 'Invalid quantity'}), 400
+            # Every line's menu item in one query, however big the cart
+            menu_items = MenuItem.query.filter(
+                MenuItem.id.in_({item_data['menu_item_id'] for item_data in items_data})
+            ).all()
+            menu_items = {menu_item.id: menu_item for menu_item in menu_items}
             
-            order_item = OrderItem(
-                order_id=order.id,
-                menu_item_id=menu_item.id,
-                quantity=quantity,
-                price_at_time=menu_item.price
-            )
-            
-            db.session.add(order_item)
-            total_amount += float(menu_item.price) * quantity
-        
-        order.total_amount = total_amount
+            for item_data in items_data:
+                menu_item = menu_items.get(item_data['menu_item_id'])
+                if not menu_item or not menu_item.is_available:
+                    return jsonify({'error': f'Menu item {item_data["menu_item_id"]} not available'}), 400
+                
+                quantity = item_data['quantity']
+                if quantity <= 0:
+                    return jsonify({'error': 'Invalid quantity'}), 400
+                
+                order_items.append({
+                    'menu_item_id': menu_item.id,
+                    'quantity': quantity,
+                    'price_at_time': menu_item.price
+                })
+                total_amount += float(menu_item.price) * quantity
+                lines.append({
+                    'menu_item_id': menu_item.id,
+                    'name': menu_item.name,
+                    'category_id': menu_item.category_id,
+                    'quantity': quantity
+                })
+        
+        # Create new order, then all its lines in one executemany
+        order = Order(
+            table_id=table.id,
+            status='pending',
+            total_amount=total_amount,
+            estimated_time=kitchen_queue.estimate(lanes_for(lines))
+        )
+        db.session.add(order)
+        db.session.flush()  # Get the order ID
+        order_id = order.id
+        db.session.execute(insert(OrderItem), [dict(item, order_id=order_id) for item in order_items])
         db.session.commit()
         
+        # Reload with everything the broadcasts below serialize
+        order = Order.query.options(
+            joinedload(Order.table),
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter_by(id=order_id).one()
+        
+        kitchen_changes = kitchen_queue.add(order.id, table.table_number, order.created_at, lines, order.estimated_time)
+        
         # Emit to admin dashboard
-        socketio.emit('new_order', order.to_dict(), room='admin')
+        emit_scheduler.emit('new_order', order.to_dict, room='admin', key=order.id)
+        
+        # Each prep station only gets its own line items
+        emit_station_tickets('new_order', order)
+        publish_kitchen_changes(kitchen_changes)
         
         return jsonify({
             'success': True,
@@ -81,7 +120,10 @@ def place_order():
 @orders_bp.route('/orders/<int:order_id>', methods=['GET'])
 def get_order(order_id):
     try:
-        order = Order.query.get_or_404(order_id)
+        order = Order.query.options(
+            joinedload(Order.table),
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter_by(id=order_id).first_or_404()
         
         return jsonify({
             'success': True,
@@ -99,7 +141,9 @@ def get_table_orders(table_number):
             return jsonify({'error': 'Table not found'}), 404
         
         # Get active orders for this table
-        orders = Order.query.filter_by(table_id=table.id)\
+        orders = Order.query.options(
+            joinedload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter_by(table_id=table.id)\
             .filter(Order.status.in_(['pending', 'preparing', 'ready']))\
             .order_by(Order.created_at.desc())\
             .all()
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from flask import current_app
+
+# Rooms whose clients may ask for MessagePack frames
+BINARY_ROOM_PREFIXES = ('admin', 'station_')
+
+# Payload keys rewritten for binary frames: ISO timestamps become epoch
+# milliseconds (``created_at`` -> ``created_at_ms``) and prices become
+# integer cents (``total_amount`` -> ``total_amount_cents``)
+TIMESTAMP_KEYS = {'created_at', 'updated_at', 'changed_at'}
+MONEY_KEYS = {'price', 'price_at_time', 'subtotal', 'total_amount'}
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def _epoch_ms(key, value):
+    return f'{key}_ms', (datetime.fromisoformat(value) - _EPOCH) // _MILLISECOND
+
+
+def _cents(key, value):
+    return f'{key}_cents', int(round(value * 100))
+
+
+_REWRITES = {**dict.fromkeys(TIMESTAMP_KEYS, _epoch_ms), **dict.fromkeys(MONEY_KEYS, _cents)}
+
+
+def msgpack_enabled():
+    return current_app.config.get('SOCKETIO_MSGPACK', False)
+
+
+def binary_room(room):
+    """Room joined by clients of ``room`` that take MessagePack frames."""
+    return f'{room}:msgpack'
+
+
+def has_binary_room(room):
+    return room.startswith(BINARY_ROOM_PREFIXES)
+
+
+def compact(value):
+    """Rewrite a JSON-style payload with epoch-ms timestamps and integer cents."""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            rewrite = _REWRITES.get(key)
+            if rewrite is not None and item is not None:
+                key, item = rewrite(key, item)
+            elif isinstance(item, (dict, list)):
+                item = compact(item)
+            result[key] = item
+        return result
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+
+def pack(data):
+    """MessagePack bytes for a socket payload; sent as a binary attachment."""
+    import msgpack
+
+    return msgpack.packb(compact(data))
+
+
+def unpack(payload):
+    import msgpack
+
+    return msgpack.unpackb(payload)
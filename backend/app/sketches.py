@@ -0,0 +1,63 @@
+import math
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch style).
+
+    Quantiles are accurate to within ``relative_accuracy`` of the true value,
+    and two sketches built with the same accuracy can be merged by adding
+    their bucket counts, so per-day sketches combine into any window.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches with different accuracy')
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return max(self.min, min(self.max, value))
+        return self.max
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        data = {'count': self.count}
+        for q in quantiles:
+            value = self.quantile(q)
+            data[f'p{int(round(q * 100))}'] = round(value, 2) if value is not None else None
+        return data
@@ -0,0 +1,126 @@
+import collections
+import itertools
+import logging
+import threading
+from datetime import datetime
+from app.metrics import metrics
+
+log = logging.getLogger('cafe.sql')
+
+slow_statements_total = metrics.counter(
+    'cafe_sql_slow_statements_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD',
+    ('endpoint',))
+
+# Only statements that read are explained; EXPLAIN without ANALYZE never
+# runs the query, but there is nothing to learn from an INSERT's plan
+_EXPLAINABLE = ('select', 'with')
+
+
+def _jsonable(parameters):
+    if isinstance(parameters, dict):
+        return {key: _jsonable(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_jsonable(value) for value in parameters]
+    if parameters is None or isinstance(parameters, (bool, int, float, str)):
+        return parameters
+    return str(parameters)
+
+
+class SlowQueryLog:
+    """The most recent statements that took longer than ``SLOW_QUERY_THRESHOLD`` seconds.
+
+    Fed by the cursor hooks in ``app.instrumentation``. Each entry keeps the
+    statement, its parameters, the endpoint that ran it and the query plan,
+    read on the same connection right after the statement returned
+    (``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN`` elsewhere).
+    """
+
+    def __init__(self, app=None):
+        self.threshold = None
+        self.explain = True
+        self._lock = threading.Lock()
+        self._entries = collections.deque(maxlen=100)
+        self._ids = itertools.count(1)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.threshold = app.config.get('SLOW_QUERY_THRESHOLD')
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        size = app.config.get('SLOW_QUERY_LOG_SIZE', 100)
+        with self._lock:
+            self._entries = collections.deque(self._entries, maxlen=size)
+
+    def is_slow(self, elapsed):
+        return self.threshold is not None and elapsed >= self.threshold
+
+    def record(self, conn, statement, parameters, executemany, elapsed, endpoint):
+        if executemany:
+            # Keep the first row; the rest share its plan
+            count = len(parameters)
+            parameters = parameters[0] if parameters else None
+        else:
+            count = 1
+
+        plan = None
+        if self.explain and not executemany and statement.lstrip().lower().startswith(_EXPLAINABLE):
+            plan = self._explain(conn, statement, parameters)
+
+        entry = {
+            'id': next(self._ids),
+            'recorded_at': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 3),
+            'endpoint': endpoint,
+            'statement': statement,
+            'parameters': _jsonable(parameters),
+            'rows': count,
+            'plan': plan
+        }
+        with self._lock:
+            self._entries.append(entry)
+        slow_statements_total.inc(endpoint)
+        log.warning('slow query', extra={'endpoint': endpoint, 'duration_ms': entry['duration_ms'],
+                                         'statement': ' '.join(statement.split())[:200]})
+
+    def _explain(self, conn, statement, parameters):
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        # This runs inside the request's own transaction. On PostgreSQL any
+        # failed statement aborts it, so the EXPLAIN goes in a savepoint that
+        # is rolled back on failure and the request's next statement still works
+        savepoint = conn.dialect.name == 'postgresql'
+        # A raw DBAPI cursor, so the EXPLAIN itself is neither timed nor recorded
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute('SAVEPOINT cafe_explain')
+            try:
+                cursor.execute(prefix + statement, parameters or ())
+                # SQLite rows end with the detail text, PostgreSQL has one text column
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            except Exception:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT cafe_explain')
+                raise
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT cafe_explain')
+            return plan
+        except Exception as e:
+            log.warning('explain failed', extra={'error': str(e)})
+            return None
+        finally:
+            cursor.close()
+
+    def entries(self, endpoint=None, limit=None):
+        """Newest first, optionally only those recorded for one endpoint."""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        if endpoint:
+            entries = [entry for entry in entries if entry['endpoint'] == endpoint]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_queries = SlowQueryLog()
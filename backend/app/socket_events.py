@@ -1,42 +1,114 @@
+import logging
 from flask import request
 from flask_socketio import emit, join_room, leave_room
+from sqlalchemy.orm import joinedload, selectinload
 from app import socketio
+from app.models.models import Order, OrderItem, Table
+from app.stations import station_names, station_room
+from app.serializers import binary_room, msgpack_enabled, pack
+from app.presence import presence
+from app.tracing import tracer
+from app.capture import traffic_capture
+
+log = logging.getLogger('cafe.socket')
+# Connects and disconnects come in bursts when phones reconnect; sampled by LOG_SAMPLE_RATES
+connection_log = logging.getLogger('cafe.socket.connection')
+
+# Orders a table or the admin dashboard still shows
+ACTIVE_STATUSES = ['pending', 'preparing', 'ready']
+
+def enter_room(room):
+    join_room(room)
+    presence.join(request.sid, room)
+
+def exit_room(room):
+    leave_room(room)
+    presence.leave(request.sid, room)
+
+def wants_msgpack(data):
+    return msgpack_enabled() and (data or {}).get('encoding') == 'msgpack'
+
+def emit_orders_snapshot(query, binary=False):
+    # Full state on join; after that the client only receives diffs
+    orders = query.options(
+        joinedload(Order.table),
+        selectinload(Order.order_items).joinedload(OrderItem.menu_item)
+    ).filter(Order.status.in_(ACTIVE_STATUSES)).order_by(Order.created_at.asc()).all()
+    snapshot = {'orders': [order.to_dict() for order in orders]}
+    emit('orders_snapshot', pack(snapshot) if binary else snapshot)
 
 @socketio.on('connect')
+@traffic_capture.socket_event
 def handle_connect():
-    print(f'Client connected: {request.sid}')
+    presence.connect(request.sid)
+    connection_log.info('client connected', extra={'sid': request.sid})
 
 @socketio.on('disconnect')
+@traffic_capture.socket_event
 def handle_disconnect():
-    print(f'Client disconnected: {request.sid}')
+    presence.disconnect(request.sid)
+    connection_log.info('client disconnected', extra={'sid': request.sid})
 
 @socketio.on('join_table')
+@traffic_capture.socket_event
 def handle_join_table(data):
     table_number = data.get('table_number')
     if table_number:
         room = f'table_{table_number}'
-        join_room(room)
-        print(f'Client {request.sid} joined table {table_number}')
+        enter_room(room)
+        log.info('joined table', extra={'sid': request.sid, 'table_number': table_number})
+        emit_orders_snapshot(Order.query.join(Table).filter(Table.table_number == table_number))
 
 @socketio.on('leave_table')
+@traffic_capture.socket_event
 def handle_leave_table(data):
     table_number = data.get('table_number')
     if table_number:
         room = f'table_{table_number}'
-        leave_room(room)
-        print(f'Client {request.sid} left table {table_number}')
+        exit_room(room)
+        log.info('left table', extra={'sid': request.sid, 'table_number': table_number})
 
 @socketio.on('join_admin')
-def handle_join_admin():
-    join_room('admin')
-    print(f'Admin {request.sid} joined admin room')
+@traffic_capture.socket_event
+def handle_join_admin(data=None):
+    # {"encoding": "msgpack"} asks for binary frames when SOCKETIO_MSGPACK is on
+    binary = wants_msgpack(data)
+    enter_room(binary_room('admin') if binary else 'admin')
+    log.info('joined admin', extra={'sid': request.sid, 'binary': binary})
+    emit_orders_snapshot(Order.query, binary)
 
 @socketio.on('leave_admin')
+@traffic_capture.socket_event
 def handle_leave_admin():
-    leave_room('admin')
-    print(f'Admin {request.sid} left admin room')
+    exit_room('admin')
+    exit_room(binary_room('admin'))
+    log.info('left admin', extra={'sid': request.sid})
 
 @socketio.on('join_customers')
+@traffic_capture.socket_event
 def handle_join_customers():
-    join_room('customers')
-    print(f'Customer {request.sid} joined customers room')
\ No newline at end of file
+    enter_room('customers')
+    log.info('joined customers', extra={'sid': request.sid})
+
+@socketio.on('join_station')
+@traffic_capture.socket_event
+def handle_join_station(data):
+    station = data.get('station')
+    if station in station_names():
+        room = station_room(station)
+        enter_room(binary_room(room) if wants_msgpack(data) else room)
+        log.info('joined station', extra={'sid': request.sid, 'station': station})
+
+@socketio.on('leave_station')
+@traffic_capture.socket_event
+def handle_leave_station(data):
+    station = data.get('station')
+    if station:
+        exit_room(station_room(station))
+        exit_room(binary_room(station_room(station)))
+        log.info('left station', extra={'sid': request.sid, 'station': station})
+
+@socketio.on('trace_received')
+def handle_trace_received(data):
+    # Sent back by clients for events carrying {"traceparent", "sent_at"}
+    tracer.record_delivery((data or {}).get('traceparent'), (data or {}).get('sent_at'), request.sid)
@@ -0,0 +1,86 @@
+from flask import current_app
+from app import db
+from app.broadcast import emit_scheduler
+from app.cache import invalidation_bus
+
+# category_id -> station, filled on first use and refreshed on unknown ids,
+# on any menu change (categories may have been renamed) and when the
+# station config it was built from changes
+_category_stations = {}
+_loaded_config = {}
+
+
+def station_names():
+    config = current_app.config
+    names = list(config['PREP_STATIONS'])
+    if config['DEFAULT_PREP_STATION'] not in names:
+        names.append(config['DEFAULT_PREP_STATION'])
+    return names
+
+
+def station_room(station):
+    return f'station_{station}'
+
+
+def _load_category_stations():
+    from app.models.models import Category
+
+    by_name = {}
+    for station, category_names in current_app.config['PREP_STATIONS'].items():
+        for name in category_names:
+            by_name[name] = station
+
+    default = current_app.config['DEFAULT_PREP_STATION']
+    _category_stations.clear()
+    for category_id, name in db.session.query(Category.id, Category.name).all():
+        _category_stations[category_id] = by_name.get(name, default)
+    _loaded_config.clear()
+    _loaded_config.update(_station_config())
+
+
+def _station_config():
+    config = current_app.config
+    return {'stations': config['PREP_STATIONS'], 'default': config['DEFAULT_PREP_STATION']}
+
+
+def clear_category_stations(message=None):
+    _category_stations.clear()
+
+
+invalidation_bus.subscribe('menu', clear_category_stations)
+invalidation_bus.on_resubscribe(clear_category_stations)
+
+
+def station_for_category(category_id):
+    if category_id not in _category_stations or _loaded_config != _station_config():
+        _load_category_stations()
+    return _category_stations.get(category_id, current_app.config['DEFAULT_PREP_STATION'])
+
+
+def station_tickets(order):
+    """Split an order into one ticket per prep station, each with only its own line items."""
+    tickets = {}
+    for item in order.order_items:
+        station = station_for_category(item.menu_item.category_id)
+        ticket = tickets.get(station)
+        if ticket is None:
+            ticket = tickets[station] = {
+                'order_id': order.id,
+                'table_number': order.table.table_number,
+                'station': station,
+                'status': order.status,
+                'estimated_time': order.estimated_time,
+                'created_at': order.created_at.isoformat(),
+                'items': []
+            }
+        ticket['items'].append({
+            'menu_item_id': item.menu_item_id,
+            'menu_item_name': item.menu_item.name,
+            'quantity': item.quantity
+        })
+    return tickets
+
+
+def emit_station_tickets(event, order):
+    for station, ticket in station_tickets(order).items():
+        emit_scheduler.emit(event, ticket, room=station_room(station), key=order.id)
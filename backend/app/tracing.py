@@ -0,0 +1,293 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import socketio
+
+log = logging.getLogger('cafe.tracing')
+
+# W3C trace context: version-traceid-spanid-flags
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+
+# Finished spans waiting for the exporter; beyond this they are dropped
+MAX_PENDING_SPANS = 10000
+
+
+def _new_id(size):
+    return os.urandom(size).hex()
+
+
+def parse_traceparent(value):
+    match = TRACEPARENT.match(value or '')
+    return match.groups() if match else None
+
+
+def _attribute(key, value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return {'key': key, 'value': {'intValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error',
+                 'kind')
+
+    def __init__(self, name, trace_id, parent_id=None, start_ns=None, attributes=None, kind=INTERNAL):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+        self.kind = kind
+
+    @property
+    def traceparent(self):
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class FileExporter:
+    """Appends one OTLP/JSON export request per line."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, payload):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(payload) + '\n')
+
+
+class OtlpHttpExporter:
+    """Posts OTLP/JSON to a collector's ``/v1/traces`` endpoint."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, payload):
+        body = json.dumps(payload).encode()
+        req = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+def make_exporter(target):
+    if not target:
+        return None
+    if target.startswith(('http://', 'https://')):
+        return OtlpHttpExporter(target)
+    return FileExporter(target[len('file://'):] if target.startswith('file://') else target)
+
+
+class Tracer:
+    """Request spans, exported in batches as OTLP/JSON.
+
+    With ``TRACE_EXPORT`` set (a file path or a collector URL) every sampled
+    request gets a root span, continuing an incoming ``traceparent`` header.
+    Code inside the request adds children with ``tracer.span(name)``, and
+    session flushes and commits get ``db.flush``/``db.commit`` spans. Socket
+    events queued during a request carry the trace to the client (see
+    ``EmitScheduler``), which may acknowledge them with ``trace_received``
+    so delivery shows up as a span too. Outside a traced request every call
+    here is a no-op.
+    """
+
+    def __init__(self, app=None):
+        self.exporter = None
+        self.sample_rate = 1.0
+        self.interval = 1.0
+        self.service = 'virtual-cafe'
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._finished = []
+        self._task = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.exporter = make_exporter(app.config.get('TRACE_EXPORT'))
+        self.sample_rate = app.config.get('TRACE_SAMPLE_RATE', 1.0)
+        self.interval = app.config.get('TRACE_EXPORT_INTERVAL', 1.0)
+        self.service = app.config.get('TRACE_SERVICE_NAME', self.service)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def current(self):
+        if not has_request_context():
+            return None
+        spans = g.get('trace_spans')
+        return spans[-1] if spans else None
+
+    def start_span(self, name, **attributes):
+        parent = self.current()
+        if parent is None:
+            return None
+        span = Span(name, parent.trace_id, parent.span_id, attributes=attributes)
+        g.trace_spans.append(span)
+        return span
+
+    def end_span(self, name, error=None):
+        spans = g.get('trace_spans') if has_request_context() else None
+        # The root span is only ended by the request hooks
+        if not spans or len(spans) == 1 or spans[-1].name != name:
+            return
+        span = spans.pop()
+        span.error = error
+        self.finish(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            g.trace_spans.remove(span)
+            self.finish(span)
+
+    def finish(self, span, end_ns=None):
+        span.end_ns = end_ns or time.time_ns()
+        with self._lock:
+            if len(self._finished) >= MAX_PENDING_SPANS:
+                self.dropped += 1
+                return
+            self._finished.append(span)
+            if self._task is None:
+                self._task = socketio.start_background_task(self._run)
+
+    def record(self, name, trace_id, parent_id, start_ns, end_ns=None, **attributes):
+        """A span that did not run inside a request, e.g. a socket send."""
+        span = Span(name, trace_id, parent_id, start_ns, attributes)
+        self.finish(span, end_ns)
+        return span
+
+    def record_delivery(self, traceparent, sent_at, sid):
+        """``socket.receive`` from the send until the client's acknowledgement arrived.
+
+        Includes the acknowledgement's trip back, so it is an upper bound.
+        """
+        context = parse_traceparent(traceparent)
+        if self.exporter is None or context is None or not isinstance(sent_at, int):
+            return
+        trace_id, parent_id = context
+        self.record('socket.receive', trace_id, parent_id, sent_at * 1000000, sid=sid)
+
+    def _start_request(self):
+        if self.exporter is None:
+            return
+        incoming = parse_traceparent(request.headers.get('traceparent'))
+        if incoming is None and random.random() >= self.sample_rate:
+            return
+        trace_id, parent_id = incoming or (_new_id(16), None)
+        root = Span(f'{request.method} {request.endpoint or request.path}', trace_id, parent_id,
+                    attributes={'http.method': request.method, 'http.route': str(request.url_rule or '')},
+                    kind=SERVER)
+        g.trace_spans = [root]
+
+    def _finish_request(self, response):
+        spans = g.get('trace_spans')
+        if spans:
+            root = spans[0]
+            root.attributes['http.status_code'] = response.status_code
+            if response.status_code >= 500:
+                root.error = response.status
+        return response
+
+    def _teardown_request(self, exc=None):
+        spans = g.pop('trace_spans', None)
+        if not spans:
+            return
+        # Anything still open ended with the request
+        for span in reversed(spans):
+            if exc is not None:
+                span.error = str(exc)
+            self.finish(span)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception('error exporting spans')
+
+    def flush(self):
+        with self._lock:
+            spans, self._finished = self._finished, []
+        if not spans or self.exporter is None:
+            return
+        self.exporter.export({
+            'resourceSpans': [{
+                'resource': {'attributes': [_attribute('service.name', self.service)]},
+                'scopeSpans': [{'scope': {'name': 'cafe'}, 'spans': [span.to_otlp() for span in spans]}]
+            }]
+        })
+
+
+tracer = Tracer()
+
+
+@event.listens_for(Session, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    tracer.start_span('db.flush')
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _after_flush(session, flush_context):
+    tracer.end_span('db.flush')
+
+
+@event.listens_for(Session, 'before_commit')
+def _before_commit(session):
+    tracer.start_span('db.commit')
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    tracer.end_span('db.commit')
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    tracer.end_span('db.flush', error='rolled back')
+    tracer.end_span('db.commit', error='rolled back')
@@ -0,0 +1,40 @@
+import threading
+import time
+from app.cache import invalidation_bus
+
+
+class VersionCounter:
+    """Monotonic version number for a piece of shared state.
+
+    Starts from the current time in milliseconds so versions keep increasing
+    across restarts and clients never see a version go backwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = int(time.time() * 1000)
+
+    @property
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value = max(self._value + 1, int(time.time() * 1000))
+            return self._value
+
+    def observe(self, version):
+        """Catch up with a version bumped by another worker."""
+        with self._lock:
+            self._value = max(self._value, version)
+
+
+menu_version = VersionCounter()
+invalidation_bus.subscribe('menu', lambda message: menu_version.observe(message['version']))
+
+
+def publish_menu_change(**payload):
+    """Bump the menu version and invalidate menu caches on every worker."""
+    version = menu_version.bump()
+    invalidation_bus.publish('menu', version, **payload)
+    return version
@@ -1,4 +1,5 @@
 import os
+import json
 from datetime import timedelta
 
 class Config:
@@ -7,8 +8,97 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_EXPIRATION_DELTA = timedelta(hours=8)
     
+    # Order ETA estimation (see app/kitchen.py)
+    ETA_DEFAULT_ITEM_MINUTES = float(os.environ.get('ETA_DEFAULT_ITEM_MINUTES', 3))
+    ETA_MIN_MINUTES = int(os.environ.get('ETA_MIN_MINUTES', 5))
+    ETA_SMOOTHING = 0.2
+    
+    # Prep stations: station name -> category names it prepares.
+    # Categories not listed go to DEFAULT_PREP_STATION.
+    PREP_STATIONS = json.loads(os.environ['PREP_STATIONS']) if os.environ.get('PREP_STATIONS') else {
+        'bar': ['Coffee', 'Tea', 'Tea & Chai', 'Beverages']
+    }
+    DEFAULT_PREP_STATION = os.environ.get('DEFAULT_PREP_STATION', 'kitchen')
+    
+    # Socket.IO message queue shared by all workers: a redis:// URL in
+    # production, local:// for the in-process stand-in used by tests
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or os.environ.get('REDIS_URL')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'virtual-cafe')
+    
+    # Socket.IO async mode; unset means detect it from the worker (eventlet
+    # under gunicorn's eventlet worker, threading otherwise)
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE')
+    
+    # How DB calls avoid blocking an eventlet hub: auto, green, offload or off
+    DB_COOPERATIVE_MODE = os.environ.get('DB_COOPERATIVE_MODE', 'auto')
+    
+    # Seconds socket events are buffered per room before being sent as one
+    # frame (see app/broadcast.py); 0 sends every event immediately
+    EMIT_BATCH_INTERVAL = float(os.environ.get('EMIT_BATCH_INTERVAL', 0.1))
+    
+    # Let admin and station clients opt in to MessagePack frames (epoch-ms
+    # timestamps, integer cents) by joining with {"encoding": "msgpack"}
+    SOCKETIO_MSGPACK = os.environ.get('SOCKETIO_MSGPACK', '').lower() in ('1', 'true', 'yes')
+    
+    # Logging for the cafe.* loggers (see app/logs.py): records go through a
+    # queue to a background writer as JSON lines. LOG_LEVELS sets levels per
+    # subsystem, e.g. {"cafe.socket": "WARNING"}, and LOG_SAMPLE_RATES keeps
+    # only a fraction of high-volume loggers' INFO records
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = json.loads(os.environ['LOG_LEVELS']) if os.environ.get('LOG_LEVELS') else {}
+    LOG_SAMPLE_RATES = json.loads(os.environ['LOG_SAMPLE_RATES']) if os.environ.get('LOG_SAMPLE_RATES') else {
+        'cafe.socket.connection': 0.1
+    }
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    
+    # Bearer token Prometheus must send to read /metrics; unset leaves it open
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Statements slower than this many seconds are kept, with their query
+    # plan, for GET /api/admin/slow-queries (see app/slow_queries.py);
+    # "off" turns the slow-query log off
+    SLOW_QUERY_THRESHOLD = None if os.environ.get('SLOW_QUERY_THRESHOLD') == 'off' else float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.5))
+    SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Admins can profile a single request by sending X-Profile: 1 (see
+    # app/profiling.py); each worker keeps the last PROFILE_STORE_SIZE results
+    PROFILE_STORE_SIZE = int(os.environ.get('PROFILE_STORE_SIZE', 20))
+    PROFILE_TOP_FUNCTIONS = int(os.environ.get('PROFILE_TOP_FUNCTIONS', 25))
+    
+    # Span export (see app/tracing.py): a JSON-lines file path, or an OTLP/HTTP
+    # collector URL such as http://localhost:4318/v1/traces; unset disables tracing
+    TRACE_EXPORT = os.environ.get('TRACE_EXPORT')
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+    TRACE_EXPORT_INTERVAL = float(os.environ.get('TRACE_EXPORT_INTERVAL', 1.0))
+    
+    # Event loop lag probe (see app/loop_monitor.py): seconds between
+    # measurements (0 turns it off), and the lag logged as a stall
+    LOOP_LAG_INTERVAL = float(os.environ.get('LOOP_LAG_INTERVAL', 0.5))
+    LOOP_LAG_THRESHOLD = float(os.environ.get('LOOP_LAG_THRESHOLD', 0.1))
+    
+    # Room presence across workers (see app/presence.py): seconds between each
+    # worker's full count publish (0 turns it off), and how long a silent
+    # worker's counts are kept; rooms count as occupied while counts are stale
+    PRESENCE_HEARTBEAT = float(os.environ.get('PRESENCE_HEARTBEAT', 10))
+    PRESENCE_TTL = float(os.environ.get('PRESENCE_TTL', 60))
+    
+    # Record API requests and client socket events to this JSON-lines file
+    # for replay_traffic.py (see app/capture.py); unset disables capture
+    TRAFFIC_CAPTURE = os.environ.get('TRAFFIC_CAPTURE')
+    TRAFFIC_CAPTURE_INTERVAL = float(os.environ.get('TRAFFIC_CAPTURE_INTERVAL', 1.0))
+    
+    # 'raise' makes lazy loads that would run SQL raise instead (see
+    # app/query_budget.py); the tests use it to catch N+1 queries
+    SQLALCHEMY_LAZY_LOADS = os.environ.get('SQLALCHEMY_LAZY_LOADS', 'select')
+    
+    # Broker for cross-worker cache invalidations; defaults to the Socket.IO queue
+    CACHE_INVALIDATION_URL = os.environ.get('CACHE_INVALIDATION_URL') or SOCKETIO_MESSAGE_QUEUE
+    
 class DevelopmentConfig(Config):
     DEBUG = True
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_SAMPLE_RATES = {}
     
 class ProductionConfig(Config):
     DEBUG = False
@@ -19,8 +109,19 @@ class ProductionConfig(Config):
     if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace('postgres://', 'postgresql://', 1)
     
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SOCKETIO_MESSAGE_QUEUE = 'local://'
+    CACHE_INVALIDATION_URL = 'local://'
+    EMIT_BATCH_INTERVAL = 0
+    LOOP_LAG_INTERVAL = 0
+    PRESENCE_HEARTBEAT = 0
+    SQLALCHEMY_LAZY_LOADS = 'raise'
+    
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""
+Microbenchmarks for the serialization, ordering and analytics hot paths
+Runs in-process against an in-memory SQLite database built from a fixed seed,
+so two runs on the same machine measure the same work:
+
+- to_dict: Category (10 items), MenuItem, Order (5 items), relationships preloaded
+- place_order: POST /api/orders with a 2-line and a 25-line cart
+- get_active_orders: GET /api/admin/orders/active with 10, 100 and 1000 active orders
+- analytics: every /api/admin/analytics route over 30 and 365 days of history
+
+Each benchmark is warmed up once, then timed for a number of rounds; fast
+functions are called several times per round. Results (min, median, mean,
+stddev, ops/s per benchmark) are written as JSON, and `compare` flags every
+benchmark whose median (or --stat) got slower than a baseline by more than
+the tolerance, exiting with status 1 so it can gate CI.
+
+Usage:
+    python benchmark_hot_paths.py run --output .benchmarks/baseline.json
+    python benchmark_hot_paths.py run --filter analytics
+    python benchmark_hot_paths.py compare --tolerance 0.2
+    python benchmark_hot_paths.py compare --baseline old.json --current new.json
+"""
+
+import sys
+import os
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+SEED = 1234
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'latest.json')
+
+CATEGORIES = ['Coffee', 'Tea', 'Snacks', 'Pastries', 'Mains', 'Desserts']
+ITEMS_PER_CATEGORY = 10
+TABLES = 1200
+HISTORY_DAYS = 365
+HISTORY_ORDERS_PER_DAY = 30
+ACTIVE_ORDER_COUNTS = [10, 100, 1000]
+ANALYTICS_ROUTES = ['sales-by-hour', 'product-performance', 'daily-trends', 'category-performance', 'prep-times']
+ANALYTICS_DAYS = [30, 365]
+
+class Suite:
+    def __init__(self, rounds, name_filter=None):
+        self.rounds = rounds
+        self.name_filter = name_filter
+        self.results = []
+
+    def wanted(self, name):
+        return not self.name_filter or self.name_filter in name
+
+    def measure(self, group, name, fn, setup=None, rounds=None, iterations=1):
+        if not self.wanted(name):
+            return
+        rounds = rounds or self.rounds
+        if setup:
+            setup()
+        fn()  # warm-up: caches, compiled statements, first-time imports
+        timings = []
+        for _ in range(rounds):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            timings.append((time.perf_counter() - started) / iterations)
+        stats = {
+            'min': min(timings),
+            'max': max(timings),
+            'mean': statistics.mean(timings),
+            'median': statistics.median(timings),
+            'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'rounds': rounds,
+            'iterations': iterations
+        }
+        stats['ops'] = 1 / stats['mean'] if stats['mean'] else 0.0
+        self.results.append({'group': group, 'name': name, 'stats': stats})
+        print(f"   {name:<48} median {stats['median'] * 1e6:11.1f} us   "
+              f"min {stats['min'] * 1e6:11.1f} us   stddev {stats['stddev'] * 1e6:9.1f} us", flush=True)
+
+def seed_history(db, rng, items, tables):
+    from app.models.models import Order, OrderItem, OrderStatusHistory
+
+    now = datetime.utcnow()
+    order_rows, item_rows, history_rows = [], [], []
+    order_id = 0
+    for day in range(HISTORY_DAYS):
+        for _ in range(HISTORY_ORDERS_PER_DAY):
+            order_id += 1
+            created_at = now - timedelta(days=day, minutes=rng.randint(0, 12 * 60))
+            ready_at = created_at + timedelta(minutes=rng.randint(4, 25))
+            lines = rng.sample(items, rng.choice([1, 2, 2, 3, 4]))
+            order_rows.append({'id': order_id, 'table_id': rng.choice(tables), 'status': 'completed',
+                               'estimated_time': 15, 'total_amount': sum(price for _, price in lines),
+                               'created_at': created_at, 'updated_at': ready_at})
+            item_rows += [{'order_id': order_id, 'menu_item_id': item_id, 'quantity': 1, 'price_at_time': price}
+                          for item_id, price in lines]
+            history_rows += [
+                {'order_id': order_id, 'from_status': 'preparing', 'to_status': 'ready', 'changed_at': ready_at},
+                {'order_id': order_id, 'from_status': 'ready', 'to_status': 'completed',
+                 'changed_at': ready_at + timedelta(minutes=5)}
+            ]
+    db.session.execute(db.insert(Order), order_rows)
+    db.session.execute(db.insert(OrderItem), item_rows)
+    db.session.execute(db.insert(OrderStatusHistory), history_rows)
+    db.session.commit()
+    return order_id
+
+def complete_active_orders(db):
+    from app.models.models import Order
+    from app.kitchen import kitchen_queue
+
+    db.session.execute(db.update(Order).where(Order.status != 'completed').values(status='completed'))
+    db.session.commit()
+    kitchen_queue.reset()
+    kitchen_queue.ensure_loaded()
+
+def add_active_orders(db, rng, items, tables, count):
+    """Insert ``count`` open orders of 5 lines each; returns the first id."""
+    from app.models.models import Order, OrderItem
+
+    first_id = db.session.query(db.func.max(Order.id)).scalar() + 1
+    now = datetime.utcnow()
+    order_rows, item_rows = [], []
+    for order_id in range(first_id, first_id + count):
+        lines = rng.sample(items, 5)
+        created_at = now - timedelta(minutes=rng.randint(0, 90))
+        order_rows.append({'id': order_id, 'table_id': rng.choice(tables),
+                           'status': rng.choice(['pending', 'preparing', 'ready']), 'estimated_time': 15,
+                           'total_amount': sum(price for _, price in lines),
+                           'created_at': created_at, 'updated_at': created_at})
+        item_rows += [{'order_id': order_id, 'menu_item_id': item_id, 'quantity': 2, 'price_at_time': price}
+                      for item_id, price in lines]
+    db.session.execute(db.insert(Order), order_rows)
+    db.session.execute(db.insert(OrderItem), item_rows)
+    db.session.commit()
+    return first_id
+
+def run_suite(rounds, name_filter):
+    from app import create_app, db
+    from app.cli import create_schema, ensure_admin
+    from app.models.models import Category, MenuItem, Order, OrderItem, Table
+    from sqlalchemy.orm import joinedload, selectinload
+
+    app = create_app('testing')
+    suite = Suite(rounds, name_filter)
+    rng = random.Random(SEED)
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        for position, name in enumerate(CATEGORIES):
+            category = Category(name=name, display_order=position)
+            db.session.add(category)
+            db.session.flush()
+            db.session.add_all([MenuItem(name=f'{name} {i}', description=f'{name} number {i}',
+                                         price=rng.choice([2.5, 3.25, 4, 5.5, 7.75]), category_id=category.id)
+                                for i in range(ITEMS_PER_CATEGORY)])
+        db.session.add_all([Table(table_number=i, is_active=True) for i in range(1, TABLES + 1)])
+        db.session.commit()
+        items = [(item.id, float(item.price)) for item in MenuItem.query.order_by(MenuItem.id)]
+        tables = [table.id for table in Table.query.order_by(Table.id)]
+        print(f"Seeding {HISTORY_DAYS * HISTORY_ORDERS_PER_DAY} orders of history...", flush=True)
+        seed_history(db, rng, items, tables)
+
+        client = app.test_client()
+        token = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).json['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        def get(url):
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200, (url, response.status_code)
+
+        print("\n=== to_dict ===")
+        category = Category.query.options(selectinload(Category.menu_items)).first()
+        menu_item = MenuItem.query.first()
+        order_id = add_active_orders(db, rng, items, tables, 1)
+        order = Order.query.options(
+            joinedload(Order.table),
+            selectinload(Order.order_items).joinedload(OrderItem.menu_item)
+        ).filter(Order.id == order_id).one()
+        suite.measure('to_dict', 'to_dict[Category]', category.to_dict, iterations=200)
+        suite.measure('to_dict', 'to_dict[MenuItem]', menu_item.to_dict, iterations=1000)
+        suite.measure('to_dict', 'to_dict[Order]', order.to_dict, iterations=500)
+
+        print("\n=== place_order ===")
+        table_numbers = iter(range(1, TABLES + 1))
+        for label, lines in [('small', 2), ('large', 25)]:
+            cart = [{'menu_item_id': item_id, 'quantity': 1} for item_id, _ in rng.sample(items, lines)]
+
+            def place_order(cart=cart):
+                response = client.post('/api/orders', json={'table_number': next(table_numbers), 'items': cart})
+                assert response.status_code == 200, response.json
+
+            # Every round starts from the same empty kitchen
+            suite.measure('place_order', f'place_order[{label} cart, {lines} lines]', place_order,
+                          setup=lambda: complete_active_orders(db), rounds=min(rounds, 250))
+
+        print("\n=== get_active_orders ===")
+        for count in ACTIVE_ORDER_COUNTS:
+            complete_active_orders(db)
+            add_active_orders(db, rng, items, tables, count)
+            suite.measure('get_active_orders', f'get_active_orders[{count} active]',
+                          lambda: get('/api/admin/orders/active'), rounds=max(rounds // (count // 10), 5))
+        complete_active_orders(db)
+
+        print("\n=== analytics ===")
+        for route in ANALYTICS_ROUTES:
+            for days in ANALYTICS_DAYS:
+                suite.measure('analytics', f'analytics[{route}, {days} days]',
+                              lambda route=route, days=days: get(f'/api/admin/analytics/{route}?days={days}'),
+                              rounds=max(rounds // 10, 5))
+        suite.measure('analytics', 'analytics[revenue-detail]',
+                      lambda: get('/api/admin/analytics/revenue-detail'), rounds=max(rounds // 10, 5))
+    return suite.results
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'system': platform.system()
+    }
+
+def save(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'datetime': datetime.utcnow().isoformat(), 'machine_info': machine_info(),
+                   'seed': SEED, 'benchmarks': results}, f, indent=2)
+    print(f"\nResults written to {path}")
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline, current, tolerance, stat='median'):
+    """Print changes in ``stat``; returns the names that regressed beyond ``tolerance``."""
+    before = {benchmark['name']: benchmark['stats'] for benchmark in baseline['benchmarks']}
+    after = {benchmark['name']: benchmark['stats'] for benchmark in current['benchmarks']}
+    regressions = []
+    print(f"\n   {'benchmark (' + stat + ')':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, stats in after.items():
+        if name not in before:
+            print(f"   {name:<48} {'-':>12} {stats[stat] * 1e6:>9.1f} us      new")
+            continue
+        change = stats[stat] / before[name][stat] - 1
+        if change > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -tolerance:
+            flag = '  faster'
+        else:
+            flag = ''
+        print(f"   {name:<48} {before[name][stat] * 1e6:>9.1f} us {stats[stat] * 1e6:>9.1f} us "
+              f"{change * 100:>+7.1f}%{flag}")
+    missing = before.keys() - after.keys()
+    if missing:
+        print(f"\n   {len(missing)} baseline benchmark(s) not in the current run")
+    if baseline.get('machine_info') != current.get('machine_info'):
+        print("\n   Note: baseline was recorded on a different machine or Python")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks and write the results')
+    run.add_argument('--rounds', type=int, default=100)
+    run.add_argument('--filter', help='only benchmarks whose name contains this')
+    run.add_argument('--output', default=DEFAULT_OUTPUT)
+
+    check = commands.add_parser('compare', help='compare a run with a baseline; exit 1 on regressions')
+    check.add_argument('--baseline', default=DEFAULT_BASELINE)
+    check.add_argument('--current', help='results file to check; runs the benchmarks when omitted')
+    check.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    check.add_argument('--stat', default='median', choices=['min', 'median', 'mean'],
+                       help='statistic compared; min is steadier on a noisy machine')
+    check.add_argument('--rounds', type=int, default=100)
+    check.add_argument('--filter', help='only benchmarks whose name contains this')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        save(run_suite(args.rounds, args.filter), args.output)
+    else:
+        baseline = load(args.baseline)
+        if args.current:
+            current = load(args.current)
+        else:
+            current = {'machine_info': machine_info(), 'benchmarks': run_suite(args.rounds, args.filter)}
+            save(current['benchmarks'], DEFAULT_OUTPUT)
+        regressions = compare(baseline, current, args.tolerance, args.stat)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
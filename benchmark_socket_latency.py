@@ -0,0 +1,188 @@
+"""
+Benchmark socket event latency seen by the kitchen while a heavy analytics query runs
+Starts the app in a subprocess with the chosen async mode, connects an admin
+Socket.IO client, places orders and times how long each new_order takes to arrive,
+first on an idle server and then while /analytics/product-performance is hammered
+
+Usage:
+    python benchmark_socket_latency.py --async-mode eventlet --db-mode off
+    python benchmark_socket_latency.py --async-mode eventlet --db-mode offload
+    python benchmark_socket_latency.py --async-mode threading
+"""
+
+import sys
+import os
+import argparse
+import random
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from perf_stats import percentile
+
+TABLES = 200
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def seed_database(database_url, orders):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.cli import create_schema, ensure_admin
+    from app.models.models import Category, MenuItem, Table, Order, OrderItem
+
+    app = create_app('development')
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        # Readers must not block the order writes we are timing
+        db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+
+        category = Category(name='Snacks', display_order=1)
+        db.session.add(category)
+        db.session.flush()
+        items = [MenuItem(name=f'Item {i}', price=50 + i, category_id=category.id) for i in range(40)]
+        db.session.add_all(items)
+        db.session.add_all([Table(table_number=i, is_active=True) for i in range(1, TABLES + 1)])
+        db.session.commit()
+
+        rng = random.Random(42)
+        now = datetime.utcnow()
+        for start in range(0, orders, 10000):
+            chunk = range(start + 1, min(start + 10000, orders) + 1)
+            order_rows = []
+            item_rows = []
+            for order_id in chunk:
+                created_at = now - timedelta(days=rng.randint(1, 364), minutes=rng.randint(0, 1440))
+                order_rows.append({'id': order_id, 'table_id': rng.randint(1, TABLES), 'status': 'completed',
+                                   'estimated_time': 15, 'total_amount': 200, 'created_at': created_at,
+                                   'updated_at': created_at})
+                for item in rng.sample(items, 2):
+                    item_rows.append({'order_id': order_id, 'menu_item_id': item.id, 'quantity': 1,
+                                      'price_at_time': item.price})
+            db.session.execute(db.insert(Order), order_rows)
+            db.session.execute(db.insert(OrderItem), item_rows)
+        db.session.commit()
+        return [item.id for item in items]
+
+def serve(port):
+    # Runs in the subprocess; patch before anything imports socket
+    if os.environ.get('SOCKETIO_ASYNC_MODE') == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    from app import create_app, socketio
+    import app.socket_events
+
+    app = create_app('development')
+    print(f"Serving with async_mode={socketio.async_mode} db_mode={app.config['DB_COOPERATIVE_MODE']}", flush=True)
+    socketio.run(app, host='127.0.0.1', port=port, debug=False, use_reloader=False,
+                 log_output=False, allow_unsafe_werkzeug=True)
+
+def measure(base_url, item_ids, table_numbers, received, rounds):
+    import requests
+
+    latencies = []
+    for table_number in table_numbers[:rounds]:
+        started = time.perf_counter()
+        response = requests.post(f'{base_url}/api/orders', json={
+            'table_number': table_number,
+            'items': [{'menu_item_id': random.choice(item_ids), 'quantity': 1}]
+        })
+        order_id = response.json()['order_id']
+        while order_id not in received:
+            time.sleep(0.001)
+        latencies.append((received[order_id] - started) * 1000)
+        time.sleep(0.05)
+    return latencies
+
+def report(label, latencies):
+    print(f"   {label:<22} p50 {statistics.median(latencies):8.1f} ms   "
+          f"p95 {percentile(latencies, 0.95):8.1f} ms   max {max(latencies):8.1f} ms")
+
+def run_benchmark(async_mode, db_mode, orders, rounds):
+    import requests
+    import socketio as socketio_client
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    database_url = f'sqlite:///{database_path}'
+    print(f"Seeding {orders} historical orders...")
+    item_ids = seed_database(database_url, orders)
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, DATABASE_URL=database_url, SOCKETIO_ASYNC_MODE=async_mode, DB_COOPERATIVE_MODE=db_mode)
+    server = subprocess.Popen([sys.executable, __file__, '--serve', str(port)], env=env,
+                              cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f'{base_url}/api/tables/1', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        token = requests.post(f'{base_url}/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        received = {}
+        kitchen = socketio_client.Client()
+        def on_new_order(order):
+            received.setdefault(order['id'], time.perf_counter())
+        def on_batch(data):
+            for item in data['events']:
+                if item['event'] == 'new_order':
+                    on_new_order(item['data'])
+        kitchen.on('new_order', on_new_order)
+        kitchen.on('batch', on_batch)
+        kitchen.connect(base_url)
+        kitchen.emit('join_admin')
+        time.sleep(0.5)
+
+        tables = list(range(1, TABLES + 1))
+        random.shuffle(tables)
+        idle = measure(base_url, item_ids, tables[:rounds], received, rounds)
+
+        started = time.perf_counter()
+        requests.get(f'{base_url}/api/admin/analytics/product-performance?days=365', headers=headers)
+        query_ms = (time.perf_counter() - started) * 1000
+
+        stop = threading.Event()
+        def hammer():
+            while not stop.is_set():
+                requests.get(f'{base_url}/api/admin/analytics/product-performance?days=365', headers=headers)
+        analytics = threading.Thread(target=hammer, daemon=True)
+        analytics.start()
+        time.sleep(0.2)
+        loaded = measure(base_url, item_ids, tables[rounds:], received, rounds)
+        stop.set()
+        analytics.join()
+        kitchen.disconnect()
+
+        print(f"\n=== new_order latency: async_mode={async_mode} db_mode={db_mode} ===")
+        print(f"   analytics query alone: {query_ms:.0f} ms")
+        report('idle server', idle)
+        report('during analytics', loaded)
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--async-mode', default='eventlet', choices=['eventlet', 'threading'])
+    parser.add_argument('--db-mode', default='auto', choices=['auto', 'offload', 'off'])
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+    else:
+        run_benchmark(args.async_mode, args.db_mode, args.orders, args.rounds)
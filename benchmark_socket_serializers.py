@@ -0,0 +1,121 @@
+"""
+Benchmark JSON against MessagePack socket frames for a busy admin board
+Builds 40 active orders and compares bytes on the wire, encode and decode time
+of the full Socket.IO packet for the frames the admin room actually receives:
+the join snapshot, a batch of new orders and a batch of status diffs
+
+Usage:
+    python benchmark_socket_serializers.py
+    python benchmark_socket_serializers.py --orders 40 --repeat 2000
+"""
+
+import sys
+import os
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import msgpack
+from socketio import packet
+
+def build_board(orders):
+    from app import create_app, db
+    from app.models.models import Category, MenuItem, Table, Order, OrderItem
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        rng = random.Random(7)
+        categories = [Category(name=name, display_order=i) for i, name in enumerate(['Coffee', 'Snacks', 'Mains'])]
+        db.session.add_all(categories)
+        db.session.flush()
+        items = [MenuItem(name=f'{category.name} special {i}', price=rng.choice([80, 120, 149.5, 220, 310]),
+                          category_id=category.id) for category in categories for i in range(8)]
+        tables = [Table(table_number=i, is_active=True) for i in range(1, orders + 1)]
+        db.session.add_all(items + tables)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        board = []
+        for table in tables:
+            created_at = now - timedelta(minutes=rng.randint(0, 40))
+            order = Order(table_id=table.id, status=rng.choice(['pending', 'preparing', 'ready']),
+                          estimated_time=rng.randint(5, 30), created_at=created_at, updated_at=created_at)
+            db.session.add(order)
+            db.session.flush()
+            total = 0
+            for item in rng.sample(items, rng.randint(2, 6)):
+                quantity = rng.randint(1, 3)
+                db.session.add(OrderItem(order_id=order.id, menu_item_id=item.id, quantity=quantity,
+                                         price_at_time=item.price))
+                total += float(item.price) * quantity
+            order.total_amount = total
+            board.append(order)
+        db.session.commit()
+
+        snapshot = {'orders': [order.to_dict() for order in board]}
+        new_orders = {'events': [{'event': 'new_order', 'data': order} for order in snapshot['orders']]}
+
+        diffs = []
+        for order in board:
+            before = order.state_dict()
+            order.status = 'completed' if order.status == 'ready' else 'ready'
+            order.updated_at = now
+            diffs.append({'event': 'order_updated', 'data': order.to_diff(before)})
+        return {
+            'orders_snapshot (join)': ('orders_snapshot', snapshot),
+            f'batch of {orders} new_order': ('batch', new_orders),
+            f'batch of {orders} diffs': ('batch', {'events': diffs})
+        }
+
+def json_frame(event, payload):
+    encoded = packet.Packet(packet.EVENT, data=[event, payload]).encode()
+    return encoded, len(encoded.encode())
+
+def decode_json_frame(encoded):
+    return packet.Packet(encoded_packet=encoded).data
+
+def msgpack_frame(event, payload, compact):
+    from app.serializers import pack
+
+    body = pack(payload) if compact else msgpack.packb(payload)
+    encoded = packet.Packet(packet.EVENT, data=[event, body]).encode()
+    return encoded, len(encoded[0].encode()) + sum(len(attachment) for attachment in encoded[1:])
+
+def decode_msgpack_frame(encoded):
+    frame = packet.Packet(encoded_packet=encoded[0])
+    for attachment in encoded[1:]:
+        frame.add_attachment(attachment)
+    return msgpack.unpackb(frame.data[1])
+
+def time_us(function, repeat):
+    return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat * 1e6
+
+def run_benchmark(orders, repeat):
+    frames = build_board(orders)
+
+    print(f"\n=== Socket.IO frame cost, {orders} active orders ({repeat} runs) ===")
+    print(f"   {'frame':<26} {'format':<18} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for label, (event, payload) in frames.items():
+        formats = [
+            ('json', lambda: json_frame(event, payload), decode_json_frame),
+            ('msgpack', lambda: msgpack_frame(event, payload, compact=False), decode_msgpack_frame),
+            ('msgpack + compact', lambda: msgpack_frame(event, payload, compact=True), decode_msgpack_frame),
+        ]
+        baseline = None
+        for name, encode, decode in formats:
+            encoded, size = encode()
+            encode_us = time_us(encode, repeat)
+            decode_us = time_us(lambda: decode(encoded), repeat)
+            baseline = baseline or size
+            print(f"   {label:<26} {name:<18} {size:>8} {encode_us:>10.1f} {decode_us:>10.1f}"
+                  f"   ({size / baseline:.0%} of json)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+    run_benchmark(args.orders, args.repeat)
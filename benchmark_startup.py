@@ -0,0 +1,118 @@
+"""
+Benchmark how long a fresh worker takes to start and answer its first request
+Each run is a new Python process against a prepared SQLite database, timing the
+app import, create_app and the first GET /api/menu through the test client.
+Exits with status 1 when the median time to first request is over --budget, so
+a change that adds work to startup fails the check.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 20 --budget 0.8
+    python benchmark_startup.py --profile
+"""
+
+import sys
+import os
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+PHASES = ('import', 'create_app', 'first_request', 'total')
+
+# Runs in the child process; timings are cumulative from just before the import
+WORKER = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app(sys.argv[1])
+created = time.perf_counter()
+status = application.test_client().get('/api/menu').status_code
+answered = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first_request': answered - created, 'total': answered - started, 'status': status}))
+"""
+
+def prepare_database(path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import create_app
+    from app.cli import create_schema, ensure_admin, seed_sample_data
+
+    app = create_app('development')
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        seed_sample_data()
+
+def run_worker(env, config, profile):
+    command = [sys.executable, '-X', 'importtime', '-c', WORKER, config] if profile else \
+              [sys.executable, '-c', WORKER, config]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=BACKEND, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f'worker failed:\n{result.stderr}')
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process'] = wall
+    return timings, result.stderr
+
+def print_import_profile(stderr, limit=15):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = line.replace('import time:', '|', 1).split('|')
+        if name.strip() != 'app':
+            rows.append((int(cumulative_us), name.strip()))
+    print('\nSlowest imports under app (cumulative, nested ones included):')
+    for cumulative_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f'   {cumulative_us / 1000:>8.1f} ms  {name}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Time worker startup in fresh processes')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='development', choices=['development', 'production'])
+    parser.add_argument('--budget', type=float, default=1.0,
+                        help='seconds the median time to first request may take')
+    parser.add_argument('--profile', action='store_true', help='also list the slowest imports of the last run')
+    parser.add_argument('--json', help='write the timings of every run to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'startup.db')
+        prepare_database(database)
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', LOG_LEVEL='WARNING')
+
+        runs = []
+        stderr = ''
+        for n in range(args.runs):
+            timings, stderr = run_worker(env, args.config, args.profile and n == args.runs - 1)
+            if timings['status'] != 200:
+                raise SystemExit(f"first request returned {timings['status']}")
+            runs.append(timings)
+
+    print(f'Startup over {args.runs} runs ({args.config} config)')
+    print(f"   {'phase':<14}{'median':>10}{'max':>10}")
+    for phase in PHASES + ('process',):
+        values = [run[phase] for run in runs]
+        print(f'   {phase:<14}{statistics.median(values) * 1000:>8.1f}ms{max(values) * 1000:>8.1f}ms')
+    if args.profile:
+        print_import_profile(stderr)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(runs, f, indent=2)
+
+    median = statistics.median(run['total'] for run in runs)
+    if median > args.budget:
+        print(f'\nOver budget: {median:.3f} s to first request (budget {args.budget:.3f} s)')
+        sys.exit(1)
+    print(f'\nWithin budget: {median:.3f} s to first request (budget {args.budget:.3f} s)')
+
+if __name__ == '__main__':
+    main()
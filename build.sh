@@ -3,22 +3,12 @@
 # Install dependencies
 pip install -r requirements-production.txt
 
-# Run database migrations/setup
+# Create missing tables and the admin user; workers never do this on startup
 cd backend
-python -c "
-from app import create_app, db
-from app.models.models import *
-from initialize_production_data import initialize_data
-import os
-
-app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
-with app.app_context():
-    db.create_all()
-    print('Database tables created successfully')
-    # Initialize production data
-    initialize_data()
-    print('Production data initialized successfully')
-"
+flask --app wsgi init-db
 
 cd ..
-echo "Build completed successfully"
\ No newline at end of file
+# Initialize production data
+python initialize_production_data.py
+
+echo "Build completed successfully"
@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
 from app import create_app, db
+from app.cli import create_schema, ensure_admin
 from app.models.models import Category, MenuItem, Table, AdminUser
 
 def create_sample_data():
@@ -15,6 +16,8 @@ def create_sample_data():
     
     with app.app_context():
         print("Creating sample data...")
+        create_schema()
+        ensure_admin()
         
         # Clear existing data (except admin users and categories)
         MenuItem.query.delete()
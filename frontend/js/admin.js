@@ -133,7 +133,9 @@ function initializeSocket() {
     
     socket.on('connect', function() {
         console.log('Connected to server via', socket.io.engine.transport.name);
-        socket.emit('join_admin');
+        // Ask for MessagePack frames when the decoder loaded; the server
+        // falls back to JSON unless SOCKETIO_MSGPACK is enabled
+        socket.emit('join_admin', typeof MessagePack !== 'undefined' ? { encoding: 'msgpack' } : {});
         updateConnectionStatus('connected');
     });
     
@@ -159,17 +161,103 @@ function initializeSocket() {
         console.log('Upgraded to transport:', socket.io.engine.transport.name);
     });
     
-    socket.on('new_order', function(order) {
+    // Sent when we join the admin room, including after a reconnect
+    onPayload('orders_snapshot', function(data) {
+        activeOrders = data.orders;
+        refreshActiveOrders(false);
+    });
+    
+    onPayload('new_order', function(order) {
         console.log('New order received:', order);
         showNotification(`New order #${order.id} from table ${order.table_number}`);
-        if (currentTab === 'orders') loadActiveOrders();
+        if (!activeOrders.some(active => active.id === order.id)) activeOrders.push(order);
+        refreshActiveOrders(false);
         if (currentTab === 'dashboard') loadDashboardData();
     });
     
-    socket.on('order_updated', function(order) {
-        console.log('Order updated:', order);
-        if (currentTab === 'orders') loadActiveOrders();
+    onPayload('order_updated', function(diff) {
+        console.log('Order updated:', diff);
+        refreshActiveOrders(!applyOrderDiff(diff));
+    });
+    
+    onPayload('orders_updated', function(data) {
+        console.log('Orders updated:', data.orders.length);
+        const applied = data.orders.map(diff => applyOrderDiff(diff));
+        refreshActiveOrders(applied.includes(false));
+    });
+    
+    // The server sends events that queued up together as one frame
+    onPayload('batch', function(data) {
+        data.events.forEach(function(item) {
+            socket.listeners(item.event).forEach(function(listener) {
+                listener(item.data);
+            });
+        });
+    });
+}
+
+// Binary frames are MessagePack with epoch-ms timestamps and integer cents
+function decodePayload(data) {
+    if (!(data instanceof ArrayBuffer)) return data;
+    return expandPayload(MessagePack.decode(new Uint8Array(data)));
+}
+
+function expandPayload(value) {
+    if (Array.isArray(value)) return value.map(expandPayload);
+    if (value === null || typeof value !== 'object') return value;
+    const result = {};
+    Object.entries(value).forEach(function([key, item]) {
+        if (key.endsWith('_ms')) {
+            // Same naive UTC format as the JSON payloads
+            result[key.slice(0, -3)] = new Date(item).toISOString().slice(0, -1);
+        } else if (key.endsWith('_cents')) {
+            result[key.slice(0, -6)] = item / 100;
+        } else {
+            result[key] = expandPayload(item);
+        }
     });
+    return result;
+}
+
+function onPayload(event, handler) {
+    socket.on(event, function(data) {
+        const payload = decodePayload(data);
+        // Traced events are acknowledged so the server can time delivery
+        if (payload && payload.trace) {
+            socket.emit('trace_received', payload.trace);
+        }
+        handler(payload);
+    });
+}
+
+// Apply a status diff; returns false if we missed an earlier version and need to reload
+function applyOrderDiff(diff) {
+    const order = activeOrders.find(active => active.id === diff.id);
+    if (!order) return diff.changes.status === 'completed';
+    if (order.version >= diff.version) return true;
+    if (order.version !== diff.base_version) return false;
+    
+    Object.assign(order, diff.changes, { version: diff.version });
+    if (order.status === 'completed') {
+        activeOrders = activeOrders.filter(active => active.id !== order.id);
+    }
+    return true;
+}
+
+// Re-render (or reload, after a missed version) once for a burst of events
+let activeOrdersRefresh = null;
+function refreshActiveOrders(reload) {
+    if (activeOrdersRefresh) {
+        activeOrdersRefresh.reload = activeOrdersRefresh.reload || reload;
+        return;
+    }
+    activeOrdersRefresh = { reload: reload };
+    setTimeout(function() {
+        const refresh = activeOrdersRefresh;
+        activeOrdersRefresh = null;
+        if (refresh.reload) loadActiveOrders();
+        else renderActiveOrders();
+    }, 0);
 }
 
 // Connection status indicator
@@ -375,7 +463,13 @@ async function updateOrderStatus(orderId, status) {
         
         if (data && data.success) {
             showNotification(`Order #${orderId} status updated to ${status}`);
-            loadActiveOrders();
+            // The order_updated diff will find this version already applied
+            if (status === 'completed') {
+                activeOrders = activeOrders.filter(active => active.id !== orderId);
+            } else {
+                activeOrders = activeOrders.map(active => active.id === orderId ? data.order : active);
+            }
+            renderActiveOrders();
         }
     } catch (error) {
         console.error('Error updating order status:', error);
@@ -7,6 +7,7 @@ let socket;
 let tableNumber = null;
 let cart = [];
 let menuData = [];
+let menuVersion = null;
 let currentOrders = [];
 
 // Initialize the application
@@ -354,14 +355,41 @@ function initializeSocket() {
         console.log('Disconnected from server');
     });
     
-    socket.on('order_status_updated', function(order) {
-        console.log('Order status updated:', order);
-        updateOrderStatus(order);
-        loadCurrentOrders();
+    // Sent when we join the table room, including after a reconnect
+    socket.on('orders_snapshot', function(data) {
+        currentOrders = data.orders.slice().reverse();
+        renderCurrentOrders();
+    });
+    
+    socket.on('order_status_updated', function(diff) {
+        console.log('Order status updated:', diff);
+        if (!updateOrderStatus(diff)) loadCurrentOrders();
+    });
+    
+    socket.on('orders_status_updated', function(data) {
+        console.log('Order statuses updated:', data.orders.length);
+        const applied = data.orders.map(diff => updateOrderStatus(diff));
+        if (applied.includes(false)) loadCurrentOrders();
     });
     
-    socket.on('menu_updated', function() {
+    socket.on('order_eta_updated', function(data) {
+        const order = currentOrders.find(order => order.id === data.order_id);
+        if (order) {
+            order.estimated_time = data.estimated_time;
+            renderCurrentOrders();
+        }
+    });
+    
+    socket.on('menu_updated', function(data) {
         console.log('Menu updated');
+        // Skip the refetch if we already loaded this version
+        if (data && data.version && data.version === menuVersion) return;
+        
+        const unavailable = (data && data.unavailable_item_ids || []).filter(id => cart.some(item => item.id === id));
+        if (unavailable.length > 0) {
+            unavailable.forEach(id => removeItemFromCart(id));
+            showNotification('An item in your cart is no longer available and has been removed');
+        }
         loadMenu();
     });
     
@@ -370,6 +398,15 @@ function initializeSocket() {
         removeItemFromCart(data.item_id);
         showNotification('An item in your cart is no longer available and has been removed');
     });
+    
+    // The server sends events that queued up together as one frame
+    socket.on('batch', function(data) {
+        data.events.forEach(function(item) {
+            socket.listeners(item.event).forEach(function(listener) {
+                listener(item.data);
+            });
+        });
+    });
 }
 
 // Validate table number and load menu
@@ -409,6 +446,7 @@ async function loadMenu() {
         
         if (data.success && data.categories && data.categories.length > 0) {
             menuData = data.categories;
+            menuVersion = data.version;
             console.log('Menu categories loaded:', menuData.map(c => `${c.name}: ${c.items.length} items`));
             console.log('Current filter:', currentFilter);
             console.log('Current search term:', currentSearchTerm);
@@ -975,17 +1013,24 @@ function getStatusBadgeClass(status) {
     }
 }
 
-function updateOrderStatus(updatedOrder) {
-    const orderIndex = currentOrders.findIndex(order => order.id === updatedOrder.id);
-    if (orderIndex !== -1) {
-        currentOrders[orderIndex] = updatedOrder;
-        renderCurrentOrders();
-        
-        // Show notification for ready orders
-        if (updatedOrder.status === 'ready') {
-            showNotification(`Order #${updatedOrder.id} is ready!`);
-        }
+// Apply a status diff; returns false if we missed an earlier version and need to reload
+function updateOrderStatus(diff) {
+    const order = currentOrders.find(order => order.id === diff.id);
+    if (!order) return diff.changes.status === 'completed';
+    if (order.version >= diff.version) return true;
+    if (order.version !== diff.base_version) return false;
+    
+    Object.assign(order, diff.changes, { version: diff.version });
+    if (order.status === 'completed') {
+        currentOrders = currentOrders.filter(current => current.id !== order.id);
+    }
+    renderCurrentOrders();
+    
+    // Show notification for ready orders
+    if (diff.changes.status === 'ready') {
+        showNotification(`Order #${order.id} is ready!`);
     }
+    return true;
 }
 
 // Utility functions
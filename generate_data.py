@@ -0,0 +1,242 @@
+"""
+Generate a large, reproducible order history for scale and analytics testing
+Orders are inserted with Core executemany in chunks, with ids assigned up front
+so their items and status history need no round trip. The same --seed always
+produces the same rows, relative to today. Use it instead of
+create_historical_orders.py and friends when the goal is volume.
+
+Busier weekends and the breakfast, lunch and evening peaks come from the
+weekday and hour weights; item popularity falls off with menu position. The
+menu and tables are topped up with synthetic entries when there are fewer
+than --menu-size / --tables. Orders older than today are completed; today's
+recent ones are left pending, preparing or ready for the dashboard.
+
+Point it at Postgres with DATABASE_URL=... and --config production.
+
+Usage:
+    python generate_data.py --days 365 --orders-per-day 300
+    python generate_data.py --days 30 --orders-per-day 2000 --tables 80 --menu-size 120 --seed 7
+    python generate_data.py --days 3650 --orders-per-day 500 --chunk-size 50000
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app import create_app, db
+from app.cli import create_schema
+from app.models.models import Category, MenuItem, Table, Order, OrderItem, OrderStatusHistory
+
+# Monday first
+WEEKDAY_WEIGHTS = '0.8,0.8,0.9,1.0,1.2,1.5,1.3'
+# Cafe hours 7:00-21:59, with breakfast, lunch and evening peaks
+HOUR_WEIGHTS = '7:1.2,8:2.0,9:1.6,10:1.0,11:1.2,12:2.2,13:2.0,14:1.0,15:0.8,16:0.9,17:1.2,18:1.8,19:1.7,20:1.1,21:0.6'
+LINE_COUNTS = (1, 2, 3, 4, 5)
+LINE_COUNT_WEIGHTS = (30, 35, 20, 10, 5)
+QUANTITIES = (1, 2, 3)
+QUANTITY_WEIGHTS = (75, 20, 5)
+# Orders younger than this are not collected yet; they stay pending, preparing or ready
+ACTIVE_WINDOW = timedelta(minutes=45)
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'expected a positive integer, got {value}')
+    return number
+
+def parse_weekday_weights(value):
+    weights = [float(weight) for weight in value.split(',')]
+    if len(weights) != 7:
+        raise argparse.ArgumentTypeError('expected 7 comma separated weights, Monday first')
+    return weights
+
+def parse_hour_weights(value):
+    weights = {}
+    for pair in value.split(','):
+        hour, weight = pair.split(':')
+        if not 0 <= int(hour) <= 23:
+            raise argparse.ArgumentTypeError(f'hour out of range: {hour}')
+        weights[int(hour)] = float(weight)
+    return weights
+
+class Picker:
+    """Weighted choice by bisecting precomputed cumulative weights."""
+
+    def __init__(self, values, weights):
+        self.values = list(values)
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def pick(self, rng):
+        return self.values[bisect(self.cumulative, rng.random() * self.total)]
+
+def ensure_menu(rng, menu_size):
+    items = MenuItem.query.filter_by(is_available=True).order_by(MenuItem.id).all()
+    missing = menu_size - len(items)
+    if missing > 0:
+        category = Category.query.filter_by(name='Synthetic').first()
+        if not category:
+            category = Category(name='Synthetic', display_order=99)
+            db.session.add(category)
+            db.session.flush()
+        start = MenuItem.query.count() + 1
+        db.session.execute(MenuItem.__table__.insert(), [{
+            'name': f'Item {n:04d}',
+            'description': 'Generated by generate_data.py',
+            'price': Decimal(rng.randrange(150, 1500, 25)) / 100,
+            'category_id': category.id,
+            'is_available': True
+        } for n in range(start, start + missing)])
+        db.session.commit()
+        items = MenuItem.query.filter_by(is_available=True).order_by(MenuItem.id).all()
+    items = items[:menu_size]
+    # Zipf-like popularity: the first items on the menu sell the most
+    return Picker([(item.id, item.price) for item in items], [1 / rank for rank in range(1, len(items) + 1)])
+
+def ensure_tables(table_count):
+    numbers = {number for number, in db.session.query(Table.table_number)}
+    missing = [{'table_number': n, 'is_active': True} for n in range(1, table_count + 1) if n not in numbers]
+    if missing:
+        db.session.execute(Table.__table__.insert(), missing)
+        db.session.commit()
+    return [table_id for table_id, in db.session.query(Table.id).filter(Table.table_number <= table_count)]
+
+def next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+def generate_orders(rng, args, items, tables):
+    """Yield (order, items, history) rows one order at a time, oldest first."""
+    weekday_weights = args.weekday_weights
+    hours = Picker(args.hour_weights, args.hour_weights.values())
+    line_counts = Picker(LINE_COUNTS, LINE_COUNT_WEIGHTS)
+    quantities = Picker(QUANTITIES, QUANTITY_WEIGHTS)
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    for day in range(args.days - 1, -1, -1):
+        date = today - timedelta(days=day)
+        count = max(0, round(args.orders_per_day * weekday_weights[date.weekday()] * rng.gauss(1, 0.1)))
+        created = sorted(date + timedelta(hours=hours.pick(rng), seconds=rng.randrange(3600))
+                         for _ in range(count))
+        for created_at in created:
+            if created_at > now:
+                break
+            lines = {}
+            for _ in range(line_counts.pick(rng)):
+                item_id, price = items.pick(rng)
+                quantity, _ = lines.get(item_id, (0, price))
+                lines[item_id] = (quantity + quantities.pick(rng), price)
+
+            preparing_at = created_at + timedelta(seconds=rng.randrange(30, 300))
+            ready_at = preparing_at + timedelta(seconds=rng.randrange(180, 1500))
+            completed_at = ready_at + timedelta(seconds=rng.randrange(60, 900))
+            transitions = [('pending', 'preparing', preparing_at), ('preparing', 'ready', ready_at),
+                           ('ready', 'completed', completed_at)]
+            if now - created_at < ACTIVE_WINDOW:
+                transitions = [transition for transition in transitions[:2] if transition[2] <= now]
+            status = transitions[-1][1] if transitions else 'pending'
+
+            yield ({
+                'table_id': rng.choice(tables),
+                'status': status,
+                'estimated_time': rng.randrange(5, 30),
+                'total_amount': sum(price * quantity for quantity, price in lines.values()),
+                'created_at': created_at,
+                'updated_at': transitions[-1][2] if transitions else created_at
+            }, [{
+                'menu_item_id': item_id,
+                'quantity': quantity,
+                'price_at_time': price
+            } for item_id, (quantity, price) in lines.items()], [{
+                'from_status': from_status,
+                'to_status': to_status,
+                'changed_at': changed_at
+            } for from_status, to_status, changed_at in transitions])
+
+def insert_chunks(rows, chunk_size):
+    order_id = next_id(Order)
+    first_id = order_id
+    orders, order_items, history = [], [], []
+    started = time.perf_counter()
+
+    def flush():
+        with db.engine.begin() as conn:
+            conn.execute(Order.__table__.insert(), orders)
+            conn.execute(OrderItem.__table__.insert(), order_items)
+            if history:
+                conn.execute(OrderStatusHistory.__table__.insert(), history)
+        inserted = order_id - first_id
+        print(f'   {inserted:>10,} orders   {inserted / (time.perf_counter() - started):>9,.0f} orders/s', flush=True)
+        orders.clear()
+        order_items.clear()
+        history.clear()
+
+    for order, lines, transitions in rows:
+        order['id'] = order_id
+        orders.append(order)
+        for line in lines:
+            line['order_id'] = order_id
+        order_items.extend(lines)
+        for transition in transitions:
+            transition['order_id'] = order_id
+        history.extend(transitions)
+        order_id += 1
+        if len(orders) >= chunk_size:
+            flush()
+    if orders:
+        flush()
+    return order_id - first_id
+
+def reset_sequences():
+    # Explicit ids leave Postgres sequences behind; move them past the new rows
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as conn:
+        for table in ('orders', 'order_items', 'order_status_history', 'menu_items', 'tables'):
+            conn.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"))
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk insert a seeded synthetic order history')
+    parser.add_argument('--config', default='development', choices=['development', 'production'],
+                        help='app config; production reads DATABASE_URL')
+    parser.add_argument('--days', type=positive_int, default=365, help='days of history ending today')
+    parser.add_argument('--orders-per-day', type=positive_int, default=300, help='average orders on a weekday of weight 1')
+    parser.add_argument('--tables', type=positive_int, default=40)
+    parser.add_argument('--menu-size', type=positive_int, default=60, help='menu items orders are drawn from')
+    parser.add_argument('--weekday-weights', type=parse_weekday_weights, default=WEEKDAY_WEIGHTS,
+                        help='7 comma separated multipliers, Monday first')
+    parser.add_argument('--hour-weights', type=parse_hour_weights, default=HOUR_WEIGHTS,
+                        help='hour:weight pairs; only these hours get orders')
+    parser.add_argument('--chunk-size', type=positive_int, default=20000, help='orders per insert transaction')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if isinstance(args.weekday_weights, str):
+        args.weekday_weights = parse_weekday_weights(args.weekday_weights)
+    if isinstance(args.hour_weights, str):
+        args.hour_weights = parse_hour_weights(args.hour_weights)
+
+    app = create_app(args.config)
+    with app.app_context():
+        create_schema()
+        rng = random.Random(args.seed)
+        items = ensure_menu(rng, args.menu_size)
+        tables = ensure_tables(args.tables)
+        print(f'Generating {args.days} days of orders for {len(tables)} tables '
+              f'and {len(items.values)} menu items (seed {args.seed})')
+
+        started = time.perf_counter()
+        count = insert_chunks(generate_orders(rng, args, items, tables), args.chunk_size)
+        reset_sequences()
+        elapsed = time.perf_counter() - started
+        print(f'Inserted {count:,} orders in {elapsed:.1f} s ({count / elapsed if elapsed else 0:,.0f} orders/s)')
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 from app import create_app, db
+from app.cli import create_schema, ensure_admin
 from app.models.models import Category, MenuItem, Table, AdminUser
 
 def initialize_production_data():
@@ -18,13 +19,15 @@ def initialize_production_data():
     
     with app.app_context():
         print("Initializing production data...")
+        create_schema()
+        ensure_admin()
         
         # Check if data already exists
         if MenuItem.query.first():
             print("Data already exists, skipping initialization")
             return
         
-        # Get categories (should already be created by app initialization)
+        # Get categories
         beverages = Category.query.filter_by(name='Beverages').first()
         food = Category.query.filter_by(name='Food').first()
         desserts = Category.query.filter_by(name='Desserts').first()
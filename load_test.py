@@ -0,0 +1,335 @@
+"""
+Load test the whole service on localhost
+Starts the app in a subprocess on a fresh SQLite database, then simulates a
+busy cafe against it for a fixed time:
+
+- N tables: scan the QR code (index page, table check), load the menu, join
+  their socket room, place an order with a realistic cart, poll its status
+  until it is ready, linger, and start over as the next party
+- M admin dashboards: join the admin room, poll active orders, advance them
+  pending -> preparing -> ready -> completed, and refresh the stats panels
+
+Reports requests, throughput, latency percentiles and error rates per
+endpoint, plus how long new orders took to reach the admin dashboards.
+
+Usage:
+    python load_test.py
+    python load_test.py --tables 50 --admins 3 --duration 120
+    python load_test.py --async-mode threading --think 0.2 --json load.json
+"""
+
+import sys
+import os
+import argparse
+import json
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from benchmark_socket_latency import free_port
+from perf_stats import percentile
+
+MENU = {
+    'Coffee': [('Espresso', 2.50), ('Cappuccino', 3.50), ('Latte', 4.00), ('Cold Brew', 4.25)],
+    'Tea': [('Green Tea', 2.00), ('Earl Grey', 2.25), ('Masala Chai', 2.50)],
+    'Snacks': [('Sandwich', 5.50), ('Fries', 3.00), ('Nachos', 4.50)],
+    'Pastries': [('Croissant', 3.00), ('Muffin', 2.75), ('Brownie', 3.25)]
+}
+
+# Items per cart and quantity per line, weighted towards small orders
+CART_SIZES = [1, 1, 2, 2, 2, 3, 3, 4, 5, 8]
+QUANTITIES = [1, 1, 1, 1, 2, 2, 3]
+
+NEXT_STATUS = {'pending': 'preparing', 'preparing': 'ready', 'ready': 'completed'}
+
+class Stats:
+    """Latency and outcome of every request, by endpoint name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.client_errors = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.placed = {}
+        self.delivered = {}
+
+    def record(self, name, elapsed, status):
+        # status None means the request never got a response
+        with self.lock:
+            self.latencies[name].append(elapsed * 1000)
+            if status is None or status >= 500:
+                self.errors[name] += 1
+            elif status >= 400:
+                self.client_errors[name] += 1
+
+    def call(self, session, name, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=30, **kwargs)
+        except Exception:
+            response = None
+        self.record(name, time.perf_counter() - started, response.status_code if response is not None else None)
+        return response if response is not None and response.ok else None
+
+    def order_placed(self, order_id, started):
+        with self.lock:
+            self.placed[order_id] = started
+
+    def order_seen(self, order_id):
+        # The first dashboard to get the event counts
+        with self.lock:
+            self.delivered.setdefault(order_id, time.perf_counter())
+
+    def delivery_latencies(self):
+        with self.lock:
+            return [(self.delivered[order_id] - started) * 1000
+                    for order_id, started in self.placed.items() if order_id in self.delivered]
+
+    def report(self, duration):
+        rows = []
+        with self.lock:
+            names = sorted(self.latencies)
+            for name in names:
+                latencies = self.latencies[name]
+                rows.append({
+                    'endpoint': name,
+                    'requests': len(latencies),
+                    'rps': round(len(latencies) / duration, 2),
+                    'p50_ms': round(percentile(latencies, 0.50), 1),
+                    'p95_ms': round(percentile(latencies, 0.95), 1),
+                    'p99_ms': round(percentile(latencies, 0.99), 1),
+                    'max_ms': round(max(latencies), 1),
+                    'client_errors': self.client_errors[name],
+                    'error_rate': round(self.errors[name] / len(latencies), 4)
+                })
+        delivery = self.delivery_latencies()
+        if delivery:
+            rows.append({
+                'endpoint': 'socket new_order -> admin',
+                'requests': len(delivery),
+                'rps': round(len(delivery) / duration, 2),
+                'p50_ms': round(percentile(delivery, 0.50), 1),
+                'p95_ms': round(percentile(delivery, 0.95), 1),
+                'p99_ms': round(percentile(delivery, 0.99), 1),
+                'max_ms': round(max(delivery), 1),
+                'client_errors': 0,
+                'error_rate': round(1 - len(delivery) / max(len(self.placed), 1), 4)
+            })
+        return rows
+
+def seed_database(database_url, tables):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.cli import create_schema, ensure_admin
+    from app.models.models import Category, MenuItem, Table
+
+    app = create_app('development')
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+        for position, (name, items) in enumerate(MENU.items()):
+            category = Category(name=name, display_order=position)
+            db.session.add(category)
+            db.session.flush()
+            db.session.add_all([MenuItem(name=item, price=price, category_id=category.id) for item, price in items])
+        db.session.add_all([Table(table_number=i, is_active=True) for i in range(1, tables + 1)])
+        db.session.commit()
+
+def pause(rng, stop, seconds):
+    # Exponential think times, so parties do not move in lockstep
+    stop.wait(rng.expovariate(1 / seconds) if seconds else 0)
+
+def customer(base_url, table_number, stats, stop, think, seed):
+    import requests
+    import socketio as socketio_client
+
+    rng = random.Random(seed)
+    while not stop.is_set():
+        session = requests.Session()
+        stats.call(session, 'GET / (QR scan)', 'GET', f'{base_url}/?table={table_number}')
+        stats.call(session, 'GET /api/tables/<n>', 'GET', f'{base_url}/api/tables/{table_number}')
+        response = stats.call(session, 'GET /api/menu', 'GET', f'{base_url}/api/menu')
+        if response is None:
+            pause(rng, stop, think)
+            continue
+        items = [item['id'] for category in response.json()['categories']
+                 for item in category['items']]
+
+        sio = socketio_client.Client()
+        started = time.perf_counter()
+        try:
+            sio.connect(base_url, wait_timeout=10)
+            sio.emit('join_table', {'table_number': table_number})
+            status = 200
+        except Exception:
+            status = None
+        stats.record('socket connect + join_table', time.perf_counter() - started, status)
+        pause(rng, stop, think * 2)
+
+        cart = rng.sample(items, min(rng.choice(CART_SIZES), len(items)))
+        started = time.perf_counter()
+        response = stats.call(session, 'POST /api/orders', 'POST', f'{base_url}/api/orders', json={
+            'table_number': table_number,
+            'items': [{'menu_item_id': item, 'quantity': rng.choice(QUANTITIES)} for item in cart]
+        })
+        if response is not None:
+            order_id = response.json()['order_id']
+            stats.order_placed(order_id, started)
+            while not stop.is_set():
+                pause(rng, stop, think)
+                response = stats.call(session, 'GET /api/orders/table/<n>', 'GET',
+                                      f'{base_url}/api/orders/table/{table_number}')
+                if response is not None and order_id not in [order['id'] for order in response.json()['orders']
+                                                             if order['status'] in ('pending', 'preparing')]:
+                    break
+
+        pause(rng, stop, think * 3)
+        if sio.connected:
+            sio.disconnect()
+        session.close()
+
+def admin_dashboard(base_url, index, admins, stats, stop, ready, think, seed):
+    import requests
+    import socketio as socketio_client
+
+    rng = random.Random(seed)
+    session = requests.Session()
+    response = stats.call(session, 'POST /api/auth/login', 'POST', f'{base_url}/api/auth/login',
+                          json={'username': 'admin', 'password': 'admin123'})
+    if response is None:
+        ready.set()
+        return
+    session.headers['Authorization'] = f"Bearer {response.json()['token']}"
+
+    sio = socketio_client.Client()
+    def on_new_order(order):
+        stats.order_seen(order['id'])
+    def on_batch(data):
+        for item in data['events']:
+            if item['event'] == 'new_order':
+                on_new_order(item['data'])
+    sio.on('new_order', on_new_order)
+    sio.on('batch', on_batch)
+    sio.connect(base_url, wait_timeout=10)
+    # Acknowledged once we are in the room
+    sio.call('join_admin', timeout=10)
+    ready.set()
+
+    # Orders we last moved, and when; each status is held for a while
+    changed = {}
+    polls = 0
+    while not stop.is_set():
+        pause(rng, stop, think)
+        polls += 1
+        response = stats.call(session, 'GET /api/admin/orders/active', 'GET', f'{base_url}/api/admin/orders/active')
+        if response is None:
+            continue
+        now = time.perf_counter()
+        for order in response.json()['orders']:
+            # Each dashboard works its own share of the orders
+            if order['id'] % admins != index:
+                continue
+            if now - changed.setdefault(order['id'], now) < think * 2:
+                continue
+            stats.call(session, 'PUT /api/admin/orders/<id>/status', 'PUT',
+                       f"{base_url}/api/admin/orders/{order['id']}/status",
+                       json={'status': NEXT_STATUS[order['status']]})
+            changed[order['id']] = now
+        if polls % 10 == 0:
+            stats.call(session, 'GET /api/admin/dashboard/stats', 'GET', f'{base_url}/api/admin/dashboard/stats')
+            stats.call(session, 'GET /api/admin/tables', 'GET', f'{base_url}/api/admin/tables')
+            stats.call(session, 'GET /api/admin/kitchen/prep-list', 'GET', f'{base_url}/api/admin/kitchen/prep-list')
+    sio.disconnect()
+
+def print_report(rows, duration, args):
+    print(f"\n=== {args.tables} tables, {args.admins} admin dashboards, {duration:.0f}s, "
+          f"async_mode={args.async_mode} ===")
+    print(f"   {'endpoint':<36} {'reqs':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'4xx':>5} {'err%':>6}")
+    for row in rows:
+        print(f"   {row['endpoint']:<36} {row['requests']:>6} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} {row['client_errors']:>5} "
+              f"{row['error_rate'] * 100:>6.2f}")
+    total = sum(row['requests'] for row in rows if not row['endpoint'].startswith('socket'))
+    print(f"   total {total} requests, {total / duration:.1f} req/s")
+
+def run_load_test(args):
+    import requests
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'load.db')
+    database_url = f'sqlite:///{database_path}'
+    seed_database(database_url, args.tables)
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, DATABASE_URL=database_url, SOCKETIO_ASYNC_MODE=args.async_mode,
+               DB_COOPERATIVE_MODE=args.db_mode, LOG_LEVEL='WARNING')
+    server = subprocess.Popen([sys.executable, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                               'benchmark_socket_latency.py')), '--serve', str(port)], env=env,
+                              stdout=None if args.verbose else subprocess.DEVNULL,
+                              stderr=None if args.verbose else subprocess.DEVNULL, cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f'{base_url}/api/tables/1', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        stats = Stats()
+        stop = threading.Event()
+        # Dashboards stay a little longer so the last orders still reach them
+        admins_stop = threading.Event()
+        ready = [threading.Event() for _ in range(args.admins)]
+        admins = [threading.Thread(target=admin_dashboard, daemon=True,
+                                   args=(base_url, i, args.admins, stats, admins_stop, ready[i], args.think,
+                                         args.seed + i))
+                  for i in range(args.admins)]
+        customers = [threading.Thread(target=customer, daemon=True,
+                                      args=(base_url, table, stats, stop, args.think, args.seed * 1000 + table))
+                     for table in range(1, args.tables + 1)]
+        for worker in admins:
+            worker.start()
+        for event in ready:
+            event.wait(30)
+        started = time.perf_counter()
+        for worker in customers:
+            worker.start()
+        stop.wait(args.duration)
+        stop.set()
+        for worker in customers:
+            worker.join(timeout=10)
+        duration = time.perf_counter() - started
+        time.sleep(1)
+        admins_stop.set()
+        for worker in admins:
+            worker.join(timeout=10)
+
+        rows = stats.report(duration)
+        print_report(rows, duration, args)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'tables': args.tables, 'admins': args.admins, 'duration': duration,
+                           'async_mode': args.async_mode, 'endpoints': rows}, f, indent=2)
+            print(f"   results written to {args.json}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tables', type=int, default=20, help='simulated tables (N)')
+    parser.add_argument('--admins', type=int, default=2, help='simulated admin dashboards (M)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run')
+    parser.add_argument('--think', type=float, default=1.0, help='mean seconds between user actions')
+    parser.add_argument('--async-mode', default='eventlet', choices=['eventlet', 'threading'])
+    parser.add_argument('--db-mode', default='auto', choices=['auto', 'offload', 'off'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the server's output")
+    args = parser.parse_args()
+    run_load_test(args)
@@ -0,0 +1,8 @@
+"""
+Small helpers shared by the benchmark, load test and replay scripts
+"""
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values``, with ``q`` between 0 and 1."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,352 @@
+"""
+Replay captured traffic against a local instance for capacity testing
+Reads files written with TRAFFIC_CAPTURE=<path> (see backend/app/capture.py),
+one per worker when the path has {pid} in it, and re-issues their API requests
+and client socket events with their original spacing divided by --speed, so a
+busy Saturday can be run at 1x, 5x or 20x against a candidate build.
+
+- Order ids created during the capture are remapped to the ids the target
+  hands out, in paths and bodies; a request for an order placed earlier in
+  the capture waits until the replayed order exists
+- Captures hold no credentials: admin requests use a token from logging in
+  with --username/--password, which also stand in for redacted login bodies
+- Each captured socket client becomes one client, connecting, emitting and
+  disconnecting when the original did
+
+Reports per endpoint how many replayed status codes differed from the
+captured ones and captured vs replayed latency percentiles, plus how late
+requests went out. Captured latency is time spent in the server, replayed
+latency the client's round trip, so expect a small fixed overhead; compare
+runs of the same capture against each other for regressions. A growing send
+lag means this client, not the server, is the bottleneck. Compressing time
+also compresses each table's reorders, so the two-minute duplicate-order
+guard shows up as 429 divergence at high speeds.
+
+Usage:
+    python replay_traffic.py capture.jsonl
+    python replay_traffic.py capture.jsonl --url http://127.0.0.1:5000 --speed 5
+    python replay_traffic.py capture.jsonl --speed 20 --duration 3600 --json replay.json
+    python replay_traffic.py capture-*.jsonl --speed 5
+"""
+
+import sys
+import os
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from perf_stats import percentile
+
+# /api/orders/<id> and /api/admin/orders/<id>/...; /api/orders/table/<n> has no order id
+ORDER_PATH = re.compile(r'^(/api/(?:admin/)?orders/)(\d+)(/.*)?$')
+NUMBER_SEGMENT = re.compile(r'/\d+(?=/|$)')
+LOGIN_PATH = '/api/auth/login'
+# How long a request waits for the replayed order it refers to
+ORDER_WAIT = 30
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f'expected a positive number, got {value}')
+    return number
+
+def load_capture(paths, duration=None):
+    """Entries of every capture file in time order, and how many lines could not be read."""
+    entries = []
+    skipped = 0
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                # Workers appending to one file can split a line; skip it, not the replay
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get('at'), (int, float)):
+                    entries.append(entry)
+                else:
+                    skipped += 1
+    entries.sort(key=lambda entry: entry['at'])
+    if entries:
+        first = entries[0]['at']
+        for entry in entries:
+            entry['offset'] = entry['at'] - first
+        if duration is not None:
+            entries = [entry for entry in entries if entry['offset'] <= duration]
+    return entries, skipped
+
+def endpoint_name(entry):
+    return f"{entry['method']} {NUMBER_SEGMENT.sub('/<n>', entry['path'])}"
+
+class OrderIds:
+    """Captured order id -> id of the same order on the replay target."""
+
+    def __init__(self, entries):
+        self.lock = threading.Lock()
+        # Orders placed during the capture; ids outside it are sent unchanged
+        self.pending = {entry['order_id']: threading.Event()
+                        for entry in entries if entry.get('order_id') is not None}
+        self.mapped = {}
+        self.unmapped = 0
+
+    def created(self, captured_id, replayed_id):
+        with self.lock:
+            self.mapped[captured_id] = replayed_id
+        if captured_id in self.pending:
+            self.pending[captured_id].set()
+
+    def failed(self, captured_id):
+        # Release waiters; they will refer to the captured id and diverge
+        if captured_id in self.pending:
+            self.pending[captured_id].set()
+
+    def resolve(self, captured_id):
+        event = self.pending.get(captured_id)
+        if event is not None:
+            event.wait(ORDER_WAIT)
+        with self.lock:
+            if captured_id in self.mapped:
+                return self.mapped[captured_id]
+            self.unmapped += 1
+        return captured_id
+
+    def rewrite_path(self, path):
+        match = ORDER_PATH.match(path)
+        if not match:
+            return path
+        return f'{match.group(1)}{self.resolve(int(match.group(2)))}{match.group(3) or ""}'
+
+    def rewrite_body(self, value):
+        if isinstance(value, dict):
+            return {key: self.resolve(item) if key == 'order_id' and isinstance(item, int) else self.rewrite_body(item)
+                    for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.rewrite_body(item) for item in value]
+        return value
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.captured = defaultdict(list)
+        self.replayed = defaultdict(list)
+        self.diverged = defaultdict(lambda: defaultdict(int))
+        self.failed = defaultdict(int)
+        self.send_lag = []
+        self.socket_events = 0
+        self.socket_errors = 0
+
+    def request(self, name, entry, status, elapsed, lag):
+        with self.lock:
+            self.captured[name].append(entry['duration_ms'])
+            self.replayed[name].append(elapsed * 1000)
+            self.send_lag.append(lag * 1000)
+            if status is None:
+                self.failed[name] += 1
+            elif status != entry['status']:
+                self.diverged[name][f"{entry['status']}->{status}"] += 1
+
+    def socket(self, ok, lag):
+        with self.lock:
+            self.socket_events += 1
+            self.socket_errors += 0 if ok else 1
+            self.send_lag.append(lag * 1000)
+
+    def report(self):
+        rows = []
+        with self.lock:
+            for name in sorted(self.replayed):
+                captured, replayed = self.captured[name], self.replayed[name]
+                diverged = sum(self.diverged[name].values())
+                rows.append({
+                    'endpoint': name,
+                    'requests': len(replayed),
+                    'status_diverged': diverged,
+                    'status_changes': dict(self.diverged[name]),
+                    'no_response': self.failed[name],
+                    'captured_p50_ms': round(percentile(captured, 0.50), 1),
+                    'replayed_p50_ms': round(percentile(replayed, 0.50), 1),
+                    'captured_p95_ms': round(percentile(captured, 0.95), 1),
+                    'replayed_p95_ms': round(percentile(replayed, 0.95), 1),
+                    'p95_ratio': round(percentile(replayed, 0.95) / max(percentile(captured, 0.95), 0.001), 2)
+                })
+            send_lag = list(self.send_lag)
+        return rows, send_lag
+
+class SocketClient:
+    """One captured socket client, replaying its events in order on its own thread."""
+
+    def __init__(self, base_url, order_ids, results):
+        self.base_url = base_url
+        self.order_ids = order_ids
+        self.results = results
+        self.actions = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def send(self, entry, lag):
+        self.actions.put((entry, lag))
+
+    def close(self):
+        self.actions.put(None)
+
+    def _run(self):
+        import socketio as socketio_client
+
+        sio = socketio_client.Client()
+        while True:
+            action = self.actions.get()
+            if action is None:
+                break
+            entry, lag = action
+            ok = True
+            try:
+                if entry['event'] == 'connect':
+                    sio.connect(self.base_url, wait_timeout=10)
+                elif entry['event'] == 'disconnect':
+                    sio.disconnect()
+                    break
+                else:
+                    if not sio.connected:
+                        sio.connect(self.base_url, wait_timeout=10)
+                    data = self.order_ids.rewrite_body(entry['data'])
+                    sio.emit(entry['event'], data) if data is not None else sio.emit(entry['event'])
+            except Exception:
+                ok = False
+            self.results.socket(ok, lag)
+        if sio.connected:
+            sio.disconnect()
+
+def replay(args):
+    import requests
+
+    entries, skipped = load_capture(args.capture, args.duration)
+    if skipped:
+        print(f'Skipped {skipped} capture lines that could not be read')
+    if not entries:
+        print('Nothing to replay')
+        return
+
+    session = requests.Session()
+    login = session.post(f'{args.url}{LOGIN_PATH}', json={'username': args.username, 'password': args.password},
+                         timeout=10)
+    token = login.json().get('token') if login.ok else None
+    if token is None:
+        print(f'Could not log in as {args.username}; authenticated requests will fail')
+
+    order_ids = OrderIds(entries)
+    results = Results()
+    sockets = {}
+
+    def send(entry, lag):
+        name = endpoint_name(entry)
+        headers = {'Authorization': f'Bearer {token}'} if entry.get('auth') and token else {}
+        body = entry.get('body')
+        if entry['path'] == LOGIN_PATH and isinstance(body, dict):
+            body = dict(body, username=args.username, password=args.password)
+        path = order_ids.rewrite_path(entry['path'])
+        url = f"{args.url}{path}{'?' + entry['query'] if entry.get('query') else ''}"
+        started = time.perf_counter()
+        try:
+            response = session.request(entry['method'], url, json=order_ids.rewrite_body(body),
+                                       headers=headers, timeout=30)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - started
+        status = response.status_code if response is not None else None
+
+        captured_id = entry.get('order_id')
+        replayed_id = None
+        if captured_id is not None and response is not None and response.ok:
+            try:
+                body = response.json()
+            except ValueError:
+                # Counted as failed, like no response at all
+                status = body = None
+            replayed_id = body.get('order_id') if isinstance(body, dict) else None
+        results.request(name, entry, status, elapsed, lag)
+
+        if captured_id is not None:
+            if replayed_id is not None:
+                order_ids.created(captured_id, replayed_id)
+            else:
+                order_ids.failed(captured_id)
+
+    span = entries[-1]['offset']
+    print(f'Replaying {len(entries)} captured entries ({span:.0f}s of traffic) at {args.speed:g}x '
+          f'against {args.url}, about {span / args.speed:.0f}s')
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+    started = time.perf_counter()
+    for entry in entries:
+        due = started + entry['offset'] / args.speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lag = max(time.perf_counter() - due, 0.0)
+        if entry['type'] == 'socket':
+            client = sockets.get(entry['sid'])
+            if client is None:
+                client = sockets[entry['sid']] = SocketClient(args.url, order_ids, results)
+            client.send(entry, lag)
+            if entry['event'] == 'disconnect':
+                del sockets[entry['sid']]
+        else:
+            pool.submit(send, entry, lag)
+    pool.shutdown(wait=True)
+    for client in sockets.values():
+        client.close()
+    for client in sockets.values():
+        client.thread.join(timeout=10)
+    elapsed = time.perf_counter() - started
+
+    rows, send_lag = results.report()
+    print_report(rows, send_lag, results, order_ids, elapsed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'capture': args.capture, 'url': args.url, 'speed': args.speed, 'duration': elapsed,
+                       'skipped_lines': skipped,
+                       'send_lag_p95_ms': round(percentile(send_lag, 0.95), 1) if send_lag else 0,
+                       'socket_events': results.socket_events, 'socket_errors': results.socket_errors,
+                       'unmapped_order_ids': order_ids.unmapped, 'endpoints': rows}, f, indent=2)
+        print(f'   results written to {args.json}')
+
+def print_report(rows, send_lag, results, order_ids, elapsed):
+    print(f"\n=== replayed in {elapsed:.0f}s ===")
+    print(f"   {'endpoint':<40} {'reqs':>6} {'diverged':>8} {'p50 cap':>8} {'p50 now':>8} "
+          f"{'p95 cap':>8} {'p95 now':>8} {'x p95':>6}")
+    for row in rows:
+        print(f"   {row['endpoint']:<40} {row['requests']:>6} {row['status_diverged'] + row['no_response']:>8} "
+              f"{row['captured_p50_ms']:>8.1f} {row['replayed_p50_ms']:>8.1f} "
+              f"{row['captured_p95_ms']:>8.1f} {row['replayed_p95_ms']:>8.1f} {row['p95_ratio']:>6.2f}")
+        for change, count in sorted(row['status_changes'].items()):
+            print(f"      status {change}: {count}")
+    total = sum(row['requests'] for row in rows)
+    diverged = sum(row['status_diverged'] + row['no_response'] for row in rows)
+    print(f"   {total} requests, {diverged} ({diverged / max(total, 1) * 100:.1f}%) with a different status; "
+          f"{results.socket_events} socket events, {results.socket_errors} failed")
+    if send_lag:
+        print(f"   send lag p50 {percentile(send_lag, 0.50):.1f} ms, p95 {percentile(send_lag, 0.95):.1f} ms, "
+              f"max {max(send_lag):.1f} ms")
+    if order_ids.unmapped:
+        print(f"   {order_ids.unmapped} references to orders placed before the capture were sent unchanged")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', nargs='+', help='JSON-lines files written with TRAFFIC_CAPTURE, merged by time')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='instance to replay against')
+    parser.add_argument('--speed', type=positive_float, default=1.0, help='time compression, e.g. 1, 5 or 20')
+    parser.add_argument('--duration', type=float, help='only replay the first N seconds of the capture')
+    parser.add_argument('--concurrency', type=int, default=64, help='most requests in flight at once')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    replay(args)
@@ -0,0 +1,81 @@
+"""
+Test PUT /api/admin/menu-items, the bulk menu item endpoint
+Malformed updates are rejected with a 400 before any item is touched.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pytest
+from app import create_app, db
+from app.cli import create_schema, ensure_admin
+from app.models.models import Category, MenuItem
+
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        category = Category(name='Coffee', display_order=1)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([MenuItem(name=f'Coffee {n}', price=3.00, category_id=category.id) for n in range(3)])
+        db.session.commit()
+    return app
+
+@pytest.fixture(scope='module')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+@pytest.fixture(scope='module')
+def item_ids(app):
+    with app.app_context():
+        return [item.id for item in MenuItem.query.order_by(MenuItem.id).all()]
+
+def update_items(client, admin_headers, body):
+    return client.put('/api/admin/menu-items', json=body, headers=admin_headers)
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'updates': []},
+    {'updates': {'id': 1, 'price': 4.0}},
+    {'updates': [1]},
+    {'updates': [{'id': '1', 'price': 4.0}]},
+    {'updates': [{'id': True, 'price': 4.0}]},
+    {'updates': [{'category_id': '1', 'price_percent': 10}]},
+    {'updates': [{'category_id': 1, 'price_percent': 'abc'}]},
+    {'updates': [{'id': 1, 'price': '4.00'}]},
+    {'updates': [{'id': 1, 'is_available': 'no'}]},
+    {'updates': [{'price': 4.0}]}
+], ids=['empty', 'no updates', 'not a list', 'not an object', 'string id', 'bool id', 'string category_id',
+        'string price_percent', 'string price', 'string is_available', 'no target'])
+def test_rejects_malformed_updates(app, client, admin_headers, body):
+    response = update_items(client, admin_headers, body)
+    assert response.status_code == 400, response.get_json()
+    with app.app_context():
+        assert {float(item.price) for item in MenuItem.query.all()} == {3.00}
+
+def test_unknown_items_are_reported(client, admin_headers):
+    response = update_items(client, admin_headers, {'updates': [{'id': 999999, 'price': 4.0}]})
+    assert response.status_code == 404
+    assert response.get_json()['item_ids'] == [999999]
+
+def test_applies_item_and_category_updates(app, client, admin_headers, item_ids):
+    with app.app_context():
+        category_id = db.session.get(MenuItem, item_ids[0]).category_id
+    response = update_items(client, admin_headers, {'updates': [
+        {'category_id': category_id, 'price_percent': 10},
+        {'id': item_ids[0], 'price': 5, 'is_available': False}
+    ]})
+    assert response.status_code == 200, response.get_json()
+    prices = {item['id']: item['price'] for item in response.get_json()['items']}
+    assert prices[item_ids[0]] == 5.0
+    assert prices[item_ids[1]] == 3.3
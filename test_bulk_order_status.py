@@ -0,0 +1,109 @@
+"""
+Test PUT /api/admin/orders/status, the bulk order status endpoint
+Malformed updates are rejected with a 400 before any order is touched.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pytest
+from app import create_app, db
+from app.cli import create_schema, ensure_admin
+from app.models.models import Category, MenuItem, Order, Table
+
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        category = Category(name='Coffee', display_order=1)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([MenuItem(name=f'Coffee {n}', price=3.00 + n, category_id=category.id) for n in range(3)])
+        db.session.add_all([Table(table_number=n, is_active=True) for n in range(1, 5)])
+        db.session.commit()
+    return app
+
+@pytest.fixture(scope='module')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+@pytest.fixture(scope='module')
+def orders(app, client):
+    with app.app_context():
+        item_ids = [item.id for item in MenuItem.query.order_by(MenuItem.id).all()]
+    order_ids = []
+    for table_number in (1, 2):
+        response = client.post('/api/orders', json={
+            'table_number': table_number,
+            'items': [{'menu_item_id': item_id, 'quantity': 1} for item_id in item_ids]
+        })
+        assert response.status_code == 200, response.get_json()
+        order_ids.append(response.get_json()['order_id'])
+    return order_ids
+
+def update_statuses(client, admin_headers, body):
+    return client.put('/api/admin/orders/status', json=body, headers=admin_headers)
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'updates': []},
+    {'updates': {'order_id': 1, 'status': 'ready'}},
+    {'updates': [1]},
+    {'updates': [{'order_id': '1', 'status': 'ready'}]},
+    {'updates': [{'order_id': True, 'status': 'ready'}]},
+    {'updates': [{'order_id': 1, 'status': 'cooking'}]}
+], ids=['empty', 'no updates', 'not a list', 'not an object', 'string id', 'bool id', 'bad status'])
+def test_rejects_malformed_updates(client, admin_headers, body):
+    response = update_statuses(client, admin_headers, body)
+    assert response.status_code == 400, response.get_json()
+
+def test_rejects_duplicate_order_ids(app, client, admin_headers, orders):
+    response = update_statuses(client, admin_headers, {'updates': [
+        {'order_id': orders[0], 'status': 'preparing'},
+        {'order_id': orders[0], 'status': 'ready'}
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['order_id'] == orders[0]
+    with app.app_context():
+        assert db.session.get(Order, orders[0]).status == 'pending'
+
+def test_mixed_id_types_are_rejected(client, admin_headers, orders):
+    response = update_statuses(client, admin_headers, {'updates': [
+        {'order_id': orders[0], 'status': 'preparing'},
+        {'order_id': str(orders[1]), 'status': 'preparing'}
+    ]})
+    assert response.status_code == 400
+
+def test_unknown_orders_are_reported(client, admin_headers, orders):
+    response = update_statuses(client, admin_headers, {'updates': [
+        {'order_id': orders[0], 'status': 'preparing'},
+        {'order_id': 999999, 'status': 'preparing'}
+    ]})
+    assert response.status_code == 404
+    assert response.get_json()['order_ids'] == [999999]
+
+def test_applies_updates_and_returns_the_orders(app, client, admin_headers, orders):
+    response = update_statuses(client, admin_headers, {'updates': [
+        {'order_id': orders[0], 'status': 'preparing', 'estimated_time': 12},
+        {'order_id': orders[1], 'status': 'ready'}
+    ]})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['success'] is True
+    returned = {order['id']: order for order in body['orders']}
+    assert set(returned) == set(orders)
+    assert returned[orders[0]]['status'] == 'preparing'
+    assert returned[orders[0]]['estimated_time'] == 12
+    assert returned[orders[1]]['status'] == 'ready'
+    assert all(order['items'] for order in body['orders'])
+    with app.app_context():
+        assert db.session.get(Order, orders[1]).status == 'ready'
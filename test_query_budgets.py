@@ -0,0 +1,144 @@
+"""
+Test that each budgeted endpoint stays within its SQL statement budget
+Budgets are declared in backend/app/query_budget.py. The testing config sets
+SQLALCHEMY_LAZY_LOADS = 'raise', so an N+1 lazy load fails the request outright
+instead of only adding statements.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pytest
+from app import create_app, db
+from app.cli import create_schema, ensure_admin
+from app.models.models import Category, MenuItem, Table
+from app.query_budget import QUERY_BUDGETS, QueryCounter
+from app.routes.menu import menu_cache
+
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        create_schema()
+        ensure_admin()
+        for position, name in enumerate(['Coffee', 'Tea', 'Pastries'], start=1):
+            category = Category(name=name, display_order=position)
+            db.session.add(category)
+            db.session.flush()
+            for n in range(3):
+                db.session.add(MenuItem(name=f'{name} {n}', price=3.00 + n, category_id=category.id))
+        db.session.add_all([Table(table_number=n, is_active=True) for n in range(1, 11)])
+        db.session.commit()
+    return app
+
+@pytest.fixture(scope='module')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def admin_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+@pytest.fixture(scope='module')
+def menu_item_ids(app):
+    with app.app_context():
+        return [item.id for item in MenuItem.query.order_by(MenuItem.id).all()]
+
+@pytest.fixture(scope='module')
+def orders(client, menu_item_ids):
+    # Several orders, each with several lines, so a per-row lazy load costs
+    # more than any budget. One per table: a table can't reorder for two minutes
+    order_ids = []
+    for n in range(6):
+        response = client.post('/api/orders', json={
+            'table_number': n + 1,
+            'items': [{'menu_item_id': item_id, 'quantity': 1} for item_id in menu_item_ids[n:n + 3]]
+        })
+        assert response.status_code == 200, response.get_json()
+        order_ids.append(response.get_json()['order_id'])
+    return order_ids
+
+def assert_within_budget(app, client, endpoint, method, url, **kwargs):
+    menu_cache.invalidate()
+    with app.app_context(), QueryCounter(db.engine) as queries:
+        response = client.open(url, method=method, **kwargs)
+    assert response.status_code == 200, response.get_json()
+    budget = QUERY_BUDGETS[endpoint]
+    assert len(queries) <= budget, \
+        f'{endpoint} issued {len(queries)} statements (budget {budget}):\n' + '\n'.join(queries.statements)
+    return len(queries)
+
+def test_public_endpoints(app, client, orders, menu_item_ids):
+    assert_within_budget(app, client, 'menu.get_menu', 'GET', '/api/menu')
+    assert_within_budget(app, client, 'menu.get_menu_item', 'GET', f'/api/menu/items/{menu_item_ids[0]}')
+    assert_within_budget(app, client, 'tables.get_tables', 'GET', '/api/tables')
+    assert_within_budget(app, client, 'tables.validate_table', 'GET', '/api/tables/1')
+    assert_within_budget(app, client, 'orders.get_order', 'GET', f'/api/orders/{orders[0]}')
+    assert_within_budget(app, client, 'orders.get_table_orders', 'GET', '/api/orders/table/1')
+
+def test_admin_endpoints(app, client, orders, admin_headers):
+    for endpoint, url in [
+        ('admin.get_active_orders', '/api/admin/orders/active'),
+        ('admin.get_all_menu_items', '/api/admin/menu-items'),
+        ('admin.get_admin_tables', '/api/admin/tables'),
+        ('admin.get_dashboard_stats', '/api/admin/dashboard/stats'),
+        ('admin.get_order_history', f'/api/admin/orders/{orders[0]}/history'),
+        ('admin.get_station_orders', '/api/admin/stations/bar/orders'),
+        ('admin.get_daily_orders', '/api/admin/orders/daily')
+    ]:
+        assert_within_budget(app, client, endpoint, 'GET', url, headers=admin_headers)
+
+def test_place_order_does_not_grow_with_cart(app, client, menu_item_ids):
+    counts = [
+        assert_within_budget(app, client, 'orders.place_order', 'POST', '/api/orders', json={
+            'table_number': table_number,
+            'items': [{'menu_item_id': item_id, 'quantity': 2} for item_id in menu_item_ids[:lines]]
+        })
+        for table_number, lines in [(9, 1), (10, len(menu_item_ids))]
+    ]
+    assert counts[0] == counts[1], f'statements grew with the cart: {counts}'
+
+def test_bulk_status_update_does_not_grow_with_batch(app, client, orders, admin_headers, menu_item_ids):
+    # An order left waiting behind both batches, so each one writes re-estimated ETAs
+    response = client.post('/api/orders', json={
+        'table_number': 8, 'items': [{'menu_item_id': menu_item_ids[0], 'quantity': 1}]
+    })
+    assert response.status_code == 200, response.get_json()
+    counts = [
+        assert_within_budget(app, client, 'admin.bulk_update_order_status', 'PUT', '/api/admin/orders/status',
+                             headers=admin_headers,
+                             json={'updates': [{'order_id': order_id, 'status': 'completed'} for order_id in batch]})
+        for batch in (orders[:1], orders[1:])
+    ]
+    assert counts[0] == counts[1], f'statements grew with the batch: {counts}'
+
+def test_profiling_flag(app, client, orders, admin_headers, caplog):
+    # The profiler's own admin lookup is not charged to the endpoint
+    url = '/api/admin/orders/active'
+    with caplog.at_level('WARNING', logger='cafe.sql'):
+        response = client.get(url, headers=dict(admin_headers, **{'X-Profile': '1'}))
+    assert response.status_code == 200 and response.headers['X-Profile-Id'].isdigit()
+    assert 'query budget exceeded' not in caplog.text
+    assert client.get('/api/admin/profiles', headers=admin_headers).get_json()['profiles'][0]['sql_statements'] \
+        == assert_within_budget(app, client, 'admin.get_active_orders', 'GET', url, headers=admin_headers)
+
+    # Switched off, or sent without an admin token, the flag is ignored
+    response = client.get(f'{url}?_profile=0', headers=dict(admin_headers, **{'X-Profile': ''}))
+    assert response.status_code == 200 and 'X-Profile-Id' not in response.headers
+    response = client.get('/api/menu', headers={'X-Profile': '1'})
+    assert response.status_code == 200 and 'X-Profile-Id' not in response.headers
+
+def test_order_status_update(app, client, admin_headers, menu_item_ids):
+    response = client.post('/api/orders', json={
+        'table_number': 7, 'items': [{'menu_item_id': menu_item_ids[0], 'quantity': 1}]
+    })
+    assert response.status_code == 200, response.get_json()
+    order_id = response.get_json()['order_id']
+    # Serializing the response after the ETAs were published and committed
+    # used to lazy load the expired order
+    for status in ('preparing', 'ready'):
+        assert_within_budget(app, client, 'admin.update_order_status', 'PUT', f'/api/admin/orders/{order_id}/status',
+                             headers=admin_headers, json={'status': status})
@@ -0,0 +1,239 @@
+"""
+Test that socket events reach clients connected to another worker
+Worker A handles the HTTP request, the admin dashboard is connected to worker B,
+and the two only share the Socket.IO message queue (the local:// stand-in)
+"""
+
+import sys
+import os
+import pickle
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import socketio as socketio_client
+from flask import Flask
+from flask_socketio import SocketIO
+from app import create_app, db
+from app.cache import InvalidationBus
+from app.kitchen import KitchenQueue
+from app.message_queue import LocalBroker, LocalPubSubManager
+from app.presence import PresenceRegistry
+from app.query_budget import QueryCounter
+from app.models.models import Category, MenuItem, Table
+import app.cache
+import app.presence
+import app.socket_events as socket_events
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def presence_worker(broker, **options):
+    # Its own bus origin, so it sees the others' presence messages and not its own
+    bus = InvalidationBus()
+    bus.attach(broker, 'test:invalidations')
+    return PresenceRegistry(bus=bus, **options)
+
+def start_worker_b(channel):
+    # A second Socket.IO server with its own client list, like another gunicorn worker
+    worker_app = Flask('worker_b')
+    # Joining the admin room sends an orders snapshot, so worker B needs a database
+    worker_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(worker_app)
+    with worker_app.app_context():
+        db.create_all()
+    worker_socketio = SocketIO(worker_app, async_mode='threading',
+                               client_manager=LocalPubSubManager(channel=channel))
+    worker_socketio.on_event('join_admin', socket_events.handle_join_admin)
+
+    port = free_port()
+    thread = threading.Thread(target=worker_socketio.run, args=(worker_app,), kwargs={
+        'host': '127.0.0.1', 'port': port, 'allow_unsafe_werkzeug': True, 'log_output': False
+    }, daemon=True)
+    thread.start()
+    return f'http://127.0.0.1:{port}'
+
+def test_order_reaches_admin_on_other_worker():
+    worker_a = create_app('testing')
+    worker_b_url = start_worker_b(worker_a.config['SOCKETIO_CHANNEL'])
+
+    with worker_a.app_context():
+        db.create_all()
+        category = Category(name='Coffee', display_order=1)
+        db.session.add(category)
+        db.session.flush()
+        menu_item = MenuItem(name='Latte', price=4.00, category_id=category.id)
+        db.session.add_all([menu_item, Table(table_number=1, is_active=True)])
+        db.session.commit()
+        menu_item_id = menu_item.id
+
+    # Admin dashboard connects to worker B only
+    received = []
+    joined = threading.Event()
+    admin_client = socketio_client.Client()
+    admin_client.on('new_order', lambda order: received.append(order))
+    for _ in range(50):
+        try:
+            admin_client.connect(worker_b_url, transports=['polling'])
+            break
+        except socketio_client.exceptions.ConnectionError:
+            time.sleep(0.1)
+    admin_client.emit('join_admin', callback=lambda *args: joined.set())
+    assert joined.wait(5), 'admin never joined the admin room on worker B'
+
+    # Customer places the order through worker A
+    response = worker_a.test_client().post('/api/orders', json={
+        'table_number': 1,
+        'items': [{'menu_item_id': menu_item_id, 'quantity': 2}]
+    })
+    assert response.status_code == 200, response.get_json()
+    order_id = response.get_json()['order_id']
+
+    deadline = time.time() + 5
+    while not received and time.time() < deadline:
+        time.sleep(0.05)
+    admin_client.disconnect()
+
+    assert received, 'new_order never reached the admin connected to worker B'
+    assert received[0]['id'] == order_id
+    print(f"✅ Order #{order_id} placed on worker A reached the admin on worker B")
+
+def test_presence_is_shared_between_workers():
+    broker = LocalBroker()
+    worker_a, worker_b = presence_worker(broker), presence_worker(broker)
+
+    worker_a.connect('sid-1')
+    worker_a.join('sid-1', 'admin')
+    assert wait_for(lambda: worker_b.has_members('admin')), 'worker B never saw the admin on worker A'
+    assert not worker_b.has_members('table_1')
+    assert wait_for(lambda: worker_b.snapshot()['rooms'] == {'admin': 1})
+
+    # A worker that starts later catches up by asking the others to resend
+    worker_c = presence_worker(broker)
+    assert not worker_c.has_members('admin')
+    worker_c.sync()
+    assert wait_for(lambda: worker_c.has_members('admin')), 'sync() did not restore the counts on worker C'
+
+    worker_a.disconnect('sid-1')
+    assert wait_for(lambda: not worker_b.has_members('admin') and not worker_c.has_members('admin')), \
+        'the disconnect on worker A never reached the other workers'
+    print("✅ Room presence on worker A is visible to workers B and C")
+
+def test_stale_presence_counts_as_occupied(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(app.presence, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    broker = LocalBroker()
+    # Only worker B checks heartbeats; worker A publishes by hand with beat()
+    worker_a = presence_worker(broker)
+    worker_b = presence_worker(broker, heartbeat=10, ttl=60)
+    worker_a.connect('sid-1')
+    worker_a.join('sid-1', 'admin')
+
+    # Until a heartbeat has passed since the sync, the other workers' counts are unknown
+    worker_b.sync()
+    assert wait_for(lambda: worker_b.snapshot()['rooms'] == {'admin': 1})
+    assert worker_b.has_members('table_1')
+    clock.now += 10
+    assert worker_b.has_members('admin') and not worker_b.has_members('table_1')
+
+    # Worker A missed two heartbeats: every room counts as occupied
+    clock.now += 15
+    assert worker_b.has_members('table_1')
+    worker_a.beat()
+    assert wait_for(lambda: not worker_b.has_members('table_1')), 'a heartbeat did not refresh worker A'
+
+    # Past the TTL worker A is forgotten and no longer keeps rooms open
+    clock.now += 61
+    assert not worker_b.has_members('admin') and not worker_b.has_members('table_1')
+    assert worker_b.snapshot()['workers'] == 1
+
+    # While the bus is down nothing is known about the other workers
+    worker_b.bus.connected = False
+    assert worker_b.has_members('table_1')
+
+class FlakyBroker(LocalBroker):
+    """Its first subscription fails on the first read, like a dropped Redis connection."""
+
+    def __init__(self):
+        super().__init__()
+        self.subscriptions = 0
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        self.subscriptions += 1
+        if self.subscriptions == 1:
+            def fail():
+                raise ConnectionError('connection lost')
+            subscription.get = fail
+        return subscription
+
+def test_invalidation_listener_resubscribes(monkeypatch):
+    monkeypatch.setattr(app.cache, 'LISTENER_BACKOFF', 0.01)
+    broker = FlakyBroker()
+    listener, publisher = InvalidationBus(), InvalidationBus()
+    received, resynced = [], []
+    listener.subscribe('menu', received.append)
+    listener.on_resubscribe(lambda: resynced.append(True))
+    listener.attach(broker, 'test:flaky')
+    # Publishing only, so it needs no listener of its own
+    publisher.broker, publisher.channel = broker, 'test:flaky'
+
+    assert wait_for(lambda: resynced), 'the listener never resubscribed'
+    assert listener.stats()['listener_restarts'] == 1
+    broker.publish('test:flaky', b'not a pickle')
+    publisher.publish('menu', 2)
+    assert wait_for(lambda: received), 'invalidations stopped arriving after the broker failed'
+    assert received[0]['version'] == 2 and received[0]['remote']
+    assert listener.stats()['undecodable'] == 1
+
+def test_kitchen_queue_changes_replay_on_other_workers():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        worker_a, worker_b = KitchenQueue(app), KitchenQueue(app)
+        worker_a.ensure_loaded()
+        worker_b.ensure_loaded()
+
+        def publish(changes):
+            # What publish_kitchen_changes sends, through the same pickling as the broker
+            worker_b.apply_remote(pickle.loads(pickle.dumps(
+                {'events': changes['events'], 'item_minutes': worker_a.learned_minutes()})))
+
+        placed = datetime.utcnow() - timedelta(minutes=30)
+        lines = [{'menu_item_id': 1, 'name': 'Latte', 'category_id': 1, 'quantity': 2}]
+        with QueryCounter(db.engine) as queries:
+            for order_id in (1, 2, 3):
+                publish(worker_a.add(order_id, order_id, placed, lines, 10))
+            order = SimpleNamespace(id=1, created_at=placed)
+            publish(worker_a.update_status(order, 'preparing'))
+            publish(worker_a.update_status(order, 'ready'))
+            changes = worker_a.update_status(SimpleNamespace(id=2, created_at=placed), 'preparing')
+            worker_a.pin(2, 25, changes)
+            publish(changes)
+        assert not queries.statements, 'replaying changes should not reload the queue'
+
+        assert worker_a.learned_minutes() and worker_b.learned_minutes() == worker_a.learned_minutes()
+        assert worker_b.snapshot() == worker_a.snapshot()
+        assert worker_b.prep_list() == worker_a.prep_list()
+        assert worker_b.estimate({1: 3}) == worker_a.estimate({1: 3})
+        assert worker_b._orders[2]['estimated_time'] == 25 and worker_b._orders[2]['pinned']
+
+        # A status for a queued order this worker never saw falls back to a reload
+        worker_b.apply_remote({'events': [{'op': 'status', 'order_id': 99, 'status': 'pending',
+                                           'changed_at': datetime.utcnow()}]})
+        assert not worker_b._loaded
+
+if __name__ == "__main__":
+    test_order_reaches_admin_on_other_worker()
+    test_presence_is_shared_between_workers()
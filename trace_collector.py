@@ -0,0 +1,110 @@
+"""
+Stand-in for an OpenTelemetry collector when looking at traces locally
+Accepts OTLP/JSON on POST /v1/traces, appends each export to a JSON-lines file
+and prints every finished request as an indented span tree with durations.
+Point the backend at it with TRACE_EXPORT=http://localhost:4318/v1/traces
+
+It can also print the trees for a file written with TRACE_EXPORT=<path>.
+
+Usage:
+    python trace_collector.py
+    python trace_collector.py --port 4318 --output traces.jsonl
+    python trace_collector.py --read traces.jsonl
+"""
+
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A trace is printed once its request (server) span arrives; spans that finish after the
+# request (socket sends and client acknowledgements) are printed as they come
+SERVER = 2
+traces = defaultdict(list)
+lock = threading.Lock()
+
+def spans_in(export):
+    for resource in export.get('resourceSpans', []):
+        for scope in resource.get('scopeSpans', []):
+            yield from scope.get('spans', [])
+
+def duration_ms(span):
+    return (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+
+def print_tree(trace_id, spans):
+    by_parent = defaultdict(list)
+    ids = {span['spanId'] for span in spans}
+    for span in spans:
+        parent = span.get('parentSpanId')
+        by_parent[parent if parent in ids else None].append(span)
+
+    def walk(parent, depth):
+        for span in sorted(by_parent[parent], key=lambda span: int(span['startTimeUnixNano'])):
+            failed = ' !' if span.get('status', {}).get('code') == 2 else ''
+            print(f"{'  ' * depth}{span['name']:<{40 - 2 * depth}} {duration_ms(span):9.2f} ms{failed}")
+            walk(span['spanId'], depth + 1)
+
+    print(f'trace {trace_id}')
+    walk(None, 1)
+
+def collect(export):
+    finished = []
+    with lock:
+        for span in spans_in(export):
+            traces[span['traceId']].append(span)
+            if span.get('kind') == SERVER or span['name'].startswith('socket.'):
+                finished.append(span['traceId'])
+        trees = [(trace_id, traces.pop(trace_id)) for trace_id in dict.fromkeys(finished) if trace_id in traces]
+    for trace_id, spans in trees:
+        print_tree(trace_id, spans)
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    output = None
+
+    def do_POST(self):
+        if self.path != '/v1/traces':
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            export = json.loads(body)
+        except ValueError:
+            self.send_error(400, 'expected OTLP/JSON')
+            return
+        if self.output:
+            with lock, open(self.output, 'a') as f:
+                f.write(json.dumps(export) + '\n')
+        collect(export)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OTLP/JSON trace collector')
+    parser.add_argument('--port', type=int, default=4318)
+    parser.add_argument('--output', help='append received exports to this JSON-lines file')
+    parser.add_argument('--read', help='print the span trees in an exported JSON-lines file and exit')
+    args = parser.parse_args()
+
+    if args.read:
+        with open(args.read) as f:
+            for line in f:
+                if line.strip():
+                    collect(json.loads(line))
+        return
+
+    CollectorHandler.output = args.output
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), CollectorHandler)
+    print(f'Collecting traces on http://127.0.0.1:{args.port}/v1/traces')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()